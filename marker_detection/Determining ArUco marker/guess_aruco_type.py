@@ -1,16 +1,15 @@
 #!/usr/bin/env python
 
 # import the necessary packages
+from concurrent.futures import ProcessPoolExecutor
 import argparse
 import imutils
+import itertools
+import json
+import os
+import time
 import cv2
 
-# construct the argument parser and parse the arguments
-ap = argparse.ArgumentParser()
-ap.add_argument("-i", "--image", required=True,
-	help="path to input image containing ArUCo tag")
-args = vars(ap.parse_args())
-
 # define names of each possible ArUco tag OpenCV supports
 ARUCO_DICT = {
 	"DICT_4X4_50": cv2.aruco.DICT_4X4_50,
@@ -36,22 +35,274 @@ ARUCO_DICT = {
 #	"DICT_APRILTAG_36h11": cv2.aruco.DICT_APRILTAG_36h11
 }
 
-# load the input image from disk and resize it
-print("[INFO] loading image...")
-image = cv2.imread(args["image"])
-image = imutils.resize(image, width=600)
-
-# loop over the types of ArUco dictionaries
-for (arucoName, arucoDict) in ARUCO_DICT.items():
-	# load the ArUCo dictionary, grab the ArUCo parameters, and
-	# attempt to detect the markers for the current dictionary
-	arucoDict = cv2.aruco.Dictionary_get(arucoDict)
-	arucoParams = cv2.aruco.DetectorParameters_create()
-	(corners, ids, rejected) = cv2.aruco.detectMarkers(
-		image, arucoDict, parameters=arucoParams)
-
-	# if at least one ArUco marker was detected display the ArUco
-	# name to our terminal
-	if len(corners) > 0:
-		print("[INFO] detected {} markers for '{}'".format(
-			len(corners), arucoName))
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+# dictionaries and detector parameters, built once per worker process
+workerDicts = None
+workerParams = None
+
+
+def family(arucoName):
+	# the smaller dictionaries of a family are prefixes of the larger
+	# ones, e.g. a DICT_5X5_50 marker is also found with DICT_5X5_1000
+	return arucoName.rsplit("_", 1)[0]
+
+
+def init_worker():
+	global workerDicts, workerParams
+	workerDicts = {name: cv2.aruco.Dictionary_get(value)
+		for (name, value) in ARUCO_DICT.items()}
+	workerParams = cv2.aruco.DetectorParameters_create()
+
+
+def load_image(source):
+	# images are passed as paths, video frames as arrays that were
+	# already resized and converted in the parent
+	if isinstance(source, str):
+		source = cv2.imread(source)
+		if source is None:
+			return None
+	image = imutils.resize(source, width=600)
+	if image.ndim == 3:
+		image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+	return image
+
+
+def detect_all(task):
+	# run all requested dictionaries on one image, the image is only
+	# loaded and converted once
+	(key, source, names) = task
+	image = load_image(source)
+	if image is None:
+		return (key, None)
+	found = {}
+	for name in names:
+		(corners, ids, rejected) = cv2.aruco.detectMarkers(
+			image, workerDicts[name], parameters=workerParams)
+		if len(corners) > 0:
+			found[name] = sorted(ids.flatten().tolist())
+	return (key, found)
+
+
+def iter_sources(path, stride):
+	# yield (key, source) pairs for a directory of images or a video
+	if os.path.isdir(path):
+		for name in sorted(os.listdir(path)):
+			if name.lower().endswith(IMAGE_EXTENSIONS):
+				yield (name, os.path.join(path, name))
+		return
+	capture = cv2.VideoCapture(path)
+	index = 0
+	while True:
+		(grabbed, frame) = capture.read()
+		if not grabbed:
+			break
+		if index % stride == 0:
+			# resize and convert here, the workers then receive about a
+			# tenth of the full-resolution BGR frame
+			yield ("frame {}".format(index), load_image(frame))
+		index += 1
+	capture.release()
+
+
+def dominant_family(summary, dominance, minImages):
+	# the family with at least `dominance` of all detected markers, once
+	# markers were found in at least `minImages` images
+	markers = {}
+	images = {}
+	for (name, stats) in summary.items():
+		fam = family(name)
+		markers[fam] = max(markers.get(fam, 0), stats["markers"])
+		images[fam] = max(images.get(fam, 0), stats["images"])
+	total = sum(markers.values())
+	if total == 0:
+		return None
+	best = max(markers, key=markers.get)
+	if images[best] >= minImages and markers[best] / total >= dominance:
+		return best
+	return None
+
+
+def run_batch(path, workers, stride, dominance, minImages, roundSize):
+	names = list(ARUCO_DICT)
+	# "tested" counts the images each dictionary was run on, fewer than
+	# all after the early exit
+	summary = {name: {"tested": 0, "images": 0, "markers": 0, "ids": {}}
+		for name in names}
+	perImage = {}
+	dominant = None
+	earlyExitAt = None
+	sources = iter_sources(path, stride)
+
+	with ProcessPoolExecutor(max_workers=workers,
+		initializer=init_worker) as executor:
+		while True:
+			# submit the next round of images with the dictionaries
+			# that are still candidates
+			batch = [(key, source, names) for (key, source) in
+				itertools.islice(sources, roundSize)]
+			if not batch:
+				break
+			for (key, found) in executor.map(detect_all, batch):
+				if found is None:
+					print("[INFO] could not read {}".format(key))
+					continue
+				perImage[key] = found
+				for name in names:
+					summary[name]["tested"] += 1
+				for (name, ids) in found.items():
+					stats = summary[name]
+					stats["images"] += 1
+					stats["markers"] += len(ids)
+					for markerID in ids:
+						stats["ids"][markerID] = \
+							stats["ids"].get(markerID, 0) + 1
+
+			# early exit: once a family dominates, only its
+			# dictionaries are run on the remaining images
+			if dominant is None:
+				dominant = dominant_family(summary, dominance,
+					minImages)
+				if dominant is not None:
+					earlyExitAt = len(perImage)
+					names = [name for name in names
+						if family(name) == dominant]
+					print("[INFO] {} dominates after {} images".format(
+						dominant, earlyExitAt))
+
+	return (summary, perImage, dominant, earlyExitAt)
+
+
+def dictionary_size(arucoName):
+	# number of IDs, e.g. 100 for DICT_5X5_100
+	suffix = arucoName.rsplit("_", 1)[1]
+	return int(suffix) if suffix.isdigit() else 1024
+
+
+def best_dictionary(summary, dominant, minRepeats=2):
+	# the smallest dictionary of the (dominant) family whose ID range covers
+	# the IDs found in at least `minRepeats` images, a single hit is most
+	# likely a false positive of a larger dictionary
+	if dominant is None:
+		markers = {}
+		for (name, stats) in summary.items():
+			fam = family(name)
+			markers[fam] = max(markers.get(fam, 0), stats["markers"])
+		dominant = max(markers, key=markers.get)
+	candidates = [name for name in ARUCO_DICT if family(name) == dominant]
+	counts = {}
+	for name in candidates:
+		for (markerID, count) in summary[name]["ids"].items():
+			counts[markerID] = max(counts.get(markerID, 0), count)
+	if not counts:
+		return None
+	repeated = [markerID for (markerID, count) in counts.items()
+		if count >= minRepeats]
+	# with too few images, every ID counts
+	highest = max(repeated or counts)
+	for name in candidates:
+		if summary[name]["markers"] > 0 and highest < dictionary_size(name):
+			return name
+
+
+def print_summary(summary):
+	print("{:<22}{:>8}{:>9}  {}".format("dictionary", "images", "markers",
+		"most frequent IDs"))
+	for (name, stats) in summary.items():
+		if stats["markers"] == 0:
+			continue
+		ids = sorted(stats["ids"].items(), key=lambda item: -item[1])
+		ids = ", ".join("{} ({})".format(markerID, count)
+			for (markerID, count) in ids[:6])
+		print("{:<22}{:>8}{:>9}  {}".format(name,
+			"{}/{}".format(stats["images"], stats["tested"]), stats["markers"],
+			ids))
+
+
+def guess_image(path):
+	# load the input image from disk and resize it
+	print("[INFO] loading image...")
+	image = cv2.imread(path)
+	image = imutils.resize(image, width=600)
+
+	# loop over the types of ArUco dictionaries
+	for (arucoName, arucoDict) in ARUCO_DICT.items():
+		# load the ArUCo dictionary, grab the ArUCo parameters, and
+		# attempt to detect the markers for the current dictionary
+		arucoDict = cv2.aruco.Dictionary_get(arucoDict)
+		arucoParams = cv2.aruco.DetectorParameters_create()
+		(corners, ids, rejected) = cv2.aruco.detectMarkers(
+			image, arucoDict, parameters=arucoParams)
+
+		# if at least one ArUco marker was detected display the ArUco
+		# name to our terminal
+		if len(corners) > 0:
+			print("[INFO] detected {} markers for '{}'".format(
+				len(corners), arucoName))
+
+
+def guess_batch(args):
+	print("[INFO] detecting markers in {}...".format(args["batch"]))
+	start = time.perf_counter()
+	(summary, perImage, dominant, earlyExitAt) = run_batch(args["batch"],
+		args["workers"], args["stride"], args["dominance"],
+		args["min_images"], args["round_size"])
+	elapsed = time.perf_counter() - start
+
+	print_summary(summary)
+	if dominant is None:
+		# no early exit, the verdict uses all images
+		dominant = dominant_family(summary, args["dominance"], 1)
+	best = best_dictionary(summary, dominant, args["min_repeats"])
+	bestImages = summary[best]["images"] if best is not None else 0
+	print("[INFO] {} images in {:.1f} s, most likely dictionary: {} "
+		"(markers in {} images)".format(len(perImage), elapsed, best,
+		bestImages))
+
+	results = {
+		"source": args["batch"],
+		"images": len(perImage),
+		"seconds": elapsed,
+		"dictionary": best,
+		"dominant_family": dominant,
+		"early_exit_after": earlyExitAt,
+		"summary": {name: {"tested": stats["tested"],
+			"images": stats["images"],
+			"markers": stats["markers"],
+			"ids": {str(k): v for (k, v) in sorted(stats["ids"].items())}}
+			for (name, stats) in summary.items() if stats["markers"] > 0},
+		"per_image": perImage,
+	}
+	with open(args["output"], "w") as f:
+		json.dump(results, f, indent=2)
+	print("[INFO] results written to {}".format(args["output"]))
+
+
+if __name__ == "__main__":
+	# construct the argument parser and parse the arguments
+	ap = argparse.ArgumentParser()
+	source = ap.add_mutually_exclusive_group(required=True)
+	source.add_argument("-i", "--image",
+		help="path to input image containing ArUCo tag")
+	source.add_argument("-b", "--batch",
+		help="directory of marker photos or a video, checked as a whole")
+	ap.add_argument("-o", "--output", default="aruco_types.json",
+		help="JSON file for the batch results")
+	ap.add_argument("-j", "--workers", type=int, default=None,
+		help="number of worker processes, defaults to one per CPU")
+	ap.add_argument("-s", "--stride", type=int, default=10,
+		help="use every N-th frame of a video")
+	ap.add_argument("--dominance", type=float, default=0.75,
+		help="share of all markers at which a dictionary family wins")
+	ap.add_argument("--min-images", type=int, default=10,
+		help="images with markers needed before the early exit")
+	ap.add_argument("--round-size", type=int, default=32,
+		help="images submitted to the workers between dominance checks")
+	ap.add_argument("--min-repeats", type=int, default=2,
+		help="images an ID has to be found in to decide the dictionary size")
+	args = vars(ap.parse_args())
+
+	if args["image"] is not None:
+		guess_image(args["image"])
+	else:
+		guess_batch(args)
@@ -0,0 +1,73 @@
+"""
+Cost of a slow observer for the observed method, e.g. a recorder on on_recent_gaze.
+
+The observed method is called at the gaze rate with an observer that takes longer
+than the interval between calls, synchronously and through an ObserverQueue with
+each drop policy. Reported are the time spent in the observed method, and the
+dropped calls and lag of the observer.
+
+Usage:
+    python benchmarks/bench_async_observers.py [--rate 200] [--observer-ms 8]
+"""
+
+import argparse
+import time
+
+from pupil_invisible_monitor.observable import Observable, ObserverQueue
+
+
+class Source(Observable):
+    def on_recent_gaze(self, gaze):
+        pass
+
+
+def run(calls, rate, observer_s, executor):
+    source = Source()
+    source.add_observer(
+        "on_recent_gaze", lambda gaze: time.sleep(observer_s), executor=executor
+    )
+    interval = 1 / rate
+    in_method = 0.0
+    next_call = time.perf_counter()
+    for idx in range(calls):
+        time.sleep(max(0.0, next_call - time.perf_counter()))
+        next_call += interval
+        t0 = time.perf_counter()
+        source.on_recent_gaze((idx, idx))
+        in_method += time.perf_counter() - t0
+    if executor is not None:
+        executor.close()
+    return in_method / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rate", type=float, default=200.0, help="calls per second")
+    parser.add_argument("--observer-ms", type=float, default=8.0)
+    parser.add_argument("-n", "--calls", type=int, default=400)
+    parser.add_argument("--maxsize", type=int, default=8)
+    args = parser.parse_args()
+
+    observer_s = args.observer_ms / 1000
+    print(
+        f"{args.calls} calls at {args.rate:.0f} Hz, "
+        f"observer takes {args.observer_ms} ms"
+    )
+    print(
+        f"{'dispatch':<10}{'ms/call':>9}{'called':>8}{'dropped':>9}"
+        f"{'max lag ms':>12}"
+    )
+    per_call = run(args.calls, args.rate, observer_s, None)
+    print(f"{'sync':<10}{per_call * 1000:>9.3f}{args.calls:>8}{0:>9}{'-':>12}")
+    for drop in ObserverQueue.DROP_POLICIES:
+        queue = ObserverQueue(args.maxsize, drop, name=drop)
+        per_call = run(args.calls, args.rate, observer_s, queue)
+        stats = queue.stats()
+        print(
+            f"{drop:<10}{per_call * 1000:>9.3f}{stats['called']:>8}"
+            f"{stats['dropped']:>9}{stats['max_lag_ms']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Per-sample cost of the incremental fixation detectors used for dwell clicking.
+
+For comparison, the naive I-DT recomputes the dispersion of the whole window with
+NumPy for every sample. Clicks are counted with a no-op mouse. Without a gaze
+recording, the synthetic scan path of bench_filters.py is used.
+
+Usage:
+    python benchmarks/bench_dwell.py [--gaze gaze.csv] [--dwell-time 0.5]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from bench_filters import synthetic_scan_path
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.dwell import (
+    DispersionFixationDetector,
+    DwellClicker,
+    VelocityFixationDetector,
+)
+from pupil_invisible_monitor.replay import load_gaze_csv
+
+
+class NaiveDispersionFixationDetector:
+    """I-DT recomputing min/max/mean over the window for every sample."""
+
+    def __init__(self, max_dispersion=40.0, min_duration=0.1, max_gap=0.1):
+        self.max_dispersion = max_dispersion
+        self.min_duration = min_duration
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self._window = []
+
+    @property
+    def duration(self):
+        return self._window[-1][0] - self._window[0][0] if self._window else 0.0
+
+    @property
+    def is_fixation(self):
+        return self.duration >= self.min_duration
+
+    def centroid(self):
+        return tuple(np.mean(np.array(self._window)[:, 1:], axis=0))
+
+    def add(self, ts, x, y):
+        if self._window and ts - self._window[-1][0] > self.max_gap:
+            self.reset()
+        self._window.append((ts, x, y))
+        while True:
+            points = np.array(self._window)[:, 1:]
+            if np.ptp(points, axis=0).sum() <= self.max_dispersion:
+                break
+            self._window.pop(0)
+
+
+def run(detector, ts, xy, dwell_time, batch):
+    mouse = NullMouse()
+    clicker = DwellClicker(detector, mouse, dwell_time)
+    t0 = time.perf_counter()
+    for start in range(0, len(ts), batch):
+        end = start + batch
+        clicker.update(ts[start:end], xy[start:end])
+    return time.perf_counter() - t0, mouse.clicks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-g", "--gaze", help="gaze CSV (ts, x, y)")
+    parser.add_argument("--dwell-time", type=float, default=0.5)
+    parser.add_argument(
+        "-b", "--batch", type=int, default=7, help="samples per update call"
+    )
+    args = parser.parse_args()
+
+    if args.gaze:
+        gaze = load_gaze_csv(args.gaze)
+        ts, xy = gaze[:, 0], gaze[:, 1:]
+    else:
+        ts, xy = synthetic_scan_path(noise=2.0)
+
+    detectors = {
+        "idt (incremental)": DispersionFixationDetector(),
+        "idt (naive)": NaiveDispersionFixationDetector(),
+        "ivt": VelocityFixationDetector(),
+    }
+    print(f"{len(ts)} samples, {ts[-1] - ts[0]:.1f} s, dwell {args.dwell_time} s")
+    print(f"{'detector':<20}{'us/sample':>10}{'clicks':>8}")
+    for name, detector in detectors.items():
+        duration, clicks = run(detector, ts, xy, args.dwell_time, args.batch)
+        print(f"{name:<20}{duration / len(ts) * 1e6:>10.2f}{clicks:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Per-sample cost and jitter reduction of the cursor smoothing filters.
+
+Jitter is the median distance between consecutive samples, which ignores the few
+samples during saccades, and lag the RMS distance between filtered and raw samples.
+Without a gaze recording, a synthetic 200 Hz scan path of noisy fixations and
+saccades is used.
+
+Usage:
+    python benchmarks/bench_filters.py [--gaze gaze.csv] [--batch 7]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pupil_invisible_monitor.filters import FILTERS, KalmanFilter, OneEuroFilter
+from pupil_invisible_monitor.replay import load_gaze_csv
+
+
+def synthetic_scan_path(duration=60.0, rate=200.0, noise=8.0, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = np.arange(0.0, duration, 1 / rate)
+    xy = np.empty((len(ts), 2))
+    target = rng.uniform((0, 0), (1920, 1080))
+    next_saccade = 0.0
+    for i, t in enumerate(ts):
+        if t >= next_saccade:
+            target = rng.uniform((0, 0), (1920, 1080))
+            next_saccade = t + rng.uniform(0.2, 0.8)
+        xy[i] = target
+    return ts, xy + rng.normal(0.0, noise, xy.shape)
+
+
+def jitter(points):
+    return float(np.median(np.linalg.norm(np.diff(points, axis=0), axis=1)))
+
+
+def lag(points, raw):
+    return float(np.sqrt(np.mean(np.sum((points - raw) ** 2, axis=1))))
+
+
+def run(cursor_filter, ts, xy, batch):
+    cursor_filter.reset()
+    out = np.empty_like(xy)
+    t0 = time.perf_counter()
+    for start in range(0, len(ts), batch):
+        end = start + batch
+        out[start:end] = cursor_filter.filter(ts[start:end], xy[start:end])
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("-g", "--gaze", help="gaze CSV (ts, x, y)")
+    parser.add_argument(
+        "-b", "--batch", type=int, default=7, help="samples per filter call"
+    )
+    args = parser.parse_args()
+
+    if args.gaze:
+        gaze = load_gaze_csv(args.gaze)
+        ts, xy = gaze[:, 0], gaze[:, 1:]
+    else:
+        ts, xy = synthetic_scan_path()
+
+    filters = {name: cls() for name, cls in FILTERS.items()}
+    filters["one-euro (beta=0.05)"] = OneEuroFilter(beta=0.05)
+    filters["kalman (q=1e8)"] = KalmanFilter(process_noise=1e8)
+
+    raw_jitter = jitter(xy)
+    print(f"{len(ts)} samples, batches of {args.batch}, raw jitter {raw_jitter:.2f} px")
+    print(
+        f"{'filter':<22}{'us/sample':>10}{'jitter px':>11}{'reduction':>11}"
+        f"{'lag px':>9}"
+    )
+    for name, cursor_filter in filters.items():
+        out, duration = run(cursor_filter, ts, xy, args.batch)
+        filtered_jitter = jitter(out)
+        print(
+            f"{name:<22}{duration / len(ts) * 1e6:>10.2f}{filtered_jitter:>11.2f}"
+            f"{1 - filtered_jitter / raw_jitter:>11.1%}{lag(out, xy):>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
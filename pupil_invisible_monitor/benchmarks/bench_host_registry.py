@@ -0,0 +1,175 @@
+"""
+Host bookkeeping under a busy network: hundreds of companions attach their video and
+gaze sensors, then detach again in a random order.
+
+The host registry is compared with the previous registry, which re-sorted all hosts
+on every lookup. A UI list kept in sync through the on_host_added/_removed/_changed
+notifications is checked against the registry after each poll.
+
+Usage:
+    python benchmarks/bench_host_registry.py [--hosts 500] [--events-per-poll 20]
+"""
+
+import argparse
+import random
+import time
+
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.models import Host_Controller
+
+
+class ResortingHostRegistry(dict):
+    """The registry before the incremental index, sorts on every lookup."""
+
+    def hosts(self):
+        return sorted(self.values(), key=lambda host: host.name)
+
+    def at(self, idx):
+        return self.hosts()[idx]
+
+    def index(self, host_name):
+        return [host.name for host in self.hosts()].index(host_name)
+
+
+class ResortingHostController(Host_Controller):
+    host_registry_cls = ResortingHostRegistry
+
+
+class FakeSensor:
+    """Sensor that is never linked, only announced."""
+
+    def __init__(self, uuid):
+        self.uuid = uuid
+
+    def unlink(self):
+        pass
+
+
+class StressNetwork:
+    """Stand-in for ndsi.Network replaying a fixed list of attach/detach events."""
+
+    def __init__(self, events, formats=(), callbacks=()):
+        self.callbacks = callbacks
+        self._events = events
+        self._poll_budget = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    @property
+    def has_events(self):
+        return bool(self._events) and self._poll_budget > 0
+
+    def handle_event(self):
+        self._poll_budget -= 1
+        event = self._events.pop(0)
+        for callback in self.callbacks:
+            callback(self, event)
+
+    def sensor(self, sensor_uuid, callbacks=()):
+        return FakeSensor(sensor_uuid)
+
+
+def stress_events(hosts, seed=0):
+    rng = random.Random(seed)
+    names = [f"PI-{rng.randrange(10 ** 6):06d}-{idx}" for idx in range(hosts)]
+    attach, detach = [], []
+    for idx, name in enumerate(names):
+        for sensor_type in ("video", "gaze"):
+            sensor = {
+                "host_uuid": f"host-{idx}",
+                "host_name": name,
+                "sensor_uuid": f"{sensor_type}-{idx}",
+                "sensor_name": "PI world v1" if sensor_type == "video" else "Gaze",
+                "sensor_type": sensor_type,
+            }
+            attach.append(dict(sensor, subject="attach"))
+            detach.append(dict(sensor, subject="detach"))
+    rng.shuffle(attach)
+    rng.shuffle(detach)
+    return attach + detach
+
+
+class UIList:
+    """Host names as a UI list would show them, driven by the notifications."""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.names = []
+        self.notifications = 0
+        controller.add_observer("on_host_added", self.added)
+        controller.add_observer("on_host_removed", self.removed)
+        controller.add_observer("on_host_changed", self.changed)
+
+    def added(self, host_idx):
+        self.notifications += 1
+        self.names.insert(host_idx, self.controller[host_idx].name)
+
+    def removed(self, host_idx):
+        self.notifications += 1
+        del self.names[host_idx]
+
+    def changed(self, host_idx):
+        self.notifications += 1
+        assert self.names[host_idx] == self.controller[host_idx].name
+
+    def check(self):
+        assert self.names == [host.name for host in self.controller.hosts()]
+
+
+def run(controller_cls, hosts, events_per_poll):
+    events = stress_events(hosts)
+    event_count = len(events)
+
+    def network_cls(formats, callbacks):
+        return StressNetwork(events, formats, callbacks)
+
+    controller = controller_cls(network_cls, NullMouse())
+    ui = UIList(controller)
+    peak = 0
+    t0 = time.perf_counter()
+    while events:
+        controller.network._poll_budget = events_per_poll
+        controller.poll_events()
+        # what fetch_recent_data() does every frame
+        for host in controller.hosts():
+            host.is_linked
+        peak = max(peak, len(ui.names))
+    wall_time = time.perf_counter() - t0
+
+    ui.check()
+    controller.cleanup()
+    return event_count, ui.notifications, peak, wall_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument(
+        "--events-per-poll",
+        type=int,
+        default=20,
+        help="network events handled per frame",
+    )
+    args = parser.parse_args()
+
+    print(f"{args.hosts} hosts, {args.events_per_poll} events per poll")
+    print(f"{'registry':<12}{'events':>8}{'notified':>10}{'peak':>6}{'us/event':>10}")
+    for name, controller_cls in (
+        ("resorting", ResortingHostController),
+        ("indexed", Host_Controller),
+    ):
+        events, notified, peak, wall_time = run(
+            controller_cls, args.hosts, args.events_per_poll
+        )
+        print(
+            f"{name:<12}{events:>8}{notified:>10}{peak:>6}"
+            f"{wall_time / events * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Marker -> screen lookup of multi-monitor layouts, per scene frame.
+
+ScreenLayout.marker_corners() assigns all detected markers to their screens in one
+pass through arrays indexed by marker id. It is compared with scanning the detected
+ids for each of the four markers of each screen. Also reported are the screen pose
+update of LayoutMapper.track() and the mapping of a gaze batch.
+
+Usage:
+    python benchmarks/bench_layout.py [--screens 3] [--extra-markers 4] [-n 20000]
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from pupil_invisible_monitor.layout import LayoutMapper, Screen, ScreenLayout
+
+
+def make_layout(screens):
+    return ScreenLayout(
+        [
+            Screen(
+                f"screen {idx}",
+                tuple(zip(range(4 * idx, 4 * idx + 4), range(4))),
+                (1920, 1080),
+                (1920 * idx, 0),
+            )
+            for idx in range(screens)
+        ]
+    )
+
+
+def make_detections(layout, extra_markers, rng):
+    """Markers of all screens side by side in the scene, plus unrelated markers."""
+    corners, ids = [], []
+    for idx, screen in enumerate(layout.screens):
+        left, right = 100 + 300 * idx, 350 + 300 * idx
+        quad = np.array([(left, 300), (right, 300), (right, 450), (left, 450)], "f4")
+        for (marker_id, marker_corner), corner in zip(screen.corner_markers, quad):
+            marker = corner + rng.uniform(-20, 20, (4, 2)).astype("f4")
+            marker[marker_corner] = corner
+            corners.append(marker.reshape(1, 4, 2))
+            ids.append(marker_id)
+    for extra in range(extra_markers):
+        corners.append(rng.uniform(0, 1000, (1, 4, 2)).astype("f4"))
+        ids.append(200 + extra)
+    order = rng.permutation(len(ids))
+    return [corners[i] for i in order], np.array(ids)[order].reshape(-1, 1)
+
+
+def per_screen_marker_corners(screens, corners, ids):
+    ids = np.asarray(ids).ravel()
+    markers = np.full((len(screens), 4, 4, 2), np.nan)
+    for screen_idx, screen in enumerate(screens):
+        for corner, (marker_id, _) in enumerate(screen.corner_markers):
+            matches = np.flatnonzero(ids == marker_id)
+            if len(matches):
+                markers[screen_idx, corner] = np.reshape(corners[matches[0]], (4, 2))
+    return markers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--screens", type=int, default=3)
+    parser.add_argument("--extra-markers", type=int, default=4)
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    layout = make_layout(args.screens)
+    corners, ids = make_detections(layout, args.extra_markers, rng)
+
+    markers = layout.marker_corners(corners, ids)
+    expected = per_screen_marker_corners(layout.screens, corners, ids)
+    assert np.array_equal(markers, expected)
+
+    # gaze in the middle of the last screen lands on it, in desktop coordinates
+    mapper = LayoutMapper(layout)
+    assert mapper.track(0.0, markers).all()
+    gaze = mapper.trackers[-1].quad.mean(axis=0)
+    desktop, inside = mapper.map_inside(gaze)
+    assert inside.all() and mapper.screen == len(layout) - 1
+    print(f"gaze {gaze.round(1)} -> desktop {desktop[0].round(1)}")
+
+    def per_call_us(func):
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        return best / args.number * 1e6
+
+    per_screen = per_call_us(
+        lambda: per_screen_marker_corners(layout.screens, corners, ids)
+    )
+    lookup = per_call_us(lambda: layout.marker_corners(corners, ids))
+    tracking = per_call_us(lambda: mapper.track(0.0, markers))
+    mapping = per_call_us(lambda: mapper.map_inside(gaze))
+    print(f"{args.screens} screens, {len(ids)} detected markers")
+    print(f"scan per screen marker      {per_screen:8.2f} us/frame")
+    speedup = per_screen / lookup
+    print(f"ScreenLayout.marker_corners {lookup:8.2f} us/frame ({speedup:.1f}x)")
+    print(f"LayoutMapper.track          {tracking:8.2f} us/frame")
+    print(f"LayoutMapper.map_inside     {mapping:8.2f} us/sample batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Aggregate throughput of multi-host mode with one pipeline per host.
+
+Every fake host replays the same scene video with a synthetic central fixation.
+Frames are processed inline on the calling thread, then on one vision worker per
+host. With workers, frames a busy worker could not take are dropped, so the number
+of processed frames is reported next to the throughput.
+
+Usage:
+    python benchmarks/bench_multi_host.py video.mp4 [--hosts 4] [-n 300]
+"""
+
+import argparse
+import time
+
+import cv2
+
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.models import Host_Controller
+from pupil_invisible_monitor.replay import (
+    ReplayClock,
+    ReplayGazeSensor,
+    ReplayNetwork,
+    ReplayVideoSensor,
+    synthetic_gaze,
+)
+
+
+class MultiReplayNetwork:
+    """Announces several replay hosts through one network stand-in."""
+
+    def __init__(self, networks, formats=(), callbacks=()):
+        self.networks = networks
+        for network in networks:
+            network.callbacks = callbacks
+
+    def start(self):
+        for network in self.networks:
+            network.start()
+
+    def stop(self):
+        for network in self.networks:
+            network.stop()
+
+    @property
+    def has_events(self):
+        return any(network.has_events for network in self.networks)
+
+    def handle_event(self):
+        next(network for network in self.networks if network.has_events).handle_event()
+
+    def sensor(self, sensor_uuid, callbacks=()):
+        for network in self.networks:
+            if sensor_uuid in network._sensors:
+                return network.sensor(sensor_uuid)
+        raise KeyError(sensor_uuid)
+
+
+def wait_for_workers(controller, timeout=5.0):
+    """Waits until every worker took and finished its last submitted frame."""
+    deadline = time.perf_counter() + timeout
+    for pipeline in controller.pipelines():
+        worker = pipeline.vision_worker
+        if worker is None:
+            continue
+        while worker.submitted > worker.processed + worker.dropped + worker.failed:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"{pipeline} is still processing")
+            time.sleep(0.001)
+
+
+def run(video, hosts, max_frames, workers):
+    video_sensors, networks = [], []
+    for idx in range(hosts):
+        clock = ReplayClock()
+        video_sensor = ReplayVideoSensor(f"video-{idx}", video, clock, max_frames)
+        frame_total = video_sensor.capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        width = video_sensor.capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = video_sensor.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        gaze = synthetic_gaze(frame_total / video_sensor.fps, width, height)
+        gaze_sensor = ReplayGazeSensor(f"gaze-{idx}", gaze, clock)
+        video_sensors.append(video_sensor)
+        networks.append(ReplayNetwork((video_sensor, gaze_sensor), f"Host {idx}"))
+
+    def network_cls(formats, callbacks):
+        return MultiReplayNetwork(networks, formats, callbacks)
+
+    processed = 0
+
+    def count(result):
+        nonlocal processed
+        processed += 1
+
+    controller = Host_Controller(network_cls, NullMouse(), multi_host=True)
+    controller.pipeline_factory = lambda host: controller.create_pipeline(
+        NullMouse(), name=host.name
+    )
+    controller.add_observer("on_vision_result", count)
+    if workers:
+        controller.start_vision_worker()
+    try:
+        controller.poll_events()
+        for host in list(controller.hosts()):
+            controller.link(host)
+        t0 = time.perf_counter()
+        while not all(sensor.exhausted for sensor in video_sensors):
+            controller.fetch_recent_data()
+        wait_for_workers(controller)
+        controller.fetch_recent_data()
+        wall_time = time.perf_counter() - t0
+    finally:
+        controller.cleanup()
+    return processed, wall_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("video", help="scene video with screen markers")
+    parser.add_argument("--hosts", type=int, default=4, help="number of fake hosts")
+    parser.add_argument("-n", "--max-frames", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{args.hosts} hosts, {args.max_frames} frames each")
+    print(f"{'mode':<10}{'processed':>11}{'wall s':>9}{'frames/s':>10}")
+    for mode, workers in (("inline", False), ("workers", True)):
+        processed, wall_time = run(args.video, args.hosts, args.max_frames, workers)
+        print(
+            f"{mode:<10}{processed:>11}{wall_time:>9.2f}"
+            f"{processed / wall_time:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Per-call overhead of observed methods, e.g. on_recent_gaze at ~200 Hz.
+
+The cached dispatch of _ObservableMethodWrapper is compared with the previous
+dispatch, which dereferenced and validated every observer reference on each call.
+
+Usage:
+    python benchmarks/bench_observable.py [--observers 4] [-n 200000]
+"""
+
+import argparse
+import timeit
+import types
+
+from pupil_invisible_monitor.observable import (
+    Observable,
+    ObserverError,
+    _ReferenceNoLongerValidError,
+)
+
+
+def previous_call_all_observers(self, args, kwargs):
+    for observer in self._observers:
+        try:
+            observer(*args, **kwargs)
+        except _ReferenceNoLongerValidError:
+            self._observers.remove(observer)
+        except Exception as e:
+            if isinstance(e, ObserverError):
+                raise e
+            else:
+                raise ObserverError("An observer raised an exception.") from e
+
+
+class Source(Observable):
+    def on_recent_gaze(self, gaze):
+        pass
+
+
+class Sink:
+    def update(self, gaze):
+        pass
+
+
+def observed_source(observers):
+    source = Source()
+    # bound methods are referenced weakly, functions strongly, like in the monitor
+    sinks = [Sink() for _ in range(observers)]
+    for idx, sink in enumerate(sinks):
+        if idx % 2:
+            source.add_observer("on_recent_gaze", lambda gaze: None)
+        else:
+            source.add_observer("on_recent_gaze", sink.update)
+    return source, sinks
+
+
+def per_call_us(source, number):
+    gaze = (544.0, 540.0)
+    call = source.on_recent_gaze
+    best = min(timeit.repeat(lambda: call(gaze), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--observers", type=int, default=4)
+    parser.add_argument("-n", "--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    plain = Source()
+    baseline = per_call_us(plain, args.number)
+    print(f"unobserved method: {baseline:.3f} us/call")
+    print(f"{'observers':>9}{'previous us':>13}{'cached us':>11}{'speedup':>9}")
+    for observers in sorted({1, args.observers}):
+        source, sinks = observed_source(observers)
+        cached = per_call_us(source, args.number)
+        wrapper = source.on_recent_gaze
+        wrapper.call_all_observers = types.MethodType(
+            previous_call_all_observers, wrapper
+        )
+        previous = per_call_us(source, args.number)
+        print(
+            f"{observers:>9}{previous:>13.3f}{cached:>11.3f}"
+            f"{previous / cached:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cost of session recording for fetch_recent_data.
+
+A scene video is replayed through Host_Controller with and without a
+SessionRecorder attached, and the session is read back with SessionReader.
+Reported are the mean fetch_recent_data duration of both runs and the cost of
+recording the gaze samples of one poll and a vision result.
+
+Usage:
+    python benchmarks/bench_recorder.py video.mp4 [-n 300]
+"""
+
+import argparse
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.pipeline import VisionResult
+from pupil_invisible_monitor.recorder import SessionReader, SessionRecorder
+from pupil_invisible_monitor.replay import (
+    ReplayClock,
+    ReplayGazeSensor,
+    ReplayHostController,
+    ReplayNetwork,
+    ReplayVideoSensor,
+    synthetic_gaze,
+)
+
+
+def replay(video, max_frames, recorder=None):
+    clock = ReplayClock()
+    video_sensor = ReplayVideoSensor("video", video, clock, max_frames)
+    width = video_sensor.capture.get(3)
+    height = video_sensor.capture.get(4)
+    gaze_sensor = ReplayGazeSensor("gaze", synthetic_gaze(60, width, height), clock)
+
+    def network_cls(formats, callbacks):
+        return ReplayNetwork((video_sensor, gaze_sensor), "Replay", formats, callbacks)
+
+    mouse = NullMouse()
+    if recorder is not None:
+        mouse = recorder.recording_mouse(mouse)
+    controller = ReplayHostController(video_sensor, network_cls, mouse)
+    if recorder is not None:
+        recorder.attach(controller)
+    durations = []
+    try:
+        controller.poll_events()
+        controller.link(controller[0])
+        while not video_sensor.exhausted:
+            t0 = time.perf_counter()
+            controller.fetch_recent_data()
+            durations.append(time.perf_counter() - t0)
+    finally:
+        controller.cleanup()
+    return np.mean(durations) * 1000
+
+
+def record_cost_us(recorder, number=20000):
+    quad = np.array([(100.0, 100.0), (1000.0, 100.0), (1000.0, 700.0), (100.0, 700.0)])
+    result = VisionResult(
+        1.0, (540.0, 544.0), [42, 24, 70, 66], (960.0, 540.0), "Replay", quad, np.eye(3)
+    )
+    # ~200 Hz gaze polled at ~30 Hz
+    samples = np.column_stack((np.arange(6) / 200, np.full((6, 2), 540.0)))
+    gaze = timeit.timeit(
+        lambda: recorder.on_gaze_samples("Replay", samples), number=number
+    )
+    vision = timeit.timeit(lambda: recorder.on_vision_result(result), number=number)
+    return gaze / number * 1e6, vision / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("video", help="scene video with screen markers")
+    parser.add_argument("-n", "--max-frames", type=int, default=300)
+    args = parser.parse_args()
+
+    plain = replay(args.video, args.max_frames)
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = SessionRecorder(directory, chunk_size=64)
+        recorded = replay(args.video, args.max_frames, recorder)
+        recorder.close()
+
+        reader = SessionReader(directory)
+        counts = {name: len(reader[name]) for name in reader.streams}
+        mapped = np.isfinite(reader["vision"]["screen_pos"][:, 0]).mean()
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = SessionRecorder(directory)
+        gaze_us, vision_us = record_cost_us(recorder)
+        recorder.close()
+
+    print(f"fetch_recent_data: {plain:.3f} ms, recording {recorded:.3f} ms")
+    print(f"per call: gaze samples {gaze_us:.2f} us, vision {vision_us:.2f} us")
+    print(f"recorded {counts}, {mapped:.0%} of the vision records mapped")
+
+
+if __name__ == "__main__":
+    main()
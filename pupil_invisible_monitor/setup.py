@@ -25,5 +25,5 @@ setup(
     include_package_data=True,
     entry_points={"console_scripts": [f"{package}={package}.__main__:main"]},
     install_requires=requirements,
-    extras_require={"deploy": ["pyinstaller", "packaging"]},
+    extras_require={"deploy": ["pyinstaller", "packaging"], "test": ["pytest>=7"]},
 )
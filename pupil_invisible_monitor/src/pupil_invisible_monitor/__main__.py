@@ -1,18 +1,14 @@
 import logging.handlers
 import os
+import signal
 import sys
 from pathlib import Path
 
 ### Libraries for threading functions
 import threading 
-from queue import Queue
+import time
 
-### Libraries for the mouse and speech recognition
-import mouse
-import sounddevice as sd
-import vosk
 import argparse
-import json
 
 
 if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
@@ -20,57 +16,135 @@ if getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS"):
     lib_path = next(meipass.glob("*glfw*"), None)
     os.environ["PYGLFW_LIBRARY"] = str(lib_path)
 
+# must run before the imports below, which would otherwise be cached already
+if __name__ == "__main__" and "--profile-startup" in sys.argv:
+    from .startup import print_import_profile, profile_imports
+
+    print_import_profile(profile_imports())
+
+### Libraries for speech recognition, the mouse is imported by MouseActuator
+import sounddevice as sd
+import vosk
+
+from .actuator import MouseActuator, NullMouse
+from .audio import AudioRingBuffer, EnergyVAD, PassThroughVAD
+from .dwell import add_dwell_arguments, dwell_clicker_from_args
+from .filters import add_filter_arguments, filter_from_args
+from .headless import HeadlessScheduler
+from .layout import add_layout_arguments, screen_layout_from_args
+from .markers import (
+    ARUCO_DICTS,
+    DEFAULT_ARUCO_DICT,
+    add_detector_profile_arguments,
+    detector_profile_from_args,
+)
+from .metrics import PIPELINE_STAGES, MetricsRegistry
 from .models import Host_Controller
-from .overlay import GazeOverlay
-from .texture import PITextureController
-from .ui import HostViewController
-from .window import Window
+from .pipeline import HostConfig, load_host_configs
+from .recorder import SessionRecorder
+from .voice import CommandRecognizer, make_recognizer, recognize
 
 
 ### Function that runs in parallel with the video processing
-def audio_recognition (args, q_vosk, model, dump_fn):
+def audio_recognition (args, audio_buffer, model, dump_fn, actuator, metrics=None):
         
    
-    with sd.RawInputStream(samplerate=args.samplerate, blocksize = 8000, device=args.device, dtype='int16',
+    with sd.RawInputStream(samplerate=args.samplerate, blocksize=args.blocksize, device=args.device, dtype='int16',
                         channels=1, callback=callback):
       
 
-        rec = vosk.KaldiRecognizer(model, args.samplerate)
-        while True:
-            data = q_vosk.get()
-            if rec.AcceptWaveform(data):
-                
-                dictResult = json.loads(rec.Result())
-                
-                # Keywords for the mouse actions
-                if "sélection" in dictResult.get("text"):
-                      print("[LEFT CLICK]")
-                      mouse.click("left")
-                 
-                if "option" in dictResult.get("text"):        
-                    print("[RIGHT CLICK]")
-                    mouse.click("right")
-                    
-                if "montée" in dictResult.get("text"):
-                    print("[UP]")
-                    mouse.wheel(1)
-                    
-                if "descente" in dictResult.get("text"):
-                    print("[DOWN]")
-                    mouse.wheel(-1)
-                    
-            else:
-                pass
-               # print(rec.PartialResult())
-            if dump_fn is not None:
-                dump_fn.write(data)
-   
+        # Keywords for the mouse actions are defined in voice.COMMANDS
+        rec = make_recognizer(
+            model, args.samplerate, command_mode=not args.open_vocabulary
+        )
+        commands = CommandRecognizer(
+            rec,
+            actuator,
+            args.samplerate,
+            fire_on_partial=not args.open_vocabulary,
+            stable_partials=args.stable_partials,
+            metrics=metrics,
+        )
+        # silent blocks are skipped, the end of speech finalizes the utterance
+        if args.no_vad:
+            vad = PassThroughVAD()
+        else:
+            vad = EnergyVAD(threshold_db=args.vad_threshold)
+        if metrics is not None:
+            metrics.add_gauge("vad", vad.stats)
+            metrics.add_gauge("voice_commands", commands.stats)
+        # until the buffer is closed
+        recognize(iter(audio_buffer.get, None), commands, vad, dump_fn)
+
+
+def run_window(host_controller, metrics):
+    """Preview window with the scene video, gaze overlay, host list and metrics."""
+    # GLFW and pyglui are only needed, and only imported, with the window
+    from .overlay import GazeOverlay
+    from .polling import SensorPoller
+    from .texture import PITextureController
+    from .ui import HostViewController, MetricsViewController
+    from .window import Window
+
+    # frame observer
+    texture_controller = PITextureController()
+    host_controller.add_observer("on_host_linked", texture_controller.reset)
+    host_controller.add_observer("on_recent_frame", texture_controller.update)
+
+    gaze_overlay = GazeOverlay()
+    host_controller.add_observer("on_recent_gaze", gaze_overlay.update)
+
+    win = Window(
+        texture_controller,
+        frame_rate=60.0,
+        callables=[host_controller.poll_events, host_controller.fetch_recent_data],
+        draw_callables=[gaze_overlay.draw],
+        metrics=metrics,
+    )
+    # redraw only for new frames, gaze or host changes, or UI events
+    for event in (
+        "on_recent_frame",
+        "on_recent_gaze",
+        "on_host_added",
+        "on_host_removed",
+        "on_host_changed",
+    ):
+        host_controller.add_observer(event, win.event_loop.mark_dirty)
+    # sleep until sensor data arrives instead of polling at 60 Hz
+    win.event_loop.wait_for_data = SensorPoller(host_controller).wait
+    metrics.add_gauge("event_loop", win.event_loop.stats)
+    win.open()
+    host_view_controller = HostViewController(
+        gui_parent=win.quickbar, controller=host_controller
+    )
+    metrics_view_controller = MetricsViewController(
+        gui_parent=win.gui,
+        metrics=metrics,
+        stages=PIPELINE_STAGES + ("voice", "draw", "jitter"),
+    )
+    win.event_loop.callables.append(metrics_view_controller.update)
+    try:
+        win.run_event_loop()
+    finally:
+        win.close()
+        host_view_controller.cleanup()
+        metrics_view_controller.cleanup()
+
+
+def run_headless(host_controller, host_name, metrics):
+    """Gaze mouse without window, until interrupted or terminated."""
+    scheduler = HeadlessScheduler(host_controller, host_name, metrics=metrics)
+    # e.g. when stopped as a service
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.run()
+    finally:
+        logging.getLogger(__name__).debug(f"Scheduler stats: {scheduler.stats()}")
+
 
 if __name__ == "__main__":
     
     
-    q_vosk = Queue()
-
     def int_or_str(text):
         """Helper function for argument parsing."""
         try:
@@ -78,11 +152,11 @@ if __name__ == "__main__":
         except ValueError:
             return text
     
-    def callback(indata, frames, time, status):
+    def callback(indata, frames, time_info, status):
         """This is called (from a separate thread) for each audio block."""
         if status:
             print(status, file=sys.stderr)
-        q_vosk.put(bytes(indata))
+        audio_buffer.put(indata, time.monotonic())
     
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument(
@@ -107,6 +181,63 @@ if __name__ == "__main__":
         help='input device (numeric ID or substring)')
     parser.add_argument(
         '-r', '--samplerate', type=int, help='sampling rate')
+    parser.add_argument(
+        '--blocksize', type=int, metavar='SAMPLES',
+        help='audio block size, defaults to 100 ms')
+    parser.add_argument(
+        '--max-audio-delay', type=float, default=1.0, metavar='SECONDS',
+        help='drop the oldest audio if recognition falls further behind')
+    parser.add_argument(
+        '--vad-threshold', type=float, default=12.0, metavar='DB',
+        help='voice activity threshold above the noise floor')
+    parser.add_argument(
+        '--no-vad', action='store_true',
+        help='pass all audio to the recognizer, including silence')
+    parser.add_argument(
+        '--open-vocabulary', action='store_true',
+        help='recognize free speech and act on final results only, '
+        'instead of the command grammar and partial results')
+    parser.add_argument(
+        '--stable-partials', type=int, default=2, metavar='N',
+        help='fire a command once it was recognized in N consecutive partial results')
+    parser.add_argument(
+        '--move-threshold', type=float, default=2.0, metavar='PIXELS',
+        help='skip cursor moves shorter than this')
+    parser.add_argument(
+        '--max-move-rate', type=float, default=120.0, metavar='HZ',
+        help='maximum number of cursor moves per second')
+    parser.add_argument(
+        '--detection-width', type=int, metavar='PIXELS',
+        help='downscale the scene image to this width before marker detection')
+    parser.add_argument(
+        '-t', '--type', choices=ARUCO_DICTS, default=DEFAULT_ARUCO_DICT,
+        help='type of ArUco markers to detect')
+    parser.add_argument(
+        '--profile-startup', action='store_true',
+        help='print the import time of the heavy dependencies on startup')
+    parser.add_argument(
+        '--multi-host', action='store_true',
+        help='link several hosts at once, each processed on its own worker')
+    parser.add_argument(
+        '--hosts-config', type=str, metavar='FILENAME',
+        help='JSON file with the markers, screen size and output of each host')
+    parser.add_argument(
+        '--metrics-json', type=str, metavar='FILENAME',
+        help='write the pipeline stage timings to this file on exit')
+    parser.add_argument(
+        '--headless', action='store_true',
+        help='run without preview window, e.g. as a background service')
+    parser.add_argument(
+        '--host', type=str, metavar='NAME',
+        help='headless: link this host, defaults to the first available host')
+    parser.add_argument(
+        '--record-session', nargs='?', const='', metavar='DIRECTORY',
+        help='record gaze, frames, mapping and mouse actions, by default to '
+        '~/pi_monitor_settings/sessions')
+    add_filter_arguments(parser)
+    add_dwell_arguments(parser)
+    add_layout_arguments(parser)
+    add_detector_profile_arguments(parser)
     args = parser.parse_args(remaining)
     
     
@@ -121,6 +252,12 @@ if __name__ == "__main__":
         device_info = sd.query_devices(args.device, 'input')
         # soundfile expects an int, sounddevice provides a float:
         args.samplerate = int(device_info['default_samplerate'])
+    if args.blocksize is None:
+        args.blocksize = args.samplerate // 10
+    audio_buffer = AudioRingBuffer(
+        max(1, round(args.max_audio_delay * args.samplerate / args.blocksize)),
+        args.blocksize,
+    )
     
     model = vosk.Model(args.model)
     print('MODELLLLLLLLLLLLLLLLL :'+ str(model))
@@ -131,8 +268,26 @@ if __name__ == "__main__":
         
      
     ### Threading ###
-        
-    thr = threading.Thread(target = audio_recognition, args = (args, q_vosk, model, dump_fn,) )
+
+    # all mouse moves, clicks and scrolls go through one thread, in order
+    actuator = MouseActuator(
+        min_distance=args.move_threshold, max_rate=args.max_move_rate
+    )
+    actuator.start()
+
+    recorder = None
+    mouse_out = actuator
+    if args.record_session is not None:
+        recorder = SessionRecorder(args.record_session or None)
+        # voice commands, dwell clicks and cursor moves are recorded on the way out
+        mouse_out = recorder.recording_mouse(actuator)
+
+    # shared by the audio thread (voice command latency) and the vision pipeline
+    metrics = MetricsRegistry()
+
+    metrics.add_gauge("audio_buffer", audio_buffer.stats)
+
+    thr = threading.Thread(target = audio_recognition, args = (args, audio_buffer, model, dump_fn, mouse_out, metrics,) )
     thr.start()
     
     
@@ -153,37 +308,50 @@ if __name__ == "__main__":
     logger = logging.getLogger(__name__)
     
  
-    try:
-        host_controller = Host_Controller()
+    def configure_pipeline(pipeline):
+        pipeline.cursor_filter = filter_from_args(args)
+        pipeline.dwell_clicker = dwell_clicker_from_args(args, pipeline.mouse)
+        pipeline.image_preprocessor.target_width = args.detection_width
+        pipeline.image_preprocessor.target_scale = detector_profile.detection_scale
 
-        # frame observer
-        texture_controller = PITextureController()
-        host_controller.add_observer("on_host_linked", texture_controller.reset)
-        host_controller.add_observer("on_recent_frame", texture_controller.update)
+    host_configs = load_host_configs(args.hosts_config) if args.hosts_config else {}
 
-        gaze_overlay = GazeOverlay()
-        
-            
-        host_controller.add_observer("on_recent_gaze", gaze_overlay.update)
-        
-        
-        win = Window(
-            texture_controller,
-            frame_rate=60.0,
-            callables=[
-                host_controller.poll_events,
-                host_controller.fetch_recent_data,
-                gaze_overlay.draw
-             
-            ],
+    def create_host_pipeline(host):
+        """Pipeline of a host in multi-host mode, unconfigured hosts get no output."""
+        config = host_configs.get(host.name, HostConfig())
+        mouse_sink = mouse_out if config.output == "mouse" else NullMouse()
+        pipeline = host_controller.create_pipeline(
+            mouse_sink, host.name, config.corner_markers, config.screen_size
         )
-        win.open()
-        host_view_controller = HostViewController(
-            gui_parent=win.quickbar, controller=host_controller
+        configure_pipeline(pipeline)
+        return pipeline
+
+    host_controller = None
+    try:
+        detector_profile = detector_profile_from_args(args)
+        host_controller = Host_Controller(
+            mouse_sink=mouse_out,
+            aruco_dict=args.type,
+            aruco_parameters=detector_profile.parameters,
+            metrics=metrics,
+            multi_host=args.multi_host,
+            screen_layout=screen_layout_from_args(args),
         )
-        
-    
-        win.run_event_loop()
+        if host_controller.pipeline is not None:
+            configure_pipeline(host_controller.pipeline)
+        host_controller.pipeline_factory = create_host_pipeline
+        # keep marker detection and mouse moves off the render loop, without window
+        # frames are processed inline unless several hosts run in parallel
+        if not args.headless or args.multi_host:
+            host_controller.start_vision_worker()
+        host_controller.metrics.add_gauge("mouse_actuator", actuator.stats)
+        if recorder is not None:
+            recorder.attach(host_controller)
+
+        if args.headless:
+            run_headless(host_controller, args.host, metrics)
+        else:
+            run_window(host_controller, metrics)
     except KeyboardInterrupt:
         pass
     except Exception:
@@ -192,7 +360,14 @@ if __name__ == "__main__":
             if isinstance(handler, logging.handlers.RotatingFileHandler):
                 handler.doRollover()
     finally:
-        win.close()
-        host_controller.cleanup()
-        host_view_controller.cleanup()
+        if host_controller is not None:
+            host_controller.cleanup()
+        # ends audio_recognition
+        audio_buffer.close()
+        actuator.stop()
+        logger.debug(f"Mouse actuator stats: {actuator.stats()}")
+        if recorder is not None:
+            recorder.close()
+        if args.metrics_json:
+            metrics.dump_json(args.metrics_json)
         logging.shutdown()
@@ -0,0 +1,149 @@
+import logging
+import math
+import queue
+import threading
+import time
+import typing as T
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class NullMouse:
+    """No-op replacement for the `mouse` module that only remembers the calls."""
+
+    def __init__(self):
+        self.moves = 0
+        self.clicks = 0
+        self.wheels = 0
+        self.position = None
+
+    def move(self, x, y, absolute=True, duration=0):
+        self.moves += 1
+        self.position = x, y
+
+    def click(self, button="left"):
+        self.clicks += 1
+
+    def wheel(self, delta=1):
+        self.wheels += 1
+
+
+class MouseActuator:
+    """
+    Single thread that performs all OS input injection, fed through a queue.
+
+    Has the move/click/wheel interface of the `mouse` module and can be used in its
+    place. Pending absolute moves are merged into the latest target, moves closer than
+    `min_distance` pixels to the current cursor position are skipped and moves are
+    sent at most `max_rate` times per second. Clicks, scrolls and relative moves are
+    executed in submission order; a move submitted before a click is always performed
+    before that click, so the click does not land at a stale position.
+    """
+
+    def __init__(self, mouse_sink=None, min_distance: float = 2.0, max_rate=120.0):
+        if mouse_sink is None:
+            import mouse as mouse_sink
+        self._mouse = mouse_sink
+        self.min_distance = min_distance
+        self._min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="mouse-actuator", daemon=True
+        )
+        self._position = None
+        self._last_move_time = -math.inf
+        self.moves_requested = 0
+        self.moves_sent = 0
+        self.moves_coalesced = 0
+        self.moves_skipped = 0
+        self.commands = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._queue.put(_STOP)
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def move(self, x, y, absolute=True, duration=0):
+        self.moves_requested += 1
+        if absolute and not duration:
+            self._queue.put(("move_to", (x, y)))
+        else:
+            self._queue.put(("move", (x, y, absolute, duration)))
+
+    def click(self, button="left"):
+        self._queue.put(("click", (button,)))
+
+    def wheel(self, delta=1):
+        self._queue.put(("wheel", (delta,)))
+
+    def stats(self) -> T.Dict[str, int]:
+        return {
+            "moves_requested": self.moves_requested,
+            "moves_sent": self.moves_sent,
+            "moves_coalesced": self.moves_coalesced,
+            "moves_skipped": self.moves_skipped,
+            "commands": self.commands,
+        }
+
+    def _run(self):
+        pending = None
+        while True:
+            timeout = None
+            if pending is not None:
+                next_move = self._last_move_time + self._min_interval
+                timeout = max(0.0, next_move - time.monotonic())
+            try:
+                command = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                command = None
+
+            if command is _STOP:
+                if pending is not None:
+                    self._send_move(pending)
+                return
+            if command is not None:
+                name, args = command
+                if name == "move_to":
+                    if pending is not None:
+                        self.moves_coalesced += 1
+                    pending = args
+                else:
+                    # keep the order relative to moves submitted earlier
+                    if pending is not None:
+                        self._send_move(pending)
+                        pending = None
+                    self._execute(name, args)
+
+            rate_limited = time.monotonic() - self._last_move_time < self._min_interval
+            if pending is not None and not rate_limited:
+                self._send_move(pending)
+                pending = None
+
+    def _send_move(self, target):
+        if self._position is not None:
+            distance = math.hypot(
+                target[0] - self._position[0], target[1] - self._position[1]
+            )
+            if distance < self.min_distance:
+                self.moves_skipped += 1
+                return
+        self._execute("move", (target[0], target[1], True, 0))
+        self._position = target
+        self._last_move_time = time.monotonic()
+        self.moves_sent += 1
+
+    def _execute(self, name, args):
+        if name == "move":
+            # the position after a relative move is unknown
+            self._position = args[:2] if args[2] else None
+        else:
+            self.commands += 1
+        try:
+            getattr(self._mouse, name)(*args)
+        except Exception:
+            logger.exception(f"mouse.{name}{args} failed")
@@ -0,0 +1,189 @@
+"""
+Audio capture buffering and voice activity detection ahead of the speech recognizer.
+
+The sounddevice callback writes blocks into a preallocated ring buffer that drops the
+oldest block when the recognizer falls behind, which caps the delay between speaking
+and recognition at the buffer length. Blocks without voice activity never reach the
+recognizer, so it is idle during silence.
+"""
+
+import collections
+import logging
+import threading
+import typing as T
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AudioRingBuffer:
+    """
+    Bounded FIFO of int16 audio blocks of up to `block_size` samples, backed by one
+    preallocated array. put() never blocks: if the buffer is full, the oldest block
+    is overwritten and counted as dropped.
+    """
+
+    def __init__(self, capacity: int, block_size: int):
+        self.capacity = capacity
+        self.block_size = block_size
+        self._blocks = np.zeros((capacity, block_size), dtype=np.int16)
+        self._lengths = np.zeros(capacity, dtype=np.intp)
+        self._capture_times = np.zeros(capacity)
+        self._read_idx = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._size
+
+    def put(self, data, capture_time: float):
+        """Copies one block (bytes-like int16 samples), e.g. from the audio callback."""
+        samples = np.frombuffer(data, dtype=np.int16)[: self.block_size]
+        with self._cond:
+            if self._size == self.capacity:
+                self._read_idx = (self._read_idx + 1) % self.capacity
+                self._size -= 1
+                self.dropped += 1
+            idx = (self._read_idx + self._size) % self.capacity
+            self._blocks[idx, : len(samples)] = samples
+            self._lengths[idx] = len(samples)
+            self._capture_times[idx] = capture_time
+            self._size += 1
+            self.received += 1
+            self._cond.notify()
+
+    def get(self, timeout=None) -> T.Optional[T.Tuple[float, bytes]]:
+        """
+        Oldest (capture time, block) pair. Blocks until a block is available, returns
+        None on timeout or after close().
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size or self._closed, timeout):
+                return None
+            if not self._size:
+                return None
+            idx = self._read_idx
+            data = self._blocks[idx, : self._lengths[idx]].tobytes()
+            capture_time = float(self._capture_times[idx])
+            self._read_idx = (idx + 1) % self.capacity
+            self._size -= 1
+            return capture_time, data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> T.Dict[str, int]:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "queued": self._size,
+        }
+
+
+class EnergyVAD:
+    """
+    Voice activity detection from block energy and zero-crossing rate.
+
+    A block is voiced if its energy exceeds the tracked noise floor by `threshold_db`,
+    or by half of it for blocks with a zero-crossing rate above `zcr_threshold`, which
+    catches quiet fricatives such as the "s" of "sélection". process() passes the
+    `preroll` blocks before the onset and `hangover` blocks after the last voiced block
+    on to the recognizer, then reports the end of the utterance.
+    """
+
+    def __init__(
+        self,
+        threshold_db=12.0,
+        zcr_threshold=0.25,
+        preroll=2,
+        hangover=4,
+        floor_adaptation=0.05,
+    ):
+        self.threshold_db = threshold_db
+        self.zcr_threshold = zcr_threshold
+        self.hangover = hangover
+        self.floor_adaptation = floor_adaptation
+        self.noise_floor_db = None
+        self._preroll = collections.deque(maxlen=preroll)
+        self._remaining = 0
+        self.blocks = 0
+        self.voiced_blocks = 0
+        self.passed_blocks = 0
+
+    @property
+    def in_utterance(self) -> bool:
+        return self._remaining > 0
+
+    def is_voiced(self, data: bytes) -> bool:
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        if not len(samples):
+            return False
+        rms = np.sqrt(np.mean(samples * samples)) / 32768.0
+        # floored at -100 dBFS, such that digital silence does not pin the noise floor
+        energy_db = 20 * np.log10(rms + 1e-5)
+        zcr = np.count_nonzero(np.diff(np.signbit(samples))) / len(samples)
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = energy_db
+        above_floor = energy_db - self.noise_floor_db
+        voiced = above_floor > self.threshold_db or (
+            above_floor > self.threshold_db / 2 and zcr > self.zcr_threshold
+        )
+        if energy_db < self.noise_floor_db:
+            self.noise_floor_db = energy_db
+        elif not voiced:
+            self.noise_floor_db += self.floor_adaptation * above_floor
+        return voiced
+
+    def process(
+        self, capture_time: float, data: bytes
+    ) -> T.Tuple[T.List[T.Tuple[float, bytes]], bool]:
+        """
+        Returns the (capture time, block) pairs to pass to the recognizer, and whether
+        the current utterance ended with this block.
+        """
+        self.blocks += 1
+        if self.is_voiced(data):
+            self.voiced_blocks += 1
+            blocks = [] if self.in_utterance else list(self._preroll)
+            self._preroll.clear()
+            blocks.append((capture_time, data))
+            self._remaining = self.hangover + 1
+            self.passed_blocks += len(blocks)
+            return blocks, False
+
+        if self.in_utterance:
+            self._remaining -= 1
+            if not self._remaining:
+                return [], True
+            self.passed_blocks += 1
+            return [(capture_time, data)], False
+
+        self._preroll.append((capture_time, data))
+        return [], False
+
+    def stats(self) -> T.Dict[str, T.Any]:
+        return {
+            "blocks": self.blocks,
+            "voiced_blocks": self.voiced_blocks,
+            "passed_blocks": self.passed_blocks,
+            "noise_floor_db": self.noise_floor_db,
+        }
+
+
+class PassThroughVAD:
+    """Passes every block on, used with --no-vad."""
+
+    in_utterance = True
+
+    def process(self, capture_time: float, data: bytes):
+        return [(capture_time, data)], False
+
+    def stats(self):
+        return {}
@@ -0,0 +1,215 @@
+"""
+Replay of an audio recording through the voice command pipeline.
+
+The recording is cut into blocks like the microphone stream and passed through the
+same voice activity detection and recognizer as in the monitor, with clicks going to
+a no-op mouse. Blocks are fed either at real-time pace or as fast as possible. In the
+latter case, command times and latencies are in seconds of audio.
+
+Accepts WAV files and raw int16 mono recordings, e.g. written with --filename.
+
+Usage:
+    python -m pupil_invisible_monitor.audio_replay recording.wav -m model
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+import typing as T
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from .actuator import NullMouse
+from .audio import EnergyVAD, PassThroughVAD
+from .voice import CommandRecognizer, make_recognizer, recognize
+
+logger = logging.getLogger(__name__)
+
+
+def load_audio(path, samplerate: T.Optional[int] = None) -> T.Tuple[np.ndarray, int]:
+    """
+    Returns the int16 samples of the first channel of a WAV file, or of a raw int16
+    mono file, whose `samplerate` must be given, and the sample rate.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".wav":
+        with wave.open(str(path), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16 bit WAV files are supported")
+            frames = wav.readframes(wav.getnframes())
+            samples = np.frombuffer(frames, dtype="<i2").reshape(-1, wav.getnchannels())
+            return np.ascontiguousarray(samples[:, 0]), wav.getframerate()
+    if samplerate is None:
+        raise ValueError(f"{path}: the sample rate of raw recordings must be given")
+    return np.fromfile(path, dtype="<i2"), samplerate
+
+
+class ReplayAudioClock:
+    """Seconds since the start of the recording, real or of fed audio."""
+
+    def __init__(self, realtime: bool):
+        self.realtime = realtime
+        self.start = time.monotonic()
+        self.position = 0.0
+
+    def __call__(self) -> float:
+        if self.realtime:
+            return time.monotonic() - self.start
+        return self.position
+
+
+def audio_blocks(samples: np.ndarray, samplerate: int, blocksize: int, clock):
+    """Yields (capture time, block) pairs, paced by the clock in real-time mode."""
+    for start in range(0, len(samples), blocksize):
+        block = samples[start : start + blocksize]
+        clock.position = (start + len(block)) / samplerate
+        if clock.realtime:
+            time.sleep(max(0.0, clock.position - clock()))
+        yield clock(), block.tobytes()
+
+
+def run_audio_replay(
+    audio_path,
+    model_path,
+    samplerate=None,
+    blocksize=None,
+    realtime=False,
+    command_mode=True,
+    stable_partials=2,
+    vad=True,
+    vad_threshold=12.0,
+):
+    import vosk
+
+    samples, samplerate = load_audio(audio_path, samplerate)
+    blocksize = blocksize or samplerate // 10
+    audio_time = len(samples) / samplerate
+
+    model = vosk.Model(str(model_path))
+    clock = ReplayAudioClock(realtime)
+    null_mouse = NullMouse()
+    commands = CommandRecognizer(
+        make_recognizer(model, samplerate, command_mode=command_mode),
+        null_mouse,
+        samplerate,
+        fire_on_partial=command_mode,
+        stable_partials=stable_partials,
+        clock=clock,
+    )
+    activity = EnergyVAD(threshold_db=vad_threshold) if vad else PassThroughVAD()
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    clock.start = time.monotonic()
+    recognize(audio_blocks(samples, samplerate, blocksize, clock), commands, activity)
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+
+    latencies = np.array(commands.latencies) * 1000
+    return {
+        "audio": str(audio_path),
+        "audio_time_s": audio_time,
+        "wall_time_s": wall_time,
+        "realtime_factor": wall_time / audio_time if audio_time else 0.0,
+        "cpu_s_per_audio_s": cpu_time / audio_time if audio_time else 0.0,
+        "commands": [
+            {
+                "time_s": round(event.fired_at, 3),
+                "word": event.word,
+                "action": commands.commands[event.word].label,
+                "source": event.source,
+            }
+            for event in commands.events
+        ],
+        "latency_ms": {
+            "mean": float(latencies.mean()) if len(latencies) else None,
+            "p50": float(np.median(latencies)) if len(latencies) else None,
+            "max": float(latencies.max()) if len(latencies) else None,
+        },
+        "clicks": null_mouse.clicks,
+        "wheels": null_mouse.wheels,
+        "vad": activity.stats(),
+    }
+
+
+def print_report(report):
+    print(
+        f"Replayed {report['audio_time_s']:.1f} s of audio "
+        f"in {report['wall_time_s']:.2f} s: "
+        f"real-time factor {report['realtime_factor']:.3f}, "
+        f"{report['cpu_s_per_audio_s']:.3f} CPU s per s of audio"
+    )
+    for command in report["commands"]:
+        print(
+            f"{command['time_s']:>9.3f} s  {command['word']:<12}"
+            f"[{command['action']}] ({command['source']})"
+        )
+    latency = report["latency_ms"]
+    if latency["mean"] is not None:
+        print(
+            f"end of word to command: mean {latency['mean']:.0f} ms, "
+            f"p50 {latency['p50']:.0f} ms, max {latency['max']:.0f} ms"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay an audio recording through the voice command pipeline."
+    )
+    parser.add_argument("audio", help="WAV file or raw int16 mono recording")
+    parser.add_argument("-m", "--model", default="model", help="path to the model")
+    parser.add_argument(
+        "-r", "--samplerate", type=int, help="sample rate of raw recordings"
+    )
+    parser.add_argument(
+        "--blocksize", type=int, help="audio block size, defaults to 100 ms"
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="feed the audio at real-time pace instead of as fast as possible",
+    )
+    parser.add_argument(
+        "--open-vocabulary",
+        action="store_true",
+        help="recognize free speech and act on final results only",
+    )
+    parser.add_argument(
+        "--stable-partials",
+        type=int,
+        default=2,
+        help="fire a command once it was recognized in N consecutive partial results",
+    )
+    parser.add_argument("--vad-threshold", type=float, default=12.0)
+    parser.add_argument("--no-vad", action="store_true")
+    parser.add_argument("-o", "--output", help="write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    import vosk
+
+    vosk.SetLogLevel(-1)
+
+    report = run_audio_replay(
+        args.audio,
+        args.model,
+        samplerate=args.samplerate,
+        blocksize=args.blocksize,
+        realtime=args.realtime,
+        command_mode=not args.open_vocabulary,
+        stable_partials=args.stable_partials,
+        vad=not args.no_vad,
+        vad_threshold=args.vad_threshold,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Dwell clicking: a click is emitted when the mapped screen gaze stays in one place for
+longer than the dwell time.
+
+Fixations are detected incrementally, each gaze sample costs O(1) (amortized for
+I-DT): the dispersion detector keeps the running minimum and maximum of the current
+window in monotonic deques, both detectors keep running sums for the centroid.
+"""
+
+import argparse
+import collections
+import logging
+import math
+import typing as T
+
+logger = logging.getLogger(__name__)
+
+
+class DispersionFixationDetector:
+    """
+    I-DT: the current fixation is the longest recent window of samples whose
+    dispersion, (max x - min x) + (max y - min y), is at most `max_dispersion` pixels.
+    Samples that leave the window are dropped from its start, so the window follows
+    the gaze but its duration only grows while the gaze stays in place.
+    """
+
+    def __init__(self, max_dispersion=40.0, min_duration=0.1, max_gap=0.1):
+        self.max_dispersion = max_dispersion
+        self.min_duration = min_duration
+        # samples further apart than this (seconds) do not belong to one fixation
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        # (index, ts, x, y) of the samples in the window
+        self._window = collections.deque()
+        # (index, value), monotonic such that the front is the extremum
+        self._min_x = collections.deque()
+        self._max_x = collections.deque()
+        self._min_y = collections.deque()
+        self._max_y = collections.deque()
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._count = 0
+
+    @property
+    def duration(self) -> float:
+        if not self._window:
+            return 0.0
+        return self._window[-1][1] - self._window[0][1]
+
+    @property
+    def is_fixation(self) -> bool:
+        return self.duration >= self.min_duration
+
+    @property
+    def dispersion(self) -> float:
+        if not self._window:
+            return 0.0
+        width = self._max_x[0][1] - self._min_x[0][1]
+        height = self._max_y[0][1] - self._min_y[0][1]
+        return width + height
+
+    def centroid(self) -> T.Optional[T.Tuple[float, float]]:
+        if not self._window:
+            return None
+        return self._sum_x / len(self._window), self._sum_y / len(self._window)
+
+    def add(self, ts: float, x: float, y: float):
+        if self._window and ts - self._window[-1][1] > self.max_gap:
+            self.reset()
+        idx = self._count
+        self._count += 1
+        self._window.append((idx, ts, x, y))
+        self._sum_x += x
+        self._sum_y += y
+        # drop the entries the new sample dominates, the fronts stay the extrema
+        while self._min_x and self._min_x[-1][1] >= x:
+            self._min_x.pop()
+        self._min_x.append((idx, x))
+        while self._max_x and self._max_x[-1][1] <= x:
+            self._max_x.pop()
+        self._max_x.append((idx, x))
+        while self._min_y and self._min_y[-1][1] >= y:
+            self._min_y.pop()
+        self._min_y.append((idx, y))
+        while self._max_y and self._max_y[-1][1] <= y:
+            self._max_y.pop()
+        self._max_y.append((idx, y))
+
+        while self.dispersion > self.max_dispersion:
+            old_idx, _, old_x, old_y = self._window.popleft()
+            self._sum_x -= old_x
+            self._sum_y -= old_y
+            for extremes in (self._min_x, self._max_x, self._min_y, self._max_y):
+                if extremes[0][0] == old_idx:
+                    extremes.popleft()
+
+
+class VelocityFixationDetector:
+    """
+    I-VT: the current fixation is the run of samples since the last sample whose
+    point-to-point velocity exceeded `max_velocity` pixels per second.
+    """
+
+    def __init__(self, max_velocity=2000.0, min_duration=0.1, max_gap=0.1):
+        self.max_velocity = max_velocity
+        self.min_duration = min_duration
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self._start_ts = None
+        self._last = None
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._n = 0
+
+    @property
+    def duration(self) -> float:
+        if self._last is None:
+            return 0.0
+        return self._last[0] - self._start_ts
+
+    @property
+    def is_fixation(self) -> bool:
+        return self.duration >= self.min_duration
+
+    def centroid(self) -> T.Optional[T.Tuple[float, float]]:
+        if not self._n:
+            return None
+        return self._sum_x / self._n, self._sum_y / self._n
+
+    def add(self, ts: float, x: float, y: float):
+        if self._last is not None:
+            last_ts, last_x, last_y = self._last
+            dt = ts - last_ts
+            if dt > self.max_gap:
+                self.reset()
+            elif dt > 0 and math.hypot(x - last_x, y - last_y) / dt > self.max_velocity:
+                self.reset()
+        if self._last is None:
+            self._start_ts = ts
+        self._last = ts, x, y
+        self._sum_x += x
+        self._sum_y += y
+        self._n += 1
+
+
+DETECTORS = {
+    "idt": DispersionFixationDetector,
+    "ivt": VelocityFixationDetector,
+}
+
+
+class DwellClicker:
+    """
+    Clicks at the fixation centroid once a fixation lasts `dwell_time` seconds. The
+    next click needs a new fixation, i.e. the gaze has to move away first.
+
+    Clicks go through `mouse_sink`, the same move/click interface the cursor is
+    moved with, so they are ordered with the cursor moves.
+    """
+
+    def __init__(self, detector, mouse_sink, dwell_time=0.8, button="left"):
+        self.detector = detector
+        self.mouse = mouse_sink
+        self.dwell_time = dwell_time
+        self.button = button
+        self.clicks = 0
+        self._armed = True
+
+    def reset(self):
+        self.detector.reset()
+        self._armed = True
+
+    def update(self, timestamps, points):
+        """Adds N timestamps and (N, 2) screen points, clicks if a dwell completes."""
+        detector = self.detector
+        for ts, (x, y) in zip(timestamps.tolist(), points.tolist()):
+            detector.add(ts, x, y)
+            if not detector.is_fixation:
+                self._armed = True
+            elif self._armed and detector.duration >= self.dwell_time:
+                self._armed = False
+                self.click(*detector.centroid())
+
+    def click(self, x, y):
+        logger.debug(f"Dwell click at ({x:.0f}, {y:.0f})")
+        self.mouse.move(x, y, absolute=True, duration=0)
+        self.mouse.click(self.button)
+        self.clicks += 1
+
+
+def add_dwell_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("dwell click")
+    group.add_argument(
+        "--dwell-click",
+        action="store_true",
+        help="click when the gaze rests on one spot for --dwell-time",
+    )
+    group.add_argument(
+        "--dwell-time", type=float, default=0.8, help="dwell duration in seconds"
+    )
+    group.add_argument(
+        "--fixation-detector",
+        choices=sorted(DETECTORS),
+        default="idt",
+        help="dispersion (idt) or velocity (ivt) threshold fixation detection",
+    )
+    group.add_argument(
+        "--max-dispersion",
+        type=float,
+        default=40.0,
+        help="idt: maximum fixation dispersion in screen pixels",
+    )
+    group.add_argument(
+        "--max-velocity",
+        type=float,
+        default=2000.0,
+        help="ivt: maximum fixation velocity in screen pixels per second",
+    )
+
+
+def fixation_detector_from_args(
+    args,
+) -> T.Union[DispersionFixationDetector, VelocityFixationDetector]:
+    if args.fixation_detector == "ivt":
+        return VelocityFixationDetector(args.max_velocity)
+    return DispersionFixationDetector(args.max_dispersion)
+
+
+def dwell_clicker_from_args(args, mouse_sink) -> T.Optional[DwellClicker]:
+    if not args.dwell_click:
+        return None
+    return DwellClicker(fixation_detector_from_args(args), mouse_sink, args.dwell_time)
@@ -9,26 +9,119 @@ MIN_WAIT_TIME = 0.0001
 
 
 class WindowEventLoop:
-    def __init__(self, window, frame_rate: float, callables: T.List[T.Callable]):
+    """
+    Runs `callables` whenever the loop wakes up and redraws only if something is
+    dirty, at most `frame_rate` times per second. Without changes, the window is
+    still redrawn every 1 / `min_frame_rate` seconds, e.g. for the metrics menu.
+
+    The loop sleeps until a UI event, new sensor data if `wait_for_data(timeout)` is
+    set, or the next redraw is due. Observers call mark_dirty() for changes that
+    need a redraw, UI events mark the window dirty themselves.
+    """
+
+    def __init__(
+        self,
+        window,
+        frame_rate: float,
+        callables: T.List[T.Callable],
+        draw_callables: T.List[T.Callable] = ...,
+        min_frame_rate: float = 2.0,
+        metrics=None,
+    ):
+        if draw_callables is ...:
+            draw_callables = []
+
         self.window = weakref.ref(window)
         self.target_loop_duration = 1 / frame_rate
+        self.max_loop_duration = 1 / min_frame_rate
         self.callables = callables
-        self.last_sleep = None
+        self.draw_callables = draw_callables
+        # e.g. polling.SensorPoller.wait, returns whether data arrived
+        self.wait_for_data: T.Optional[T.Callable[[float], bool]] = None
+        # optional MetricsRegistry, receives the "draw" and "jitter" timers
+        self.metrics = metrics
+        self.dirty = True
+        self.last_draw = -float("inf")
+        self.wakeups = 0
+        self.draws = 0
+        self._wait_time = 0.0
+        self._start = None
+        self._cpu_start = None
+
+    def mark_dirty(self, *args, **kwargs):
+        """Requests a redraw, accepts any arguments to be usable as observer."""
+        self.dirty = True
+
+    def next_draw_time(self) -> float:
+        if self.dirty:
+            return self.last_draw + self.target_loop_duration
+        return self.last_draw + self.max_loop_duration
 
     def run(self):
+        self._start = time.monotonic()
+        self._cpu_start = time.process_time()
         while self.window().should_draw:
+            self.wait()
             self.update()
-            time_to_wait = MIN_WAIT_TIME
-            if self.last_sleep:
-                loop_duration = time.monotonic() - self.last_sleep
-                time_to_wait = max(
-                    time_to_wait, self.target_loop_duration - loop_duration
-                )
-            self.window().update(time_to_wait)
-            self.last_sleep = time.monotonic()
+            if time.monotonic() >= self.next_draw_time():
+                self.draw()
+
+    def wait(self):
+        """Blocks until a UI event, sensor data or the next redraw is due."""
+        window = self.window()
+        t0 = time.monotonic()
+        self.wakeups += 1
+        while True:
+            deadline = self.next_draw_time()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # how late the loop woke up for a scheduled redraw
+                lateness = time.monotonic() - deadline
+                if self.metrics is not None and lateness < self.max_loop_duration:
+                    self.metrics.record("jitter", lateness)
+                break
+            was_dirty = self.dirty
+            if self.wait_for_data is None:
+                window.wait_events(max(remaining, MIN_WAIT_TIME))
+            else:
+                window.wait_events(0)
+                if self.dirty != was_dirty:
+                    # a UI event moved the next redraw forward
+                    continue
+                # UI events are picked up at least every target_loop_duration
+                timeout = min(remaining, self.target_loop_duration)
+                if self.wait_for_data(timeout):
+                    break
+        self._wait_time += time.monotonic() - t0
 
     def update(self):
+        for call in self.callables:
+            call()
+
+    def draw(self):
+        t0 = time.perf_counter()
+        window = self.window()
         # all callables should draw themselves within the window content area
-        with self.window().use_content_area():
-            for call in self.callables:
+        with window.use_content_area():
+            for call in self.draw_callables:
                 call()
+        window.update()
+        self.dirty = False
+        self.last_draw = time.monotonic()
+        self.draws += 1
+        if self.metrics is not None:
+            self.metrics.record("draw", time.perf_counter() - t0)
+
+    def stats(self) -> T.Dict[str, T.Any]:
+        elapsed = time.monotonic() - self._start if self._start is not None else 0.0
+        if not elapsed:
+            return {"wakeups": self.wakeups, "draws": self.draws}
+        cpu_time = time.process_time() - self._cpu_start
+        return {
+            "wakeups": self.wakeups,
+            "draws": self.draws,
+            "draws_per_s": self.draws / elapsed,
+            "idle_fraction": self._wait_time / elapsed,
+            # of the whole process, including the audio and vision threads
+            "cpu_load": cpu_time / elapsed,
+        }
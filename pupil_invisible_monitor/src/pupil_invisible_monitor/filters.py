@@ -0,0 +1,192 @@
+"""
+Cursor smoothing filters applied to mapped screen gaze before the mouse is moved.
+
+All filters take a batch of N timestamps and an (N, 2) array of points and return
+the (N, 2) filtered points, keeping their state between batches. The time-dependent
+coefficients are computed for the whole batch with NumPy, only the recursion itself
+runs per sample. x and y share timestamps and parameters, so they are filtered
+together.
+"""
+
+import argparse
+import logging
+import math
+import typing as T
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class NoFilter:
+    def reset(self):
+        pass
+
+    def filter(self, timestamps, points) -> np.ndarray:
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+class OneEuroFilter:
+    """
+    1€ filter (Casiez et al., CHI 2012): a low-pass filter whose cutoff frequency
+    rises with the speed of the signal, i.e. strong smoothing of fixation jitter and
+    little lag during saccades.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._last_ts = None
+        self._last_raw = None
+        self._x = None
+        self._dx = np.zeros(2)
+
+    @staticmethod
+    def _alpha(dt, cutoff):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filter(self, timestamps, points) -> np.ndarray:
+        timestamps = np.asarray(timestamps, dtype=np.float64).ravel()
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not len(points):
+            return points.copy()
+        if self._last_ts is None:
+            self._last_ts = timestamps[0]
+            self._last_raw = points[0]
+            self._x = points[0].copy()
+
+        prev_ts = np.concatenate(((self._last_ts,), timestamps[:-1]))
+        prev_raw = np.vstack((self._last_raw, points[:-1]))
+        dt = np.maximum(timestamps - prev_ts, 1e-6)
+        # raw derivative and its smoothing factor do not depend on the recursion
+        raw_dx = (points - prev_raw) / dt[:, None]
+        alpha_d = self._alpha(dt, self.d_cutoff)
+
+        out = np.empty_like(points)
+        dx, x = self._dx, self._x
+        for i in range(len(points)):
+            dx = dx + alpha_d[i] * (raw_dx[i] - dx)
+            speed = math.hypot(dx[0], dx[1])
+            a = self._alpha(dt[i], self.min_cutoff + self.beta * speed)
+            x = x + a * (points[i] - x)
+            out[i] = x
+
+        self._dx, self._x = dx, x
+        self._last_ts, self._last_raw = timestamps[-1], points[-1]
+        return out
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter with state (position, velocity) per axis.
+
+    x and y are independent but share timestamps and noise parameters, hence they
+    share the same covariance and gain. The 2x2 covariance recursion is computed once
+    per sample and the gain is applied to both axes.
+    """
+
+    def __init__(self, process_noise=2e7, measurement_noise=100.0, reset_gap=0.5):
+        # process_noise: white acceleration spectral density in px^2/s^3
+        # measurement_noise: variance of a gaze sample in px^2
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        # restart from the measurement after gaps longer than this (seconds)
+        self.reset_gap = reset_gap
+        self.reset()
+
+    def reset(self):
+        self._last_ts = None
+        self._pos = None
+        self._vel = np.zeros(2)
+        # covariance as (p00, p01, p11), the matrix is symmetric
+        self._p = None
+
+    def filter(self, timestamps, points) -> np.ndarray:
+        timestamps = np.asarray(timestamps, dtype=np.float64).ravel()
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not len(points):
+            return points.copy()
+
+        last_ts = timestamps[0] if self._last_ts is None else self._last_ts
+        dt = np.diff(timestamps, prepend=last_ts)
+        q = self.process_noise
+        r = self.measurement_noise
+
+        out = np.empty_like(points)
+        pos, vel, p = self._pos, self._vel, self._p
+        for i in range(len(points)):
+            if pos is None or dt[i] > self.reset_gap:
+                pos, vel = points[i].copy(), np.zeros(2)
+                p = r, 0.0, q
+                out[i] = pos
+                continue
+            # predict
+            t = dt[i]
+            p00, p01, p11 = p
+            p00 = p00 + t * (2 * p01 + t * p11) + q * t ** 3 / 3
+            p01 = p01 + t * p11 + q * t ** 2 / 2
+            p11 = p11 + q * t
+            pos = pos + t * vel
+            # update with the position measurement
+            s = p00 + r
+            k0, k1 = p00 / s, p01 / s
+            innovation = points[i] - pos
+            pos = pos + k0 * innovation
+            vel = vel + k1 * innovation
+            p = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+            out[i] = pos
+
+        self._pos, self._vel, self._p = pos, vel, p
+        self._last_ts = timestamps[-1]
+        return out
+
+
+FILTERS = {
+    "none": NoFilter,
+    "one-euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("cursor smoothing")
+    group.add_argument(
+        "--filter",
+        choices=sorted(FILTERS),
+        default="one-euro",
+        help="smoothing applied to the mapped gaze before moving the mouse",
+    )
+    group.add_argument(
+        "--min-cutoff", type=float, default=1.0, help="one-euro: minimum cutoff in Hz"
+    )
+    group.add_argument(
+        "--beta", type=float, default=0.01, help="one-euro: speed coefficient"
+    )
+    group.add_argument(
+        "--d-cutoff", type=float, default=1.0, help="one-euro: derivative cutoff in Hz"
+    )
+    group.add_argument(
+        "--process-noise",
+        type=float,
+        default=2e7,
+        help="Kalman: acceleration noise density in px^2/s^3",
+    )
+    group.add_argument(
+        "--measurement-noise",
+        type=float,
+        default=100.0,
+        help="Kalman: gaze measurement variance in px^2",
+    )
+
+
+def filter_from_args(args) -> T.Union[NoFilter, OneEuroFilter, KalmanFilter]:
+    if args.filter == "one-euro":
+        return OneEuroFilter(args.min_cutoff, args.beta, args.d_cutoff)
+    if args.filter == "kalman":
+        return KalmanFilter(args.process_noise, args.measurement_noise)
+    return NoFilter()
@@ -0,0 +1,100 @@
+import typing as T
+
+import numpy as np
+
+TS, X, Y = range(3)
+
+
+class GazeRingBuffer:
+    """
+    Fixed-capacity ring buffer of (ts, x, y) gaze samples backed by a float64 array.
+
+    Every sample is written twice, at i and i + capacity, such that the most recent
+    samples are always available as one contiguous, chronological view without
+    copying. Samples are expected to arrive in timestamp order.
+    """
+
+    def __init__(self, capacity: int = 2048):
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, 3))
+        self._write_idx = 0
+        self._size = 0
+        self.total_samples = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._write_idx = 0
+        self._size = 0
+
+    def append(self, ts, x, y):
+        self.extend(np.array(((ts, x, y),)))
+
+    def extend(self, samples):
+        """Adds an (N, 3) array of (ts, x, y) samples in bulk."""
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, 3)
+        count = len(samples)
+        if count == 0:
+            return
+        self.total_samples += count
+        if count > self.capacity:
+            samples = samples[-self.capacity :]
+            self._write_idx = (self._write_idx + count - self.capacity) % self.capacity
+            count = self.capacity
+
+        start = self._write_idx
+        first = min(count, self.capacity - start)
+        for offset in (0, self.capacity):
+            self._data[offset + start : offset + start + first] = samples[:first]
+            self._data[offset : offset + count - first] = samples[first:]
+        self._write_idx = (start + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def view(self) -> np.ndarray:
+        """Chronological (N, 3) view of all buffered samples. Do not modify."""
+        end = self._write_idx + self.capacity
+        return self._data[end - self._size : end]
+
+    def latest(self) -> T.Optional[np.ndarray]:
+        if not self._size:
+            return None
+        return self.view()[-1]
+
+    def since(self, ts: float) -> np.ndarray:
+        """Samples with a timestamp strictly greater than ts."""
+        data = self.view()
+        return data[np.searchsorted(data[:, TS], ts, side="right") :]
+
+    def between(self, start: float, end: float) -> np.ndarray:
+        """Samples with start <= timestamp <= end."""
+        data = self.view()
+        lo = np.searchsorted(data[:, TS], start, side="left")
+        hi = np.searchsorted(data[:, TS], end, side="right")
+        return data[lo:hi]
+
+    def nearest(self, ts):
+        """
+        Sample(s) closest in time to ts, which may be a scalar or an array of
+        timestamps (e.g. frame timestamps). Returns None if the buffer is empty.
+        """
+        if not self._size:
+            return None
+        data = self.view()
+        timestamps = data[:, TS]
+        ts = np.asarray(ts, dtype=np.float64)
+        if len(timestamps) == 1:
+            return data[np.zeros(ts.shape, dtype=np.intp)]
+        right = np.clip(np.searchsorted(timestamps, ts), 1, len(timestamps) - 1)
+        left = right - 1
+        closest = np.where(
+            np.abs(timestamps[left] - ts) <= np.abs(timestamps[right] - ts), left, right
+        )
+        return data[closest]
+
+    def window_mean(self, start: float, end: float) -> T.Optional[np.ndarray]:
+        """Mean (x, y) of the samples within [start, end], None if there are none."""
+        window = self.between(start, end)
+        if not len(window):
+            return None
+        return window[:, X:].mean(axis=0)
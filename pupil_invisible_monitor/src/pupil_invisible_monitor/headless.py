@@ -0,0 +1,89 @@
+"""
+Headless mode: runs the gaze mouse without the preview window.
+
+There is no GLFW window, no pyglui and no texture upload. Instead of redrawing at a
+fixed frame rate, the loop sleeps until a sensor of a linked host has data or a
+notification, and otherwise wakes up every `discovery_interval` seconds to handle
+network events, e.g. a host appearing.
+"""
+
+import logging
+import time
+import typing as T
+
+from .polling import SensorPoller
+
+logger = logging.getLogger(__name__)
+
+
+class HeadlessScheduler:
+    """
+    Main loop of headless mode. Links the host named `host_name`, or the first
+    available host if None, as soon as it appears, and relinks it after it was gone.
+    """
+
+    def __init__(
+        self,
+        controller,
+        host_name: T.Optional[str] = None,
+        discovery_interval=0.5,
+        idle_interval=0.005,
+        callables: T.Sequence[T.Callable] = (),
+        metrics=None,
+    ):
+        self.controller = controller
+        self.host_name = host_name
+        # maximum time between two network polls
+        self.discovery_interval = discovery_interval
+        # wait between fetches from sensors without socket, e.g. replay sensors
+        self.poller = SensorPoller(controller, idle_interval)
+        # called once per wakeup, after the sensor data was fetched
+        self.callables = list(callables)
+        self._running = False
+        self._busy_time = 0.0
+        self._start = None
+        self._cpu_start = None
+        if metrics is not None:
+            metrics.add_gauge("scheduler", self.stats)
+
+    def run(self):
+        self._running = True
+        self._start = time.monotonic()
+        self._cpu_start = time.process_time()
+        while self._running:
+            t0 = time.monotonic()
+            self.controller.poll_events()
+            self.auto_link()
+            self.controller.fetch_recent_data()
+            for call in self.callables:
+                call()
+            self._busy_time += time.monotonic() - t0
+            self.poller.wait(self.discovery_interval)
+
+    def stop(self):
+        """Ends run() after the current iteration, e.g. from a signal handler."""
+        self._running = False
+
+    def auto_link(self):
+        if any(host.is_linked for host in self.controller.hosts()):
+            return
+        for host in self.controller.hosts():
+            if not host.is_available:
+                continue
+            if self.host_name is None or host.name == self.host_name:
+                logger.info(f"Auto-linking {host}")
+                self.controller.link(host)
+                return
+
+    def stats(self) -> T.Dict[str, T.Any]:
+        elapsed = time.monotonic() - self._start if self._start is not None else 0.0
+        cpu_time = time.process_time() - self._cpu_start if elapsed else 0.0
+        wakeups = self.poller.waits
+        return {
+            "wakeups": wakeups,
+            "timeouts": self.poller.timeouts,
+            "wakeups_per_s": wakeups / elapsed if elapsed else 0.0,
+            "busy_fraction": self._busy_time / elapsed if elapsed else 0.0,
+            # of the whole process, including the audio and vision threads
+            "cpu_load": cpu_time / elapsed if elapsed else 0.0,
+        }
@@ -0,0 +1,276 @@
+"""
+Multi-monitor layouts: each screen is framed by its own four markers and has its
+own resolution and offset in virtual desktop coordinates.
+
+The screens of all detected markers are looked up in one vectorized pass through
+arrays indexed by marker id. The pose of each screen is tracked through occluded
+markers, see pose.ScreenPoseTracker. Gaze is mapped onto every visible screen and
+the cursor goes to the screen that contains it, in desktop coordinates.
+"""
+
+import argparse
+import collections
+import json
+import logging
+import typing as T
+
+import numpy as np
+
+from .mapping import SCREEN_CORNER_MARKERS, ScreenMapper
+from .pose import POSE_SOURCES, ScreenPoseTracker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCREEN_SIZE = (1920, 1080)
+
+
+class Screen(T.NamedTuple):
+    name: str
+    # (marker id, marker corner) at the top-left, top-right, bottom-right and
+    # bottom-left corner of the screen, see mapping.SCREEN_CORNER_MARKERS
+    corner_markers: T.Tuple[T.Tuple[int, int], ...] = SCREEN_CORNER_MARKERS
+    size: T.Tuple[int, int] = DEFAULT_SCREEN_SIZE
+    # top-left corner in virtual desktop coordinates
+    offset: T.Tuple[int, int] = (0, 0)
+
+
+class ScreenLayout:
+    """Screens of a workstation, with marker id -> screen lookup arrays."""
+
+    def __init__(self, screens: T.Sequence[Screen]):
+        if not screens:
+            raise ValueError("A screen layout needs at least one screen")
+        self.screens = tuple(screens)
+        marker_ids = [
+            marker_id for screen in screens for marker_id, _ in screen.corner_markers
+        ]
+        if len(set(marker_ids)) != len(marker_ids):
+            raise ValueError(f"Marker ids are used more than once: {marker_ids}")
+        self.marker_ids = tuple(marker_ids)
+
+        lookup_size = max(marker_ids) + 1
+        # screen index and screen corner of each marker id
+        self._screen_of = np.full(lookup_size, -1, dtype=np.intp)
+        self._screen_corner_of = np.zeros(lookup_size, dtype=np.intp)
+        # (S, 4) marker corner at each screen corner
+        self.outer_corners = np.zeros((len(screens), 4), dtype=np.intp)
+        for screen_idx, screen in enumerate(screens):
+            if len(screen.corner_markers) != 4:
+                raise ValueError(f"{screen.name}: expected 4 corner markers")
+            for corner, (marker_id, marker_corner) in enumerate(screen.corner_markers):
+                self._screen_of[marker_id] = screen_idx
+                self._screen_corner_of[marker_id] = corner
+                self.outer_corners[screen_idx, corner] = marker_corner
+
+    @classmethod
+    def single(cls, corner_markers=SCREEN_CORNER_MARKERS, size=DEFAULT_SCREEN_SIZE):
+        return cls([Screen("screen", tuple(corner_markers), tuple(size))])
+
+    def __len__(self):
+        return len(self.screens)
+
+    def marker_corners(self, corners, ids) -> np.ndarray:
+        """
+        Corners of the markers of all screens from cv2.aruco.detectMarkers results.
+
+        Returns an (S, 4, 4, 2) array of the markers at the top-left, top-right,
+        bottom-right and bottom-left corner of each screen, NaN if not detected.
+        Markers that are not part of the layout are ignored.
+        """
+        markers = np.full((len(self.screens), 4, 4, 2), np.nan)
+        if ids is None or len(corners) == 0:
+            return markers
+        ids = np.asarray(ids).ravel()
+        known = np.flatnonzero((ids >= 0) & (ids < len(self._screen_of)))
+        known = known[self._screen_of[ids[known]] >= 0]
+        known_ids = ids[known]
+        markers[self._screen_of[known_ids], self._screen_corner_of[known_ids]] = (
+            np.reshape(corners, (-1, 4, 2))[known]
+        )
+        return markers
+
+
+class LayoutMapper:
+    """
+    One ScreenMapper and ScreenPoseTracker per screen of a layout. Gaze is assigned
+    to the first visible screen that contains it and returned in virtual desktop
+    coordinates.
+    """
+
+    def __init__(
+        self,
+        layout: ScreenLayout,
+        tolerance: float = 2.0,
+        max_prediction_time: float = 0.3,
+    ):
+        self.layout = layout
+        screens = layout.screens
+        self.mappers = [ScreenMapper(screen.size, tolerance) for screen in screens]
+        self.trackers = [
+            ScreenPoseTracker(outer_corners, max_prediction_time)
+            for outer_corners in layout.outer_corners
+        ]
+        # frames by the best pose source of any screen, see pose.POSE_SOURCES
+        self.pose_counts = collections.Counter()
+        self._offsets = np.array([screen.offset for screen in screens], dtype=float)
+        self._visible = np.zeros(len(layout), dtype=bool)
+        # index of the screen the last mapped gaze sample was on
+        self.screen = None
+
+    def update(self, quads: np.ndarray, visible: np.ndarray):
+        """Sets the quads of the visible screens."""
+        self._visible = visible
+        for screen_idx in np.flatnonzero(visible):
+            self.mappers[screen_idx].update(quads[screen_idx])
+
+    def track(self, timestamp, marker_corners: np.ndarray) -> np.ndarray:
+        """
+        Updates the screen poses from the (S, 4, 4, 2) corners of the markers of a
+        frame, see ScreenLayout.marker_corners(). Returns the mask of the screens
+        with a pose.
+        """
+        quads = np.full((len(self.trackers), 4, 2), np.nan)
+        best = len(POSE_SOURCES) - 1
+        for screen_idx, tracker in enumerate(self.trackers):
+            quad = tracker.update(timestamp, marker_corners[screen_idx])
+            if quad is not None:
+                quads[screen_idx] = quad
+            best = min(best, POSE_SOURCES.index(tracker.source))
+        self.pose_counts[POSE_SOURCES[best]] += 1
+        visible = ~np.isnan(quads).any(axis=(1, 2))
+        self.update(quads, visible)
+        return visible
+
+    def pose_stats(self) -> T.Dict[str, float]:
+        """Fraction of the frames by pose source and of mapped frames."""
+        frames = sum(self.pose_counts.values())
+        if not frames:
+            return {"frames": 0}
+        stats = {"frames": frames}
+        for source in POSE_SOURCES:
+            stats[source] = self.pose_counts[source] / frames
+        stats["mapped"] = 1.0 - stats["lost"]
+        return stats
+
+    @property
+    def current_mapper(self) -> T.Optional[ScreenMapper]:
+        return None if self.screen is None else self.mappers[self.screen]
+
+    def map_inside(self, points) -> T.Tuple[np.ndarray, np.ndarray]:
+        """
+        Maps (N, 2) scene points to desktop coordinates. Returns (desktop points,
+        inside mask), the mask is set for points that are on any visible screen.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        desktop = np.full_like(points, np.nan)
+        inside = np.zeros(len(points), dtype=bool)
+        screen_of_point = np.full(len(points), -1)
+        for screen_idx in np.flatnonzero(self._visible):
+            mapper = self.mappers[screen_idx]
+            if mapper.homography is None:
+                continue
+            screen_points, on_screen = mapper.map_inside(points)
+            new = on_screen & ~inside
+            desktop[new] = screen_points[new] + self._offsets[screen_idx]
+            screen_of_point[new] = screen_idx
+            inside |= new
+        if inside.any():
+            self.screen = int(screen_of_point[np.flatnonzero(inside)[-1]])
+        return desktop, inside
+
+
+def detect_monitors() -> T.List[T.Tuple[int, int, int, int]]:
+    """
+    (x, y, width, height) of the connected monitors in virtual desktop coordinates,
+    left to right. Uses screeninfo if installed, else GLFW. Empty if unknown.
+    """
+    try:
+        import screeninfo
+    except ImportError:
+        pass
+    else:
+        try:
+            monitors = screeninfo.get_monitors()
+        except Exception:
+            logger.debug("screeninfo could not list the monitors", exc_info=True)
+        else:
+            return sorted((m.x, m.y, m.width, m.height) for m in monitors)
+
+    try:
+        import glfw
+
+        if not glfw.init():
+            return []
+        try:
+            monitors = []
+            for monitor in glfw.get_monitors():
+                x, y = glfw.get_monitor_pos(monitor)
+                width, height = glfw.get_video_mode(monitor).size
+                monitors.append((x, y, width, height))
+        finally:
+            glfw.terminate()
+        return sorted(monitors)
+    except Exception:
+        logger.debug("GLFW could not list the monitors", exc_info=True)
+        return []
+
+
+def load_screen_layout(path, monitors=None) -> ScreenLayout:
+    """
+    Reads a layout like {"screens": [{"name": "left", "markers": [42, 24, 70, 66],
+    "size": [1920, 1080], "offset": [0, 0]}, ...]}. The marker ids are those at the
+    top-left, top-right, bottom-right and bottom-left screen corner. Without size and
+    offset, the i-th screen takes those of the i-th monitor from the left.
+    """
+    if monitors is None:
+        monitors = detect_monitors()
+    with open(path) as f:
+        raw = json.load(f)
+
+    screens = []
+    next_x = 0
+    for idx, settings in enumerate(raw["screens"]):
+        markers = settings["markers"]
+        if len(markers) != 4:
+            raise ValueError(f"Screen {idx}: expected 4 marker ids: {markers}")
+        if idx < len(monitors):
+            x, y, width, height = monitors[idx]
+            detected_size, detected_offset = (width, height), (x, y)
+        else:
+            # side by side, to the right of the previous screen
+            detected_size, detected_offset = DEFAULT_SCREEN_SIZE, (next_x, 0)
+        size = tuple(settings.get("size", detected_size))
+        offset = tuple(settings.get("offset", detected_offset))
+        next_x = offset[0] + size[0]
+        screens.append(
+            Screen(
+                settings.get("name", f"screen {idx}"),
+                tuple(zip(markers, range(4))),
+                size,
+                offset,
+            )
+        )
+    layout = ScreenLayout(screens)
+    for screen in layout.screens:
+        logger.info(f"{screen.name}: {screen.size} at {screen.offset}")
+    return layout
+
+
+def add_layout_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--screen-layout",
+        metavar="FILENAME",
+        help="JSON file with the markers, resolution and offset of each screen",
+    )
+
+
+def screen_layout_from_args(args) -> ScreenLayout:
+    if args.screen_layout:
+        return load_screen_layout(args.screen_layout)
+    # a single screen with the default markers, at the resolution of the monitor
+    # at the origin of the desktop
+    monitors = detect_monitors()
+    primary = next((m for m in monitors if m[:2] == (0, 0)), None)
+    if primary is None:
+        return ScreenLayout.single()
+    return ScreenLayout.single(size=primary[2:])
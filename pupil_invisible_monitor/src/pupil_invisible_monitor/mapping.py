@@ -0,0 +1,143 @@
+import logging
+import typing as T
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The screen is framed by four ArUco markers, one in each corner:
+#  __________________________
+# |ID42                  ID24|
+# |                          |
+# |ID66__________________ID70|
+#
+# (marker id, marker corner index) of the screen corners in top-left, top-right,
+# bottom-right, bottom-left order. ArUco returns the corners of each marker in that
+# same order, so the outer corner of each marker is the one with the matching index.
+SCREEN_CORNER_MARKERS = ((42, 0), (24, 1), (70, 2), (66, 3))
+
+UNIT_SQUARE = np.array([(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)])
+
+
+def homography_from_quads(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Perspective transform (3x3) mapping the four points in src onto dst."""
+    a = np.zeros((8, 8))
+    b = np.asarray(dst, dtype=np.float64).reshape(8)
+    for i, ((x, y), (u, v)) in enumerate(zip(src, dst)):
+        a[2 * i] = x, y, 1, 0, 0, 0, -u * x, -u * y
+        a[2 * i + 1] = 0, 0, 0, x, y, 1, -v * x, -v * y
+    h = np.linalg.solve(a, b)
+    return np.append(h, 1.0).reshape(3, 3)
+
+
+def homography_from_points(
+    src: np.ndarray, dst: np.ndarray, weights: T.Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Least-squares perspective transform (3x3) mapping the N >= 4 points in src onto
+    dst, with both point sets normalized for a well-conditioned fit. `weights` are
+    optional (N,) weights of the points.
+    """
+    src = np.asarray(src, dtype=np.float64).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=np.float64).reshape(-1, 2)
+    if len(src) < 4:
+        raise np.linalg.LinAlgError(f"Need at least 4 points, got {len(src)}")
+    norm_src, norm_dst = _normalization(src), _normalization(dst)
+    x, y = transform_points(norm_src, src).T
+    u, v = transform_points(norm_dst, dst).T
+    a = np.zeros((2 * len(src), 9))
+    a[0::2, 0], a[0::2, 1], a[0::2, 2] = x, y, 1.0
+    a[0::2, 6], a[0::2, 7], a[0::2, 8] = -u * x, -u * y, -u
+    a[1::2, 3], a[1::2, 4], a[1::2, 5] = x, y, 1.0
+    a[1::2, 6], a[1::2, 7], a[1::2, 8] = -v * x, -v * y, -v
+    if weights is not None:
+        a *= np.repeat(weights, 2)[:, None]
+    h = np.linalg.svd(a)[2][-1].reshape(3, 3)
+    h = np.linalg.inv(norm_dst) @ h @ norm_src
+    return h / h[2, 2]
+
+
+def _normalization(points: np.ndarray) -> np.ndarray:
+    # moves the centroid to the origin, at a mean distance of sqrt(2)
+    center = points.mean(axis=0)
+    mean_distance = np.linalg.norm(points - center, axis=1).mean()
+    if mean_distance == 0:
+        raise np.linalg.LinAlgError("Points coincide")
+    scale = np.sqrt(2) / mean_distance
+    return np.array(
+        [[scale, 0, -scale * center[0]], [0, scale, -scale * center[1]], [0, 0, 1]]
+    )
+
+
+def transform_points(homography: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Applies a 3x3 homography to an (N, 2) array of points."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    mapped = points @ homography[:, :2].T + homography[:, 2]
+    return mapped[:, :2] / mapped[:, 2:]
+
+
+class ScreenMapper:
+    """
+    Maps gaze in scene camera coordinates to screen pixels via the perspective
+    transform between the detected screen quad and the screen rectangle.
+
+    The homography is only recomputed when a corner of the screen quad moved by more
+    than `tolerance` pixels since the last computation.
+    """
+
+    def __init__(self, screen_size=(1920, 1080), tolerance: float = 2.0):
+        self.screen_size = screen_size
+        self.tolerance = tolerance
+        self.quad = None
+        self.homography = None
+        self._to_unit = None
+        self.updates = 0
+
+    def reset(self):
+        self.quad = None
+        self.homography = None
+        self._to_unit = None
+
+    def update(self, quad: np.ndarray) -> bool:
+        """Sets the current screen quad. Returns True if the homography was rebuilt."""
+        quad = np.asarray(quad, dtype=np.float64)
+        if self.quad is not None:
+            displacement = np.abs(quad - self.quad).max()
+            if displacement <= self.tolerance:
+                return False
+        try:
+            to_unit = homography_from_quads(quad, UNIT_SQUARE)
+        except np.linalg.LinAlgError:
+            logger.debug(f"Degenerate screen quad {quad.tolist()}")
+            return False
+        # fix the sign s.t. the projective denominator is positive inside the quad
+        if to_unit[2] @ np.append(quad.mean(axis=0), 1.0) < 0:
+            to_unit = -to_unit
+        self.quad = quad
+        # unit square -> screen pixels is a plain scaling
+        width, height = self.screen_size
+        self.homography = np.diag((width, height, 1.0)) @ to_unit
+        self._to_unit = to_unit
+        self.updates += 1
+        return True
+
+    def map_inside(self, points):
+        """Returns (screen points, inside mask) for one point or a batch of points."""
+        if self.homography is None:
+            raise RuntimeError("ScreenMapper.update() has to be called first")
+        points = np.asarray(points, dtype=np.float64)
+        single = points.ndim == 1
+        batch = points.reshape(-1, 2)
+
+        # the quad maps onto the unit square; points behind the screen's horizon line
+        # have a negative projective denominator
+        unit = batch @ self._to_unit[:, :2].T + self._to_unit[:, 2]
+        w = unit[:, 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            unit = unit[:, :2] / w[:, None]
+        inside = (w > 0) & np.all((unit >= 0.0) & (unit <= 1.0), axis=1)
+        screen = unit * self.screen_size
+
+        if single:
+            return screen[0], bool(inside[0])
+        return screen, inside
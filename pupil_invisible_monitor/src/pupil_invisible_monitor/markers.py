@@ -0,0 +1,358 @@
+import argparse
+import functools
+import json
+import logging
+import time
+import typing as T
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .mapping import SCREEN_CORNER_MARKERS
+
+logger = logging.getLogger(__name__)
+
+SCREEN_MARKER_IDS = tuple(marker_id for marker_id, _ in SCREEN_CORNER_MARKERS)
+
+DEFAULT_ARUCO_DICT = "DICT_5X5_100"
+# names of the ArUco dictionaries OpenCV supports, see cv2.aruco.DICT_*
+ARUCO_DICTS = (
+    "DICT_4X4_50",
+    "DICT_4X4_100",
+    "DICT_4X4_250",
+    "DICT_4X4_1000",
+    "DICT_5X5_50",
+    "DICT_5X5_100",
+    "DICT_5X5_250",
+    "DICT_5X5_1000",
+    "DICT_6X6_50",
+    "DICT_6X6_100",
+    "DICT_6X6_250",
+    "DICT_6X6_1000",
+    "DICT_7X7_50",
+    "DICT_7X7_100",
+    "DICT_7X7_250",
+    "DICT_7X7_1000",
+    "DICT_ARUCO_ORIGINAL",
+)
+
+# written by tune_aruco, loaded on startup if it exists
+DETECTOR_PROFILE_PATH = Path.home() / "pi_monitor_settings" / "aruco_profile.json"
+
+# (name, value) pairs of cv2.aruco.DetectorParameters attributes
+ParameterOverrides = T.Tuple[T.Tuple[str, T.Any], ...]
+
+
+def detector_parameters(overrides: ParameterOverrides = ()):
+    """cv2.aruco.DetectorParameters with the defaults replaced by `overrides`."""
+    parameters = cv2.aruco.DetectorParameters_create()
+    for name, value in overrides:
+        if not hasattr(parameters, name):
+            raise ValueError(f"Unknown ArUco detector parameter '{name}'")
+        setattr(parameters, name, value)
+    return parameters
+
+
+@functools.lru_cache(maxsize=None)
+def aruco_setup(
+    dict_name: str = DEFAULT_ARUCO_DICT, parameters: ParameterOverrides = ()
+):
+    """
+    ArUco dictionary and detector parameters for `dict_name`, created on first use
+    and shared by all callers afterwards. `parameters` override the defaults.
+    """
+    if dict_name not in ARUCO_DICTS:
+        raise ValueError(f"ArUco dictionary '{dict_name}' is not supported")
+    logger.info(f"Detecting '{dict_name}' markers")
+    dictionary = cv2.aruco.Dictionary_get(getattr(cv2.aruco, dict_name))
+    return dictionary, detector_parameters(parameters)
+
+
+class DetectorProfile(T.NamedTuple):
+    """Detector parameters and detection scale, e.g. found by tune_aruco."""
+
+    # sorted, so that equal profiles share the aruco_setup() cache
+    parameters: ParameterOverrides = ()
+    # the scene image is downscaled by this factor before marker detection
+    detection_scale: float = 1.0
+
+    @classmethod
+    def create(cls, parameters: T.Dict[str, T.Any], detection_scale=1.0):
+        return cls(tuple(sorted(parameters.items())), float(detection_scale))
+
+
+def load_detector_profile(path, dict_name=DEFAULT_ARUCO_DICT) -> DetectorProfile:
+    """
+    Profile saved by tune_aruco. The defaults are used if it was tuned for another
+    dictionary than `dict_name`, the marker sizes and the detection scale would not
+    fit.
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    tuned_for = raw.get("dictionary", dict_name)
+    if tuned_for != dict_name:
+        logger.warning(
+            f"ArUco detector profile {path} was tuned for '{tuned_for}' markers, "
+            f"not '{dict_name}'. Using the default parameters."
+        )
+        return DetectorProfile()
+    profile = DetectorProfile.create(
+        raw.get("parameters", {}), raw.get("detection_scale", 1.0)
+    )
+    # fails early on parameters this OpenCV version does not know
+    detector_parameters(profile.parameters)
+    logger.info(f"Loaded ArUco detector profile {path}: {profile}")
+    return profile
+
+
+def save_detector_profile(path, profile: DetectorProfile, **info):
+    """Writes the profile and `info`, e.g. how it was tuned, as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    raw = {
+        "parameters": dict(profile.parameters),
+        "detection_scale": profile.detection_scale,
+        **info,
+    }
+    with path.open("w") as f:
+        json.dump(raw, f, indent=2)
+
+
+def add_detector_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--aruco-profile",
+        metavar="FILENAME",
+        help="ArUco detector parameters written by tune_aruco, by default "
+        "~/pi_monitor_settings/aruco_profile.json if it exists",
+    )
+    parser.add_argument(
+        "--no-aruco-profile",
+        action="store_true",
+        help="detect markers with the OpenCV default parameters",
+    )
+
+
+def detector_profile_from_args(args) -> DetectorProfile:
+    if args.no_aruco_profile:
+        return DetectorProfile()
+    # tools without a --type option detect the default markers
+    dict_name = getattr(args, "type", DEFAULT_ARUCO_DICT)
+    if args.aruco_profile:
+        return load_detector_profile(args.aruco_profile, dict_name)
+    if DETECTOR_PROFILE_PATH.exists():
+        return load_detector_profile(DETECTOR_PROFILE_PATH, dict_name)
+    return DetectorProfile()
+
+
+def luma_view(frame) -> np.ndarray:
+    """
+    Luminance plane of a frame as a (height, width) uint8 array. For frames with a
+    YUV buffer this is a zero-copy view on the Y plane, other frames fall back to
+    their `gray` attribute.
+    """
+    yuv_buffer = frame.yuv_buffer
+    if yuv_buffer is None:
+        return frame.gray
+    y_plane = np.asarray(yuv_buffer)[: frame.width * frame.height]
+    return y_plane.reshape(frame.height, frame.width)
+
+
+class LumaPreprocessor:
+    """
+    Provides the image markers are detected on: the luma plane of the frame,
+    optionally downscaled to `target_width`, or else by `target_scale`, into a
+    buffer that is reused as long as the frame size does not change. ArUco works on
+    grayscale, so no BGR conversion is needed.
+    """
+
+    def __init__(
+        self, target_width: T.Optional[int] = None, target_scale: float = 1.0
+    ):
+        self.target_width = target_width
+        self.target_scale = target_scale
+        self._buffer = None
+
+    def prepare(self, frame) -> np.ndarray:
+        luma = luma_view(frame)
+        height, width = luma.shape
+        target_width = self.target_width or round(width * self.target_scale)
+        if target_width >= width:
+            return luma
+
+        shape = round(height * target_width / width), target_width
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+        cv2.resize(
+            luma,
+            shape[::-1],
+            dst=self._buffer,
+            interpolation=cv2.INTER_AREA,
+        )
+        return self._buffer
+
+
+class MarkerDetector:
+    """Full-frame cv2.aruco.detectMarkers with a fixed dictionary and parameters."""
+
+    def __init__(self, dictionary, parameters):
+        self.dictionary = dictionary
+        self.parameters = parameters
+        self.stats = DetectionStats()
+
+    def detect(self, image):
+        t0 = time.perf_counter()
+        corners, ids = self._detect(image)
+        self.stats.add_full_scan(time.perf_counter() - t0)
+        return corners, ids
+
+    def _detect(self, image):
+        (corners, ids, rejected) = cv2.aruco.detectMarkers(
+            image, self.dictionary, parameters=self.parameters
+        )
+        return corners, ids
+
+
+class DetectionStats:
+    def __init__(self):
+        self.frames = 0
+        self.roi_frames = 0
+        self.full_scans = 0
+        self.fallbacks = 0
+        self.roi_time = 0.0
+        self.full_time = 0.0
+        self.last_cost = 0.0
+
+    def add_roi_frame(self, cost):
+        self.frames += 1
+        self.roi_frames += 1
+        self.roi_time += cost
+        self.last_cost = cost
+
+    def add_full_scan(self, cost, fallback=False):
+        self.frames += 1
+        self.full_scans += 1
+        self.fallbacks += fallback
+        self.full_time += cost
+        self.last_cost = cost
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of frames served by the ROI search alone."""
+        return self.roi_frames / self.frames if self.frames else 0.0
+
+    @property
+    def mean_cost(self) -> float:
+        total = self.roi_time + self.full_time
+        return total / self.frames if self.frames else 0.0
+
+    def as_dict(self) -> T.Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "roi_frames": self.roi_frames,
+            "full_scans": self.full_scans,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.hit_rate,
+            "mean_cost_ms": self.mean_cost * 1000,
+            "mean_roi_cost_ms": self.roi_time / self.roi_frames * 1000
+            if self.roi_frames
+            else 0.0,
+            "mean_full_cost_ms": self.full_time / self.full_scans * 1000
+            if self.full_scans
+            else 0.0,
+        }
+
+
+class TrackingMarkerDetector(MarkerDetector):
+    """
+    Searches only padded regions around the last known corners of the screen markers.
+
+    Tracks whichever markers were last seen, e.g. those of a partially occluded
+    screen. Markers not found in their region are no longer tracked. Falls back to a
+    full-frame scan if no tracked marker is found, and scans the full frame every
+    `full_scan_interval` frames, or every `missing_scan_interval` frames while some
+    markers are not tracked, to pick up markers that came into view.
+    """
+
+    def __init__(
+        self,
+        dictionary,
+        parameters,
+        marker_ids: T.Sequence[int] = SCREEN_MARKER_IDS,
+        padding: float = 0.75,
+        min_padding: int = 16,
+        full_scan_interval: int = 30,
+        missing_scan_interval: int = 5,
+    ):
+        super().__init__(dictionary, parameters)
+        self.marker_ids = tuple(marker_ids)
+        # padding around the marker, relative to its bounding box size
+        self.padding = padding
+        self.min_padding = min_padding
+        self.full_scan_interval = full_scan_interval
+        self.missing_scan_interval = missing_scan_interval
+        self._tracked: T.Dict[int, np.ndarray] = {}
+        self._frames_since_full_scan = 0
+
+    def reset(self):
+        self._tracked.clear()
+        self._frames_since_full_scan = 0
+
+    def detect(self, image):
+        t0 = time.perf_counter()
+        fallback = False
+        interval = self.full_scan_interval
+        if len(self._tracked) < len(self.marker_ids):
+            interval = self.missing_scan_interval
+        if self._tracked and self._frames_since_full_scan < interval:
+            found = self._detect_in_rois(image)
+            if found:
+                self._frames_since_full_scan += 1
+                self.stats.add_roi_frame(time.perf_counter() - t0)
+                return self._as_detect_markers_result(found)
+            fallback = True
+
+        corners, ids = self._detect(image)
+        self._frames_since_full_scan = 0
+        self._tracked.clear()
+        if ids is not None:
+            for marker_corners, marker_id in zip(corners, ids.ravel().tolist()):
+                if marker_id in self.marker_ids and marker_id not in self._tracked:
+                    self._tracked[marker_id] = marker_corners.reshape(4, 2)
+        self.stats.add_full_scan(time.perf_counter() - t0, fallback=fallback)
+        return corners, ids
+
+    def _detect_in_rois(self, image) -> T.Dict[int, np.ndarray]:
+        height, width = image.shape[:2]
+        found = {}
+        for marker_id, marker_corners in self._tracked.items():
+            x0, y0, x1, y1 = self._roi(marker_corners, width, height)
+            corners, ids = self._detect(image[y0:y1, x0:x1])
+            if ids is not None:
+                for roi_corners, roi_id in zip(corners, ids.ravel().tolist()):
+                    if roi_id == marker_id:
+                        found[marker_id] = roi_corners.reshape(4, 2) + (x0, y0)
+                        break
+        self._tracked = found
+        return found
+
+    def _roi(self, marker_corners, width, height):
+        (min_x, min_y), (max_x, max_y) = marker_corners.min(0), marker_corners.max(0)
+        pad_x = max(self.min_padding, self.padding * (max_x - min_x))
+        pad_y = max(self.min_padding, self.padding * (max_y - min_y))
+        x0 = max(int(min_x - pad_x), 0)
+        y0 = max(int(min_y - pad_y), 0)
+        x1 = min(int(np.ceil(max_x + pad_x)), width)
+        y1 = min(int(np.ceil(max_y + pad_y)), height)
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _as_detect_markers_result(found: T.Dict[int, np.ndarray]):
+        # same layout as cv2.aruco.detectMarkers: corners are (1, 4, 2) float32 arrays
+        # and ids an (N, 1) int32 array
+        corners = tuple(
+            marker_corners.reshape(1, 4, 2).astype(np.float32)
+            for marker_corners in found.values()
+        )
+        ids = np.array(list(found), dtype=np.int32).reshape(-1, 1)
+        return corners, ids
@@ -0,0 +1,101 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+import typing as T
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STAGES = ("acquire", "detect", "map", "filter", "actuate")
+
+
+class RollingHistogram:
+    """Last `size` values in a NumPy ring, percentiles are computed on demand."""
+
+    def __init__(self, size=1000):
+        self._values = np.zeros(size)
+        self._idx = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self._values[self._idx] = value
+        self._idx = (self._idx + 1) % len(self._values)
+        self.count += 1
+
+    def values(self) -> np.ndarray:
+        return self._values[: min(self.count, len(self._values))]
+
+    def summary(self, scale=1.0) -> T.Dict[str, float]:
+        values = self.values()
+        if not len(values):
+            return {"count": self.count}
+        p50, p95, p99 = np.percentile(values, (50, 95, 99)) * scale
+        return {
+            "count": self.count,
+            "mean": float(values.mean() * scale),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(values.max() * scale),
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process timers with rolling p50/p95/p99 histograms, plus gauges that are
+    sampled when a summary is requested. Timers may be recorded from any thread.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._histograms: T.Dict[str, RollingHistogram] = {}
+        self._gauges: T.Dict[str, T.Callable[[], T.Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            try:
+                histogram = self._histograms[name]
+            except KeyError:
+                histogram = self._histograms[name] = RollingHistogram(self.window)
+            histogram.add(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def add_gauge(self, name: str, getter: T.Callable[[], T.Any]):
+        self._gauges[name] = getter
+
+    def timer_names(self) -> T.List[str]:
+        known = [name for name in PIPELINE_STAGES if name in self._histograms]
+        return known + sorted(set(self._histograms) - set(known))
+
+    def summary(self) -> T.Dict[str, T.Any]:
+        """Timer statistics in milliseconds and the current gauge values."""
+        with self._lock:
+            timers = {
+                name: self._histograms[name].summary(scale=1000)
+                for name in self.timer_names()
+            }
+        gauges = {name: getter() for name, getter in self._gauges.items()}
+        return {"timers_ms": timers, "gauges": gauges}
+
+    def dump_json(self, path=None) -> Path:
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = Path.home() / "pi_monitor_settings" / f"metrics-{stamp}.json"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as f:
+            json.dump(self.summary(), f, indent=2)
+        logger.info(f"Metrics written to {path}")
+        return path
@@ -1,102 +1,80 @@
+import bisect
 import logging
 import typing as T
 import ndsi
-
-
-
-
+import numpy as np
+
+from .actuator import NullMouse
+from .gaze_buffer import GazeRingBuffer
+from .layout import ScreenLayout
+from .mapping import SCREEN_CORNER_MARKERS
+from .markers import (
+    DEFAULT_ARUCO_DICT,
+    ParameterOverrides,
+    TrackingMarkerDetector,
+    aruco_setup,
+)
+from .metrics import MetricsRegistry
 from .observable import Observable
+from .pipeline import HostPipeline, VisionResult
 
 logger = logging.getLogger(__name__)
 
 
-# _____ librairies additionnelles
-
-
-from matplotlib import pyplot as plt
-from PIL import Image
-import cv2
-import imutils
-from shapely.geometry import Point
-from shapely.geometry.polygon import Polygon
-import mouse
-import os
-
-
-# __________ code d'initiation pour la détection de markers ______________________
-
-
-
-
-# import the necessary packages
-import argparse
-import imutils
-import cv2
-import sys
-
-# construct the argument parser and parse the arguments
-ap = argparse.ArgumentParser()
-# ap.add_argument("-i", "--image", required=True,
-#     help="path to input image containing ArUCo tag")
-ap.add_argument("-t", "--type", type=str,
-    default="DICT_5X5_100",
-    help="type of ArUCo tag to detect")
-args = vars(ap.parse_args())
-
-# define names of each possible ArUco tag OpenCV supports
-ARUCO_DICT = {
-    "DICT_4X4_50": cv2.aruco.DICT_4X4_50,
-    "DICT_4X4_100": cv2.aruco.DICT_4X4_100,
-    "DICT_4X4_250": cv2.aruco.DICT_4X4_250,
-    "DICT_4X4_1000": cv2.aruco.DICT_4X4_1000,
-    "DICT_5X5_50": cv2.aruco.DICT_5X5_50,
-    "DICT_5X5_100": cv2.aruco.DICT_5X5_100,
-    "DICT_5X5_250": cv2.aruco.DICT_5X5_250,
-    "DICT_5X5_1000": cv2.aruco.DICT_5X5_1000,
-    "DICT_6X6_50": cv2.aruco.DICT_6X6_50,
-    "DICT_6X6_100": cv2.aruco.DICT_6X6_100,
-    "DICT_6X6_250": cv2.aruco.DICT_6X6_250,
-    "DICT_6X6_1000": cv2.aruco.DICT_6X6_1000,
-    "DICT_7X7_50": cv2.aruco.DICT_7X7_50,
-    "DICT_7X7_100": cv2.aruco.DICT_7X7_100,
-    "DICT_7X7_250": cv2.aruco.DICT_7X7_250,
-    "DICT_7X7_1000": cv2.aruco.DICT_7X7_1000,
-    "DICT_ARUCO_ORIGINAL": cv2.aruco.DICT_ARUCO_ORIGINAL,
-#   "DICT_APRILTAG_16h5": cv2.aruco.DICT_APRILTAG_16h5,
-#   "DICT_APRILTAG_25h9": cv2.aruco.DICT_APRILTAG_25h9,
-#   "DICT_APRILTAG_36h10": cv2.aruco.DICT_APRILTAG_36h10,
-#   "DICT_APRILTAG_36h11": cv2.aruco.DICT_APRILTAG_36h11
-}
+class HostRegistry:
+    """
+    Hosts by name, kept sorted by name. Adding and removing a host inserts into the
+    sorted list with bisect, lookups by name, by index and of the index of a name
+    are O(1). hosts() returns a tuple that is only rebuilt after changes.
+    """
 
-# load the input image from disk and resize it
-# print("[INFO] loading image...")
-# image = cv2.imread(args["image"])
-# image = imutils.resize(image, width=600)
-
-# verify that the supplied ArUCo tag exists and is supported by
-# OpenCV
-if ARUCO_DICT.get(args["type"], None) is None:
-    print("[INFO] ArUCo tag of '{}' is not supported".format(
-        args["type"]))
-    sys.exit(0)
-
-# load the ArUCo dictionary, grab the ArUCo parameters, and detect
-# the markers
-print("[INFO] detecting '{}' tags...".format(args["type"]))
-arucoDict = cv2.aruco.Dictionary_get(ARUCO_DICT[args["type"]])
-arucoParams = cv2.aruco.DetectorParameters_create()
-
-
-
-
-#_________________ fin du code de détection de markers _________________________
-
-
-
-
-class SortedHostDict(dict):
-    def sorted_values(self) -> T.List["Host"]:
-        return sorted(super().values(), key=lambda host: host.name)
+    def __init__(self):
+        self._names: T.List[str] = []
+        self._sorted: T.List["Host"] = []
+        self._by_name: T.Dict[str, "Host"] = {}
+        self._index: T.Dict[str, int] = {}
+        self._snapshot: T.Optional[T.Tuple["Host", ...]] = ()
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def __contains__(self, host_name: str):
+        return host_name in self._by_name
+
+    def __getitem__(self, host_name: str) -> "Host":
+        return self._by_name[host_name]
+
+    def __setitem__(self, host_name: str, host: "Host"):
+        if host_name in self._by_name:
+            del self[host_name]
+        idx = bisect.bisect_left(self._names, host_name)
+        self._names.insert(idx, host_name)
+        self._sorted.insert(idx, host)
+        self._by_name[host_name] = host
+        self._reindex(idx)
+
+    def __delitem__(self, host_name: str):
+        idx = self._index.pop(host_name)
+        del self._by_name[host_name]
+        del self._names[idx]
+        del self._sorted[idx]
+        self._reindex(idx)
+
+    def _reindex(self, start: int):
+        for idx in range(start, len(self._names)):
+            self._index[self._names[idx]] = idx
+        self._snapshot = None
+
+    def index(self, host_name: str) -> int:
+        return self._index[host_name]
+
+    def at(self, idx: int) -> "Host":
+        return self._sorted[idx]
+
+    def hosts(self) -> T.Tuple["Host", ...]:
+        if self._snapshot is None:
+            self._snapshot = tuple(self._sorted)
+        return self._snapshot
 
 
 class Host:
@@ -107,6 +85,9 @@ class Host:
         self.sensors = {}
         self.is_linked = False
         self.is_in_bad_state = False
+        # every gaze sample as (ts, x, y), gaze arrives at ~200 Hz
+        self.gaze_buffer = GazeRingBuffer()
+        self.last_submitted_gaze_ts = -np.inf
 
     def __str__(self):
         return f"<{type(self).__name__} {self.name}>"
@@ -154,10 +135,12 @@ class Host:
     def fetch_recent_gaze(self):
         if "gaze" in self.sensors:
             gaze_sensor = self.sensors["gaze"]
-            recent_gaze = None
-            for x, y, ts in gaze_sensor.fetch_data():
-                recent_gaze = x, y
-            return recent_gaze
+            # (x, y, ts) samples, stored as (ts, x, y)
+            samples = np.array(list(gaze_sensor.fetch_data()), dtype=np.float64)
+            if len(samples):
+                self.gaze_buffer.extend(samples[:, (2, 0, 1)])
+                ts, x, y = self.gaze_buffer.latest().tolist()
+                return x, y
 
     def link(self, network):
         logger.debug(f"{self}.link()")
@@ -200,32 +183,152 @@ class Host:
 
 class Host_Controller(Observable):
     sensor_types = ("video", "gaze")
-
-    def __init__(self):
+    pipeline_cls = HostPipeline
+    host_registry_cls = HostRegistry
+
+    def __init__(
+        self,
+        network_cls=ndsi.Network,
+        mouse_sink=None,
+        aruco_dict=DEFAULT_ARUCO_DICT,
+        aruco_parameters: ParameterOverrides = (),
+        metrics: T.Optional[MetricsRegistry] = None,
+        multi_host=False,
+        screen_layout: T.Optional[ScreenLayout] = None,
+    ):
         logger.info(f"Using NDSI protocol v{ndsi.__protocol_version__}")
-        self._hosts = SortedHostDict()
-        self.network = ndsi.Network(
+        self._hosts = self.host_registry_cls()
+        # host names with UI notifications pending until the end of poll_events()
+        self._pending_added: T.Set[str] = set()
+        self._pending_changed: T.Set[str] = set()
+        self._batch_notifications = False
+        if mouse_sink is None:
+            import mouse as mouse_sink
+        self.aruco_dict = aruco_dict
+        # e.g. DetectorProfile.parameters, see tune_aruco
+        self.aruco_parameters = aruco_parameters
+        # per-stage timers: acquire, detect, map, filter, actuate
+        self.metrics = MetricsRegistry() if metrics is None else metrics
+        # link several hosts at once, each with a pipeline from pipeline_factory
+        self.multi_host = multi_host
+        # processes the linked host, None in multi-host mode
+        self.pipeline: T.Optional[HostPipeline] = None
+        if not multi_host:
+            self.pipeline = self.create_pipeline(
+                mouse_sink, screen_layout=screen_layout
+            )
+        self.pipeline_factory: T.Callable[[Host], HostPipeline] = self._null_pipeline
+        self._host_pipelines: T.Dict[str, HostPipeline] = {}
+        self._use_workers = False
+        self.network = network_cls(
             formats={ndsi.DataFormat.V4}, callbacks=(self.on_event,)
         )
         self.network.start()
 
     def __getitem__(self, idx: int):
-        return self._hosts.sorted_values()[idx]
+        return self._hosts.at(idx)
 
     def hosts(self):
-        yield from self._hosts.sorted_values()
+        # a snapshot, hosts may be removed while iterating
+        yield from self._hosts.hosts()
 
     def index(self, item: Host):
-        return self._hosts.sorted_values().index(item)
+        return self._hosts.index(item.name)
+
+    def create_pipeline(
+        self,
+        mouse_sink,
+        name: T.Optional[str] = None,
+        corner_markers=SCREEN_CORNER_MARKERS,
+        screen_size=(1920, 1080),
+        screen_layout: T.Optional[ScreenLayout] = None,
+    ) -> HostPipeline:
+        if screen_layout is None:
+            screen_layout = ScreenLayout.single(corner_markers, screen_size)
+        detector = TrackingMarkerDetector(
+            *aruco_setup(self.aruco_dict, self.aruco_parameters),
+            screen_layout.marker_ids,
+        )
+        return self.pipeline_cls(
+            mouse_sink,
+            detector,
+            screen_layout,
+            metrics=self.metrics,
+            name=name,
+        )
+
+    def _null_pipeline(self, host: "Host") -> HostPipeline:
+        logger.warning(f"No output configured for {host}, its gaze is not used")
+        return self.create_pipeline(NullMouse(), name=host.name)
+
+    def pipeline_for(self, host: "Host") -> HostPipeline:
+        if not self.multi_host:
+            return self.pipeline
+        try:
+            return self._host_pipelines[host.name]
+        except KeyError:
+            pipeline = self._host_pipelines[host.name] = self.pipeline_factory(host)
+            if self._use_workers:
+                pipeline.start_worker()
+            return pipeline
+
+    def pipelines(self) -> T.List[HostPipeline]:
+        if self.pipeline is None:
+            return list(self._host_pipelines.values())
+        return [self.pipeline, *self._host_pipelines.values()]
+
+    def start_vision_worker(self):
+        """
+        Moves marker detection, mapping and mouse moves off the calling thread, onto
+        one worker thread per pipeline.
+        """
+        self._use_workers = True
+        for pipeline in self.pipelines():
+            pipeline.start_worker()
+
+    def _drop_pipeline(self, host: "Host"):
+        pipeline = self._host_pipelines.pop(host.name, None)
+        if pipeline is not None:
+            pipeline.stop_worker()
 
     def cleanup(self):
+        for pipeline in self.pipelines():
+            pipeline.stop_worker()
         for host in self.hosts():
             host.cleanup()
         self.network.stop()
 
     def poll_events(self):
-        while self.network.has_events:
-            self.network.handle_event()
+        # notify about each added or changed host once, after all events
+        self._batch_notifications = True
+        try:
+            while self.network.has_events:
+                self.network.handle_event()
+        finally:
+            self._batch_notifications = False
+            self._flush_host_notifications()
+
+    def _host_added(self, host: Host):
+        if self._batch_notifications:
+            self._pending_added.add(host.name)
+        else:
+            self.on_host_added(self.index(host))
+
+    def _host_changed(self, host: Host):
+        if self._batch_notifications:
+            self._pending_changed.add(host.name)
+        else:
+            self.on_host_changed(self.index(host))
+
+    def _flush_host_notifications(self):
+        # in ascending order, such that each index is valid when it is inserted
+        for host_idx in sorted(map(self._hosts.index, self._pending_added)):
+            self.on_host_added(host_idx)
+        changed = self._pending_changed | self._pending_added
+        for host_idx in sorted(map(self._hosts.index, changed)):
+            self.on_host_changed(host_idx)
+        self._pending_added.clear()
+        self._pending_changed.clear()
 
     def on_event(self, caller, event):
         if event["subject"] == "attach" and event["sensor_type"] in self.sensor_types:
@@ -233,8 +336,7 @@ class Host_Controller(Observable):
             if host_name not in self._hosts:
                 host = Host(event["host_uuid"], host_name)
                 self._hosts[host_name] = host
-                host_idx = self.index(host)
-                self.on_host_added(host_idx)
+                self._host_added(host)
 
             host = self._hosts[host_name]
             host.add_sensor(
@@ -243,19 +345,20 @@ class Host_Controller(Observable):
                 event["sensor_uuid"],
                 event["sensor_name"],
             )
-            host_idx = self.index(host)
-            self.on_host_changed(host_idx)
+            self._host_changed(host)
 
         if event["subject"] == "detach" and event["host_name"] in self._hosts:
             host = self._hosts[event["host_name"]]
-            host_idx = self.index(host)
             host.remove_sensor(event["sensor_uuid"])
-            self.on_host_changed(host_idx)
+            self._host_changed(host)
             if not host.is_linked and not host.is_available:
                 self.remove_host(event["host_name"])
 
     def link(self, host_to_connect_sensor):
         logger.debug(f"{type(self).__name__}.link({host_to_connect_sensor})")
+        if self.multi_host:
+            self._toggle_link(host_to_connect_sensor)
+            return
         for host_idx, host in enumerate(self.hosts()):
             if host is host_to_connect_sensor and not host.is_linked:
                 host.link(self.network)
@@ -271,124 +374,94 @@ class Host_Controller(Observable):
             if not host.is_linked and not host.is_available:
                 self.remove_host(host.name)
 
+    def _toggle_link(self, host):
+        """Links or unlinks one host, leaving the other hosts as they are."""
+        host_idx = self.index(host)
+        if host.is_linked:
+            host.unlink()
+            self._drop_pipeline(host)
+            logger.info(f"Unlinked host {host}")
+        else:
+            host.link(self.network)
+            logger.info(f"Linked host {host}")
+        self.on_host_changed(host_idx)
+        if host.is_linked:
+            self.on_host_linked()
+        if not host.is_linked and not host.is_available:
+            self.remove_host(host.name)
+
     def remove_host(self, host_name):
         logger.debug(f"{type(self).__name__}.remove_host({host_name})")
         host = self._hosts[host_name]
         host_idx = self.index(host)
         del self._hosts[host_name]
-        self.on_host_removed(host_idx)
+        self._drop_pipeline(host)
+        self._pending_changed.discard(host_name)
+        if host_name in self._pending_added:
+            # never shown, nothing to remove
+            self._pending_added.discard(host_name)
+            return
+        # hosts pending to be added are not shown yet
+        shown_idx = host_idx - sum(
+            self._hosts.index(name) < host_idx for name in self._pending_added
+        )
+        self.on_host_removed(shown_idx)
 
     def fetch_recent_data(self):
+        for pipeline in self.pipelines():
+            for result in pipeline.poll_results():
+                self.on_vision_result(result)
+
+        # only the first linked host is displayed
+        displayed = None
         for idx, host in enumerate(self.hosts()):
             if host.is_linked:
+                if displayed is None:
+                    displayed = host
                 host.poll_notifications()
                 try:
-                    frame = host.fetch_recent_frame()
-                    if frame is not None:
-                        self.on_recent_frame(frame)
-
-                        image = frame.bgr
+                    gaze_count = host.gaze_buffer.total_samples
+                    with self.metrics.timer("acquire"):
+                        frame = host.fetch_recent_frame()
+                        gaze = host.fetch_recent_gaze()
 
-                        # logger.warning(
-                        #     f"Type test {type(test)} "
-                        # )
-
-                        # image = plt.imshow(img, interpolation='nearest')
-                        # plt.show()
-                        # plt.draw()
-                        
-                        
+                    if gaze:
+                        # every new sample, fetch_recent_gaze() only returns the last
+                        new_count = host.gaze_buffer.total_samples - gaze_count
+                        new_samples = host.gaze_buffer.view()[-new_count:]
+                        host_name = self.pipeline_for(host).name
+                        self.on_gaze_samples(host_name, new_samples.copy())
 
-                        # image = Image.fromarray(img, 'RGB')
-                        # logger.warning(type(image))
-                        # # img.save('my.png')
-                        # image.show()
-                        # aruco(img)
-                        image = imutils.resize(image, width=1000)
+                    if frame is not None and host is displayed:
+                        self.on_recent_frame(frame)
 
-                    gaze = host.fetch_recent_gaze()
-                    if gaze:
+                    if gaze and host is displayed:
                         self.on_recent_gaze(gaze)
                         # print(f"Coordonnees absolues : {gaze}")    # Modif VDB
                     # else: #est ce qu'on peut considérer que si on a pas de gaze, on clique ?
 
-
-                    # ____________ détection des markers et clic __________________
-                    # le rectangle délimitant l'écran a été créé comme suit avec les markers 24, 42, 66 et 70 disponibles dans le github grâce à ArUco : 
-                    #  __________________________
-                    # |ID42                  ID24|
-                    # |                          |
-                    # |ID66__________________ID70|
-                    
-                    
-                    markerrrrss = {24 : 0, 42 : 0, 66 : 0, 70 : 0}
                     if gaze and frame:
-                        (corners, ids, rejected) = cv2.aruco.detectMarkers(image, arucoDict,
-                                                parameters=arucoParams)
-                        
-                        os.system('cls' if os.name == 'nt' else 'clear')
-                        logger.warning(f"detect {len(corners)} markers {ids}")                        
-
-                        if len(corners) > 3:        # si il y a plus de 3 markers, alors on peut faire le clic
-                            # flatten the ArUco IDs list
-                            ids = ids.flatten()
-
-                            # loop over the detected ArUCo corners
-                            for (markerCorner, markerID) in zip(corners, ids):
-                                # extract the marker corners (which are always returned in
-                                # top-left, top-right, bottom-right, and bottom-left order)
-                                corners = markerCorner.reshape((4, 2))
-                                (topLeft, topRight, bottomRight, bottomLeft) = corners
-
-                                # convert each of the (x, y)-coordinate pairs to integers
-                                # topRight = (int(topRight[0]), int(topRight[1]))
-                                # bottomRight = (int(bottomRight[0]), int(bottomRight[1]))
-                                # bottomLeft = (int(bottomLeft[0]), int(bottomLeft[1]))
-                                # topLeft = (int(topLeft[0]), int(topLeft[1]))
-
-                                # print("[INFO] ArUco marker ID: {}".format(markerID))
-                                # logger.warning(
-                                #     f"[INFO] ArUco marker ID: {markerID} "
-                                # )
-
-                                # le rectange est composé des markers aux ID 42 en haut à droite, 24 en haut à gauche, ...
-                                if markerID == 42:
-                                    markerrrrss[markerID] = (int(topLeft[0]), int(topLeft[1]))
-                                elif markerID == 24:
-                                    markerrrrss[markerID] = (int(topRight[0]), int(topRight[1]))
-                                elif markerID == 66:
-                                    markerrrrss[markerID] = (int(bottomLeft[0]), int(bottomLeft[1]))
-                                elif markerID == 70:
-                                    markerrrrss[markerID] = (int(bottomRight[0]), int(bottomRight[1]))
-
-
-
-                            # logger.warning(markerrrrss.keys())
-                            # la création du polygone se fait en détectant les points dans le sens trigonométrique
-                            # ici, on détecte sur l'utilisateur regarde dans le rectangle créé par les markers.
-                            # la fonction polygon.contains permet d'inclure les transformations dûes à l'orientation des lunettes par rapports aux markers en 1 fonction
-                            if Polygon([(markerrrrss[24][0], markerrrrss[24][1]), (markerrrrss[42][0], markerrrrss[42][1]), (markerrrrss[66][0], markerrrrss[66][1]), (markerrrrss[70][0], markerrrrss[70][1])]).contains(Point(gaze[0], gaze[1])):
-                                logger.warning("Oui, le gaze est compris dans le rectangle formé par les 4 markers")
-                                width = markerrrrss[24][0] - markerrrrss[42][0]
-                                height = markerrrrss[66][1] - markerrrrss[42][1]
-                                relative_position_x = (gaze[0] - markerrrrss[42][0])/width
-                                relative_position_y = (gaze[1] - markerrrrss[42][1])/height
-                                screen_width = 1920
-                                screen_height = 1080
-                                mouse.move(relative_position_x * screen_width, relative_position_y * screen_height, absolute=True, duration=0)
-
-                                #pour cliquer avec le clin d'oeil, il faut voir si ça existe dans les sensors : ceux-ci sont cités à la fin dans https://github.com/pupil-labs/pyndsi/blob/master/src/ndsi/sensor.py
-                                # ça n'a pas l'air possible donc il faudrait sûrement le faire avec le gaze qui n'existerait pas avec un oeil fermé ? donc on ajouterait un else à if gaze
-                            else:
-                                logger.warning("Non, Le gaze n'est pas compris dans le rectangle formé par les 4 markers")
-
-                            # ___________________ fin du code de détection des markers et clic _______________
+                        # pair the frame with the gaze sample closest to it in time
+                        _, x, y = host.gaze_buffer.nearest(frame.timestamp).tolist()
+                        # all samples since the last job are mapped and smoothed
+                        samples = host.gaze_buffer.since(host.last_submitted_gaze_ts)
+                        if not len(samples):
+                            # duplicate timestamps or a clock that went backwards,
+                            # e.g. after a reconnect: continue from the newest sample
+                            latest_ts = host.gaze_buffer.latest()[0]
+                            host.last_submitted_gaze_ts = latest_ts
+                            continue
+                        samples = samples.copy()
+                        host.last_submitted_gaze_ts = samples[-1, 0]
+                        pipeline = self.pipeline_for(host)
+                        for result in pipeline.submit(frame, (x, y), samples):
+                            self.on_vision_result(result)
                 except ndsi.sensor.NotDataSubSupportedError:
                     logger.warning(
                         f"Host {host} is in bad state. "
                         "Please force-restart Pupil Invisible Companion."
                     )
-                    self.is_in_bad_state = True
+                    host.is_in_bad_state = True
                     self.on_host_changed(idx)
 
     def on_host_added(self, host_idx):
@@ -406,5 +479,13 @@ class Host_Controller(Observable):
     def on_recent_gaze(self, gaze):
         pass
 
+    def on_gaze_samples(self, host_name, samples):
+        # (N, 3) array of the (ts, x, y) samples received from a linked host since
+        # the last call, host_name as in the VisionResults of its pipeline
+        pass
+
+    def on_vision_result(self, result: VisionResult):
+        pass
+
     def on_host_linked(self):
         pass
@@ -9,10 +9,16 @@ See COPYING and COPYING.LESSER for license details.
 ---------------------------------------------------------------------------~(*)
 """
 
+import collections
 import functools
 import inspect
+import logging
+import threading
+import time
 import weakref
 
+logger = logging.getLogger(__name__)
+
 
 class ObserverError(Exception):
     pass
@@ -24,7 +30,7 @@ class Observable:
     the docstring for add_observer for more information.
     """
 
-    def add_observer(self, method_name, observer):
+    def add_observer(self, method_name, observer, executor=None):
         """
         Adds an observer to a method. An observer is an arbitrary callable. Every time
         the method is invoked, the observer will be called.
@@ -54,11 +60,19 @@ class Observable:
         However, this means that the object will get garbage collected if its only
         referenced from an Observable. Use a callable class or lambda in this case.
 
+        With an `executor`, the observer is called asynchronously, such that a slow
+        observer cannot slow down the observed method. The executor is an
+        ObserverQueue, which drops calls if the observer falls behind, or anything
+        with submit(fn, *args, **kwargs), e.g. a ThreadPoolExecutor. Exceptions of
+        asynchronous observers cannot reach the caller and are logged instead.
+
         Args:
             method_name (String): The name of a bound method to which the observer
                 will be added. Unbound methods (i.e. static and class methods) are NOT
                 supported.
             observer (Callable): Will be called every time the method is invoked.
+            executor (ObserverQueue or Executor): Calls the observer asynchronously
+                if given.
 
         Raises:
             AttributeError: The attribute specified by method_name is not found in
@@ -68,7 +82,7 @@ class Observable:
                 2) a class or static method.
 
         """
-        add_observer(self, method_name, observer)
+        add_observer(self, method_name, observer, executor)
 
     def remove_observer(self, method_name, observer):
         """
@@ -118,7 +132,7 @@ class Observable:
         remove_all_observers(self, method_name)
 
 
-def add_observer(obj, method_name, observer):
+def add_observer(obj, method_name, observer, executor=None):
     """
     Adds an observer to a bound method of an arbitrary instance object.
 
@@ -127,7 +141,7 @@ def add_observer(obj, method_name, observer):
 
     """
     observable = _get_wrapper_and_create_if_not_exists(obj, method_name)
-    observable.add_observer(observer)
+    observable.add_observer(observer, executor)
 
 
 def _get_wrapper_and_create_if_not_exists(obj, method_name):
@@ -199,6 +213,9 @@ class _ObservableMethodWrapper:
         self._original_method = getattr(obj, method_name)
         self._method_name = method_name
         self._observers = []
+        # (observer ref, object ref, method name) of weakly referenced methods or
+        # (observer ref, None, callable) of the others, rebuilt after changes
+        self._dispatch = ()
         self._was_removed = False
         self._patch_method_to_call_wrapper_instead()
 
@@ -210,7 +227,7 @@ class _ObservableMethodWrapper:
         setattr(self._obj, self._method_name, self._original_method)
         self._was_removed = True
 
-    def add_observer(self, observer):
+    def add_observer(self, observer, executor=None):
         # Observers that are bound methods are referenced weakly. That means,
         # they might get deleted together with their object if the object is not
         # referenced anymore elsewhere. The weak references are critical, because a
@@ -222,7 +239,10 @@ class _ObservableMethodWrapper:
             observer_ref = _WeakReferenceToMethod(observer)
         else:
             observer_ref = _StrongReferenceToCallable(observer)
+        if executor is not None:
+            observer_ref = _AsynchronousObserver(observer_ref, executor)
         self._observers.append(observer_ref)
+        self._update_dispatch()
 
     def remove_observer(self, observer):
         try:
@@ -231,9 +251,20 @@ class _ObservableMethodWrapper:
             raise ValueError(
                 "No observer {} found that could be removed!".format(observer)
             ) from None
+        self._update_dispatch()
 
     def remove_all_observers(self):
         self._observers = []
+        self._update_dispatch()
+
+    def _update_dispatch(self):
+        self._dispatch = tuple(
+            observer.dispatch_entry() for observer in self._observers
+        )
+
+    def _drop_invalid_observer(self, observer_ref):
+        self._observers.remove(observer_ref)
+        self._update_dispatch()
 
     def __call__(self, *args, **kwargs):
         if self._was_removed:
@@ -245,17 +276,25 @@ class _ObservableMethodWrapper:
             )
         try:
             return self._original_method(*args, **kwargs)
-        except Exception:
-            raise
         finally:
             self.call_all_observers(args, kwargs)
 
     def call_all_observers(self, args, kwargs):
-        for observer in self._observers:
+        # the observers are resolved once when they are added or removed, weak
+        # references are only dereferenced to the object, which is checked here
+        for observer_ref, obj_ref, target in self._dispatch:
             try:
-                observer(*args, **kwargs)
+                if obj_ref is None:
+                    target(*args, **kwargs)
+                    continue
+                obj = obj_ref()
+                method = None if obj is None else getattr(obj, target, None)
+                if method is None:
+                    self._drop_invalid_observer(observer_ref)
+                    continue
+                method(*args, **kwargs)
             except _ReferenceNoLongerValidError:
-                self._observers.remove(observer)
+                self._drop_invalid_observer(observer_ref)
             except Exception as e:
                 # exceptions by observers are wrapped s.t. they cannot be confused
                 # with exceptions from the original method.
@@ -281,6 +320,12 @@ class _StrongReferenceToCallable:
     def __eq__(self, other_observer):
         return self._observer == other_observer
 
+    def dispatch_entry(self):
+        return self, None, self._observer
+
+    def is_valid(self):
+        return True
+
 
 class _WeakReferenceToMethod:
     # One cannot create weakrefs to bound class methods directly, because Python
@@ -303,6 +348,16 @@ class _WeakReferenceToMethod:
             raise _ReferenceNoLongerValidError
         return method(*args, **kwargs)
 
+    def is_valid(self):
+        return self._method_still_exists(self._func_ref(), self._obj_ref())
+
+    def dispatch_entry(self):
+        func_deref = self._func_ref()
+        if func_deref is None:
+            # called like an object that no longer exists, i.e. dropped on first call
+            return self, self._obj_ref, ""
+        return self, self._obj_ref, func_deref.__name__
+
     def __eq__(self, other_observer):
         if inspect.ismethod(other_observer):
             obj_deref = self._obj_ref()
@@ -319,3 +374,131 @@ class _WeakReferenceToMethod:
     @staticmethod
     def _method_still_exists(func_deref, obj_deref):
         return obj_deref is not None and func_deref is not None
+
+
+class _AsynchronousObserver:
+    """Hands the calls of an observer reference over to an executor."""
+
+    def __init__(self, observer_ref, executor):
+        self._observer_ref = observer_ref
+        self._executor = executor
+
+    def __call__(self, *args, **kwargs):
+        if not self._observer_ref.is_valid():
+            raise _ReferenceNoLongerValidError
+        self._executor.submit(self._call, args, kwargs)
+
+    def _call(self, args, kwargs):
+        try:
+            self._observer_ref(*args, **kwargs)
+        except _ReferenceNoLongerValidError:
+            pass
+        except Exception:
+            logger.exception("An asynchronous observer raised an exception.")
+            if isinstance(self._executor, ObserverQueue):
+                self._executor.errors += 1
+
+    def dispatch_entry(self):
+        return self, None, self
+
+    def __eq__(self, other_observer):
+        return self._observer_ref == other_observer
+
+
+class ObserverQueue:
+    """
+    Calls observers on its own thread, in order. Calls wait in a queue of at most
+    `maxsize` calls. If the queue is full, the `drop` policy decides:
+        "oldest": the oldest waiting call is dropped (default)
+        "newest": the new call is dropped
+        "block": the observed method waits for space in the queue
+
+    stats() counts submitted, called and dropped calls, and the lag of the last
+    and slowest call between submission and start. With a `metrics` registry, the
+    lag of each call is recorded as the "lag.<name>" timer.
+    """
+
+    DROP_POLICIES = ("oldest", "newest", "block")
+
+    def __init__(self, maxsize=16, drop="oldest", name="observer", metrics=None):
+        if drop not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop}'")
+        self.maxsize = maxsize
+        self.drop = drop
+        self.name = name
+        self.metrics = metrics
+        self._calls = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.submitted = 0
+        self.called = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        if metrics is not None:
+            metrics.add_gauge(f"observer.{name}", self.stats)
+
+    def submit(self, fn, *args, **kwargs):
+        with self._cond:
+            if self._closed:
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"observer-{self.name}", daemon=True
+                )
+                self._thread.start()
+            self.submitted += 1
+            if len(self._calls) >= self.maxsize:
+                if self.drop == "newest":
+                    self.dropped += 1
+                    return
+                if self.drop == "oldest":
+                    self._calls.popleft()
+                    self.dropped += 1
+                else:
+                    self._cond.wait_for(
+                        lambda: len(self._calls) < self.maxsize or self._closed
+                    )
+            self._calls.append((time.monotonic(), fn, args, kwargs))
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._calls or self._closed)
+                if not self._calls:
+                    return
+                submitted_at, fn, args, kwargs = self._calls.popleft()
+                self._cond.notify_all()
+            lag = time.monotonic() - submitted_at
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if self.metrics is not None:
+                self.metrics.record(f"lag.{self.name}", lag)
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                logger.exception(f"Call on {self.name} queue failed.")
+                self.errors += 1
+            self.called += 1
+
+    def close(self, timeout=None):
+        """Stops the thread after the waiting calls."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "called": self.called,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": len(self._calls),
+            "last_lag_ms": self.last_lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
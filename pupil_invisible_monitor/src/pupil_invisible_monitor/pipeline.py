@@ -0,0 +1,211 @@
+import json
+import logging
+import typing as T
+
+import numpy as np
+
+from .filters import NoFilter
+from .layout import LayoutMapper, ScreenLayout
+from .mapping import SCREEN_CORNER_MARKERS
+from .markers import LumaPreprocessor
+from .metrics import MetricsRegistry
+from .worker import VisionWorker
+
+logger = logging.getLogger(__name__)
+
+
+class VisionResult(T.NamedTuple):
+    frame_timestamp: float
+    gaze: T.Tuple[float, float]
+    marker_ids: T.Optional[T.List[int]]
+    screen_pos: T.Optional[T.Tuple[float, float]]
+    host_name: T.Optional[str] = None
+    # (4, 2) screen corners in frame pixels and the 3x3 scene -> screen homography
+    # the gaze was mapped with, None if the screen was not found
+    screen_quad: T.Optional[np.ndarray] = None
+    homography: T.Optional[np.ndarray] = None
+
+
+class HostPipeline:
+    """
+    Processing of the scene frames and gaze of one host: marker detection, mapping
+    to the screens of its layout, smoothing and output to its mouse sink. Runs inline
+    or, after start_worker(), on its own VisionWorker thread.
+    """
+
+    def __init__(
+        self,
+        mouse_sink,
+        marker_detector,
+        screen_layout: T.Optional[ScreenLayout] = None,
+        metrics: T.Optional[MetricsRegistry] = None,
+        name: T.Optional[str] = None,
+    ):
+        self.name = name
+        # anything with move(x, y, absolute, duration), e.g. actuator.NullMouse
+        self.mouse = mouse_sink
+        self.marker_detector = marker_detector
+        # the screens and their corner markers, see layout.screen_layout_from_args()
+        self.screen_layout = screen_layout or ScreenLayout.single()
+        self.layout_mapper = LayoutMapper(self.screen_layout)
+        # markers are detected on the luma plane, set target_width to downscale it
+        self.image_preprocessor = LumaPreprocessor()
+        # smoothing between mapping and mouse moves, see filters.filter_from_args()
+        self.cursor_filter = NoFilter()
+        # clicks on fixations if set, see dwell.dwell_clicker_from_args()
+        self.dwell_clicker = None
+        # processes frames inline if None, see start_worker()
+        self.vision_worker = None
+        # per-stage timers: detect, map, filter, actuate
+        self.metrics = MetricsRegistry() if metrics is None else metrics
+
+    def __str__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+    def start_worker(self):
+        """Moves marker detection, mapping and mouse moves off the calling thread."""
+        if self.vision_worker is None:
+            name = "vision-worker" if self.name is None else f"vision-{self.name}"
+            self.vision_worker = VisionWorker(
+                self.process_frame, name=name, merge=self._merge_jobs
+            )
+            self.vision_worker.start()
+            gauge = "vision_worker"
+            if self.name is not None:
+                gauge = f"{gauge}.{self.name}"
+            self.metrics.add_gauge(gauge, self.vision_worker.stats)
+
+    def stop_worker(self):
+        if self.vision_worker is not None:
+            self.vision_worker.stop()
+            logger.debug(f"{self} worker stats: {self.vision_worker.stats()}")
+            self.vision_worker = None
+
+    def submit(self, frame, gaze, samples) -> T.List[VisionResult]:
+        """Processes the frame on the worker, or inline and returns its result."""
+        if self.vision_worker is not None:
+            # newest frame wins, stale frames are dropped by the worker but their
+            # gaze samples are kept, see _merge_jobs()
+            self.vision_worker.submit(frame, gaze, samples)
+            return []
+        return [self.process_frame(frame, gaze, samples)]
+
+    @staticmethod
+    def _merge_jobs(pending, job):
+        # the filters and the dwell clicker need every gaze sample, those of a stale
+        # frame are mapped with the markers of the frame replacing it
+        frame, gaze, samples = job
+        if pending[2] is not None and samples is not None:
+            samples = np.concatenate((pending[2], samples))
+        return frame, gaze, samples
+
+    def poll_results(self) -> T.List[VisionResult]:
+        if self.vision_worker is None:
+            return []
+        return self.vision_worker.poll_results()
+
+    def process_frame(self, frame, gaze, samples=None) -> VisionResult:
+        # samples: (N, 3) array of (ts, x, y) gaze, defaults to gaze at the frame time
+        if samples is None:
+            samples = np.array(((frame.timestamp,) + tuple(gaze),))
+
+        # ____________ détection des markers et clic __________________
+        with self.metrics.timer("detect"):
+            image = self.prepare_image(frame)
+            corners, ids = self.detect_markers(image)
+
+        screen_pos = None
+        quad = homography = None
+        # markers may be detected on a downscaled image, gaze is in frame pixels
+        scale = frame.width / image.shape[1]
+        with self.metrics.timer("map"):
+            # also with some or all markers occluded, see pose.ScreenPoseTracker
+            mapped = self.map_gaze(
+                samples[:, 1:], corners, ids, scale, frame.timestamp
+            )
+        if mapped is not None:
+            screen_points, inside = mapped
+            # of the screen the gaze is on, replaced, not modified, on updates
+            screen_mapper = self.layout_mapper.current_mapper
+            if screen_mapper is not None:
+                quad = screen_mapper.quad
+                homography = screen_mapper.homography
+            if inside.any():
+                timestamps = samples[inside, 0]
+                with self.metrics.timer("filter"):
+                    smoothed = self.filter_cursor(timestamps, screen_points[inside])
+                screen_pos = tuple(smoothed[-1].tolist())
+                with self.metrics.timer("actuate"):
+                    self.move_mouse(*screen_pos)
+                    if self.dwell_clicker is not None:
+                        self.dwell_clicker.update(timestamps, screen_points[inside])
+        # ___________________ fin du code de détection des markers et clic _______________
+
+        marker_ids = None if ids is None else ids.ravel().tolist()
+        return VisionResult(
+            frame.timestamp, gaze, marker_ids, screen_pos, self.name, quad, homography
+        )
+
+    def prepare_image(self, frame):
+        return self.image_preprocessor.prepare(frame)
+
+    def detect_markers(self, image):
+        return self.marker_detector.detect(image)
+
+    def map_gaze(self, points, corners, ids, scale=1.0, timestamp=None):
+        """
+        Maps (N, 2) scene points to desktop coordinates. Returns (desktop points,
+        inside mask) or None if the pose of no screen is known.
+        """
+        marker_corners = self.screen_layout.marker_corners(corners, ids)
+        visible = self.layout_mapper.track(timestamp, marker_corners * scale)
+        if not visible.any():
+            return None
+
+        # the homographies include the transformations due to the orientation of the
+        # glasses relative to the screens
+        return self.layout_mapper.map_inside(points)
+
+    def filter_cursor(self, timestamps, screen_points):
+        return self.cursor_filter.filter(timestamps, screen_points)
+
+    def move_mouse(self, x, y):
+        self.mouse.move(x, y, absolute=True, duration=0)
+
+
+class HostConfig(T.NamedTuple):
+    # ids of the markers at the top-left, top-right, bottom-right, bottom-left corner
+    markers: T.Tuple[int, int, int, int] = tuple(m for m, _ in SCREEN_CORNER_MARKERS)
+    screen_size: T.Tuple[int, int] = (1920, 1080)
+    # "mouse" drives the local mouse, "none" only reports the mapped gaze
+    output: str = "none"
+
+    @property
+    def corner_markers(self):
+        # like the default markers, each marker's corner i is the screen corner i
+        return tuple(zip(self.markers, range(4)))
+
+
+def load_host_configs(path) -> T.Dict[str, HostConfig]:
+    """
+    Reads per-host settings for multi-host mode from a JSON file like
+    {"PI-1": {"markers": [42, 24, 70, 66], "screen_size": [1920, 1080],
+    "output": "mouse"}, ...}. Missing settings take the HostConfig defaults.
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    configs = {}
+    for host_name, settings in raw.items():
+        settings = {
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in settings.items()
+        }
+        config = HostConfig(**settings)
+        if len(config.markers) != 4:
+            raise ValueError(f"{host_name}: expected 4 marker ids: {config.markers}")
+        if config.output not in ("mouse", "none"):
+            raise ValueError(f"{host_name}: unknown output '{config.output}'")
+        configs[host_name] = config
+    if sum(config.output == "mouse" for config in configs.values()) > 1:
+        logger.warning("Several hosts drive the local mouse")
+    return configs
@@ -0,0 +1,71 @@
+"""
+Waiting for sensor data of the linked hosts, so the main loops can sleep instead of
+polling at a fixed rate.
+"""
+
+import logging
+import time
+import typing as T
+
+import zmq
+
+logger = logging.getLogger(__name__)
+
+
+class SensorPoller:
+    """
+    Waits on the data and notification sockets of the sensors of the linked hosts
+    of a Host_Controller. Sensors without sockets, e.g. replay sensors, always count
+    as ready after `idle_interval` seconds.
+    """
+
+    def __init__(self, controller, idle_interval=0.005):
+        self.controller = controller
+        self.idle_interval = idle_interval
+        self._poller = None
+        self._sockets = ()
+        self.waits = 0
+        self.timeouts = 0
+
+    def sensor_sockets(self) -> T.Tuple[T.Tuple[zmq.Socket, ...], bool]:
+        """
+        Data and notification sockets of the linked sensors, and whether all linked
+        sensors have sockets to wait on.
+        """
+        sockets = []
+        complete = True
+        for host in self.controller.hosts():
+            if not host.is_linked:
+                continue
+            for sensor in host.sensors.values():
+                sensor_sockets = [
+                    getattr(sensor, "data_sub", None),
+                    getattr(sensor, "notify_sub", None),
+                ]
+                if None in sensor_sockets:
+                    complete = False
+                sockets.extend(sock for sock in sensor_sockets if sock is not None)
+        return tuple(sockets), complete
+
+    def wait(self, timeout: float) -> bool:
+        """Blocks until a sensor socket is readable or `timeout` passed."""
+        sockets, complete = self.sensor_sockets()
+        if not complete:
+            timeout = min(timeout, self.idle_interval)
+        self.waits += 1
+        if not sockets:
+            time.sleep(max(0.0, timeout))
+            self.timeouts += complete
+            return not complete
+
+        if sockets != self._sockets:
+            self._poller = zmq.Poller()
+            for sock in sockets:
+                self._poller.register(sock, zmq.POLLIN)
+            self._sockets = sockets
+        ready = bool(self._poller.poll(max(0.0, timeout) * 1000))
+        self.timeouts += not ready
+        return ready or not complete
+
+    def stats(self) -> T.Dict[str, int]:
+        return {"waits": self.waits, "timeouts": self.timeouts}
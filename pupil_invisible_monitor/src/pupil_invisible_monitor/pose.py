@@ -0,0 +1,213 @@
+"""
+Screen pose while some of its markers are occluded, e.g. by a hand or a window in
+front of a corner, or out of the scene camera's view.
+
+The markers sit in the screen corners with their edges along the screen edges, so
+each visible marker gives the direction of the two screen edges meeting in its
+corner. Three markers, or two in opposite corners, determine all four screen edges
+and the missing corners are their intersections.
+
+Whenever the pose is known, the corners of the visible markers are stored in unit
+screen coordinates. Once known, the homography is fitted to the corners of the
+visible markers, and, unless two of them are in opposite corners, with less weight
+to those of the missing markers where the screen would be with constant velocity.
+Without any marker, the screen corners are extrapolated for up to
+`max_prediction_time` seconds.
+"""
+
+import logging
+import typing as T
+
+import numpy as np
+
+from .mapping import (
+    UNIT_SQUARE,
+    homography_from_points,
+    homography_from_quads,
+    transform_points,
+)
+
+logger = logging.getLogger(__name__)
+
+# how the pose of a frame was obtained, from best to worst
+POSE_SOURCES = ("full", "partial", "edges", "predicted", "lost")
+
+
+def _line(p, q) -> np.ndarray:
+    # homogeneous line through two points
+    return np.cross(np.append(p, 1.0), np.append(q, 1.0))
+
+
+def _is_convex(quad) -> bool:
+    edges = np.roll(quad, -1, axis=0) - quad
+    following = np.roll(edges, -1, axis=0)
+    turns = edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0]
+    return bool(np.all(turns > 0) or np.all(turns < 0))
+
+
+class ScreenPoseTracker:
+    """
+    Screen quad of one screen from the corners of its detected markers, see module
+    docstring. `outer_corners` are the indices of the marker corners at the top-left,
+    top-right, bottom-right and bottom-left screen corner.
+    """
+
+    def __init__(
+        self,
+        outer_corners=(0, 1, 2, 3),
+        max_prediction_time: float = 0.3,
+        velocity_smoothing: float = 0.5,
+        prediction_weight: float = 0.25,
+        geometry_interval: float = 1.0,
+    ):
+        self.outer_corners = np.asarray(outer_corners, dtype=np.intp)
+        self.max_prediction_time = max_prediction_time
+        # weight of the previous velocity in its exponential moving average
+        self.velocity_smoothing = velocity_smoothing
+        # weight of the predicted relative to the detected marker corners
+        self.prediction_weight = prediction_weight
+        # the markers do not move on the screen, their geometry is only refreshed
+        # every `geometry_interval` seconds while all of them are visible
+        self.geometry_interval = geometry_interval
+        self.reset()
+
+    def reset(self):
+        # (marker, marker corner, xy) in unit screen coordinates, NaN until seen
+        self.geometry = np.full((4, 4, 2), np.nan)
+        self._full_geometry_at = None
+        # last estimated screen quad, its timestamp and its velocity in pixels/s
+        self.quad = None
+        self.timestamp = None
+        self.velocity = np.zeros((4, 2))
+        self.source = "lost"
+
+    def update(self, timestamp, marker_corners: np.ndarray) -> T.Optional[np.ndarray]:
+        """
+        Takes the (4, 4, 2) corners of the markers at the top-left, top-right,
+        bottom-right and bottom-left screen corner, NaN if not detected. Returns the
+        (4, 2) screen quad or None, `source` tells how it was obtained.
+        """
+        visible = ~np.isnan(marker_corners).any(axis=(1, 2))
+        count = int(visible.sum())
+        known = ~np.isnan(self.geometry).any(axis=(1, 2))
+        quad = None
+        if count == 4:
+            quad = marker_corners[np.arange(4), self.outer_corners]
+            source = "full"
+            if self._geometry_outdated(timestamp):
+                self._learn_geometry(quad, marker_corners, visible)
+                self._full_geometry_at = timestamp
+        elif count and (known[visible].all() or count == 1):
+            quad = self._quad_from_geometry(timestamp, marker_corners, visible, known)
+            source = "partial"
+        elif count >= 2:
+            # markers that were never seen with the whole screen
+            quad = self._quad_from_edges(marker_corners, visible)
+            source = "edges"
+            if quad is not None:
+                self._learn_geometry(quad, marker_corners, visible & ~known)
+
+        if quad is not None:
+            self._set_pose(timestamp, quad)
+        else:
+            # the last observed pose stays the base of the prediction
+            quad = self.predict(timestamp)
+            source = "lost" if quad is None else "predicted"
+        self.source = source
+        return quad
+
+    def predict(self, timestamp) -> T.Optional[np.ndarray]:
+        """Screen quad at `timestamp` with constant velocity, None if too old."""
+        if self.quad is None or timestamp is None or self.timestamp is None:
+            return None
+        dt = max(0.0, timestamp - self.timestamp)
+        if dt > self.max_prediction_time:
+            return None
+        return self.quad + self.velocity * dt
+
+    def _quad_from_edges(self, marker_corners, visible) -> T.Optional[np.ndarray]:
+        outer = marker_corners[np.arange(4), self.outer_corners]
+        # edge i runs from screen corner i to i + 1
+        edges = []
+        for start in range(4):
+            end = (start + 1) % 4
+            if visible[start] and visible[end]:
+                edges.append(_line(outer[start], outer[end]))
+            elif visible[start]:
+                # the marker edge leaving the outer corner towards the next corner
+                corner = self.outer_corners[start]
+                marker = marker_corners[start]
+                edges.append(_line(marker[corner], marker[(corner + 1) % 4]))
+            elif visible[end]:
+                corner = self.outer_corners[end]
+                marker = marker_corners[end]
+                edges.append(_line(marker[(corner - 1) % 4], marker[corner]))
+            else:
+                return None
+
+        quad = outer.copy()
+        for corner in np.flatnonzero(~visible):
+            x, y, w = np.cross(edges[corner - 1], edges[corner])
+            if abs(w) < 1e-9:
+                return None
+            quad[corner] = x / w, y / w
+        # nearly parallel edges intersect far off or on the wrong side
+        return quad if _is_convex(quad) else None
+
+    def _quad_from_geometry(
+        self, timestamp, marker_corners, visible, known
+    ) -> T.Optional[np.ndarray]:
+        observed = visible & known
+        if not observed.any():
+            return None
+        src = [self.geometry[observed].reshape(-1, 2)]
+        dst = [marker_corners[observed].reshape(-1, 2)]
+        weights = [np.ones(len(src[0]))]
+        # markers in opposite corners determine the pose, the prediction would
+        # only hold it back. It stabilizes the fit to one marker or one edge.
+        spans_screen = (observed[0] and observed[2]) or (observed[1] and observed[3])
+        predicted = None if spans_screen else self.predict(timestamp)
+        missing = ~visible & known
+        if predicted is not None and missing.any():
+            try:
+                to_scene = homography_from_quads(UNIT_SQUARE, predicted)
+            except np.linalg.LinAlgError:
+                pass
+            else:
+                src.append(self.geometry[missing].reshape(-1, 2))
+                dst.append(transform_points(to_scene, src[-1]))
+                weights.append(np.full(len(src[-1]), self.prediction_weight))
+        try:
+            to_scene = homography_from_points(
+                np.concatenate(src), np.concatenate(dst), np.concatenate(weights)
+            )
+        except np.linalg.LinAlgError:
+            return None
+        quad = transform_points(to_scene, UNIT_SQUARE)
+        return quad if _is_convex(quad) else None
+
+    def _geometry_outdated(self, timestamp) -> bool:
+        if self._full_geometry_at is None or timestamp is None:
+            return True
+        return abs(timestamp - self._full_geometry_at) >= self.geometry_interval
+
+    def _learn_geometry(self, quad, marker_corners, visible):
+        try:
+            to_unit = homography_from_quads(quad, UNIT_SQUARE)
+        except np.linalg.LinAlgError:
+            return
+        self.geometry[visible] = transform_points(
+            to_unit, marker_corners[visible]
+        ).reshape(-1, 4, 2)
+
+    def _set_pose(self, timestamp, quad):
+        if self.quad is not None and None not in (timestamp, self.timestamp):
+            dt = timestamp - self.timestamp
+            if 0 < dt <= self.max_prediction_time:
+                velocity = (quad - self.quad) / dt
+                smoothing = self.velocity_smoothing
+                self.velocity = smoothing * self.velocity + (1 - smoothing) * velocity
+            elif dt > self.max_prediction_time:
+                self.velocity = np.zeros((4, 2))
+        self.quad = quad
+        self.timestamp = timestamp
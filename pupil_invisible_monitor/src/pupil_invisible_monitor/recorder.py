@@ -0,0 +1,363 @@
+"""
+Session recording for post-hoc latency and accuracy analysis.
+
+Each stream (gaze, frames, vision results, mouse actions) is written as fixed-width
+records into preallocated, memory-mapped .npy chunks of `chunk_size` records, so
+recording a sample is a single row assignment. session.json lists the streams, the
+number of valid records and the host names. SessionReader opens a session as
+read-only memory-mapped arrays without copying.
+
+Records are written on the recorder's own ObserverQueue thread, so starting a new
+chunk and flushing the previous one never delays the UI loop or the vision worker.
+Their recorded_at time is taken on the calling thread and passed along, so it does
+not include the time spent in the queue.
+
+Layout of a session directory:
+    session.json
+    gaze.0000.npy, gaze.0001.npy, ...
+    frames.0000.npy, ...
+    vision.0000.npy, ...
+    actions.0000.npy, ...
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+import typing as T
+from pathlib import Path
+
+import numpy as np
+
+from .observable import ObserverQueue
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "session.json"
+
+# recorded_at is time.monotonic() when the recorder was called, NaN marks missing
+# values
+GAZE_DTYPE = np.dtype(
+    [
+        ("recorded_at", "f8"),
+        # sensor timestamp of the sample
+        ("timestamp", "f8"),
+        # index into the "hosts" list of the manifest
+        ("host", "i2"),
+        ("x", "f4"),
+        ("y", "f4"),
+    ]
+)
+FRAME_DTYPE = np.dtype(
+    [
+        ("recorded_at", "f8"),
+        ("timestamp", "f8"),
+        ("index", "i8"),
+        ("width", "i4"),
+        ("height", "i4"),
+    ]
+)
+VISION_DTYPE = np.dtype(
+    [
+        ("recorded_at", "f8"),
+        ("frame_timestamp", "f8"),
+        # index into the "hosts" list of the manifest
+        ("host", "i2"),
+        ("marker_count", "i2"),
+        ("gaze", "f4", (2,)),
+        ("screen_quad", "f4", (4, 2)),
+        ("homography", "f8", (3, 3)),
+        ("screen_pos", "f4", (2,)),
+    ]
+)
+ACTION_DTYPE = np.dtype(
+    [
+        ("recorded_at", "f8"),
+        ("action", "u1"),
+        # mouse button for clicks, scroll delta for wheels
+        ("value", "i2"),
+        ("x", "f4"),
+        ("y", "f4"),
+    ]
+)
+STREAM_DTYPES = {
+    "gaze": GAZE_DTYPE,
+    "frames": FRAME_DTYPE,
+    "vision": VISION_DTYPE,
+    "actions": ACTION_DTYPE,
+}
+
+ACTION_MOVE, ACTION_CLICK, ACTION_WHEEL = range(3)
+BUTTONS = ("left", "right", "middle")
+
+_NAN_QUAD = np.full((4, 2), np.nan)
+_NAN_HOMOGRAPHY = np.full((3, 3), np.nan)
+
+
+def _now(recorded_at: T.Optional[float]) -> float:
+    return time.monotonic() if recorded_at is None else recorded_at
+
+
+class ChunkedRecordWriter:
+    """
+    Appends records of `dtype` to memory-mapped .npy files of `chunk_size` records
+    each, named <name>.<chunk>.npy. Safe to append from several threads.
+    """
+
+    def __init__(self, directory: Path, name: str, dtype: np.dtype, chunk_size: int):
+        self.directory = directory
+        self.name = name
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.chunks = 0
+        self._chunk = None
+        self._idx = chunk_size
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def append(self, record: tuple):
+        with self._lock:
+            if self._closed:
+                return
+            if self._idx == self.chunk_size:
+                self._next_chunk()
+            self._chunk[self._idx] = record
+            self._idx += 1
+            self.count += 1
+
+    def extend(self, records: np.ndarray):
+        """Appends a structured array of records, split across chunks as needed."""
+        with self._lock:
+            if self._closed:
+                return
+            start = 0
+            while start < len(records):
+                if self._idx == self.chunk_size:
+                    self._next_chunk()
+                count = min(len(records) - start, self.chunk_size - self._idx)
+                self._chunk[self._idx : self._idx + count] = records[
+                    start : start + count
+                ]
+                self._idx += count
+                self.count += count
+                start += count
+
+    def _next_chunk(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+        path = self.directory / f"{self.name}.{self.chunks:04d}.npy"
+        self._chunk = np.lib.format.open_memmap(
+            path, mode="w+", dtype=self.dtype, shape=(self.chunk_size,)
+        )
+        self._idx = 0
+        self.chunks += 1
+
+    def close(self):
+        with self._lock:
+            if self._chunk is not None:
+                self._chunk.flush()
+                self._chunk = None
+            # late records, e.g. of a voice command during shutdown, are dropped
+            self._closed = True
+
+    def describe(self) -> T.Dict[str, T.Any]:
+        return {
+            "count": self.count,
+            "chunks": self.chunks,
+            "chunk_size": self.chunk_size,
+        }
+
+
+class RecordingMouse:
+    """Mouse sink that records each move, click and wheel before passing it on."""
+
+    def __init__(self, mouse_sink, recorder: "SessionRecorder"):
+        self._mouse = mouse_sink
+        self._record = functools.partial(
+            recorder.queue.submit, recorder.writers["actions"].append
+        )
+
+    def move(self, x, y, absolute=True, duration=0):
+        self._record((time.monotonic(), ACTION_MOVE, 0, x, y))
+        self._mouse.move(x, y, absolute=absolute, duration=duration)
+
+    def click(self, button="left"):
+        value = BUTTONS.index(button) if button in BUTTONS else -1
+        self._record((time.monotonic(), ACTION_CLICK, value, np.nan, np.nan))
+        self._mouse.click(button)
+
+    def wheel(self, delta=1):
+        self._record((time.monotonic(), ACTION_WHEEL, delta, np.nan, np.nan))
+        self._mouse.wheel(delta)
+
+
+class SessionRecorder:
+    """
+    Records the gaze, frames and vision results of a Host_Controller, see
+    attach(), and the mouse actions sent through recording_mouse().
+    """
+
+    def __init__(self, directory=None, chunk_size=65536, queue_size=1024):
+        if directory is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            directory = Path.home() / "pi_monitor_settings" / "sessions" / stamp
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.writers = {
+            name: ChunkedRecordWriter(self.directory, name, dtype, chunk_size)
+            for name, dtype in STREAM_DTYPES.items()
+        }
+        self._gaze = self.writers["gaze"]
+        self._frames = self.writers["frames"]
+        self._vision = self.writers["vision"]
+        # nothing is dropped, callers only wait if the recorder is far behind
+        self.queue = ObserverQueue(queue_size, drop="block", name="recorder")
+        self.hosts: T.Dict[T.Optional[str], int] = {}
+        self.started_at = time.time()
+        self.closed = False
+        self.write_manifest()
+
+    def attach(self, controller):
+        for method_name, record in (
+            ("on_gaze_samples", self.on_gaze_samples),
+            ("on_recent_frame", self.on_recent_frame),
+            ("on_vision_result", self.on_vision_result),
+        ):
+            controller.add_observer(method_name, self._enqueue(record))
+        controller.metrics.add_gauge("observer.recorder", self.queue.stats)
+
+    def _enqueue(self, record):
+        # stamps the call on the observed thread, the record is written on the queue's
+        def observer(*args):
+            self.queue.submit(record, *args, recorded_at=time.monotonic())
+
+        return observer
+
+    def recording_mouse(self, mouse_sink) -> RecordingMouse:
+        return RecordingMouse(mouse_sink, self)
+
+    def on_gaze_samples(self, host_name, samples, recorded_at=None):
+        records = np.empty(len(samples), dtype=GAZE_DTYPE)
+        records["recorded_at"] = _now(recorded_at)
+        records["timestamp"] = samples[:, 0]
+        records["host"] = self._host_index(host_name)
+        records["x"] = samples[:, 1]
+        records["y"] = samples[:, 2]
+        self._gaze.extend(records)
+
+    def on_recent_frame(self, frame, recorded_at=None):
+        self._frames.append(
+            (
+                _now(recorded_at),
+                frame.timestamp,
+                getattr(frame, "index", -1),
+                frame.width,
+                frame.height,
+            )
+        )
+
+    def on_vision_result(self, result, recorded_at=None):
+        host = self._host_index(result.host_name)
+        quad, homography = result.screen_quad, result.homography
+        if quad is None:
+            quad, homography = _NAN_QUAD, _NAN_HOMOGRAPHY
+        screen_pos = result.screen_pos
+        if screen_pos is None:
+            screen_pos = np.nan, np.nan
+        marker_count = 0 if result.marker_ids is None else len(result.marker_ids)
+        self._vision.append(
+            (
+                _now(recorded_at),
+                result.frame_timestamp,
+                host,
+                marker_count,
+                result.gaze,
+                quad,
+                homography,
+                screen_pos,
+            )
+        )
+
+    def _host_index(self, host_name) -> int:
+        try:
+            return self.hosts[host_name]
+        except KeyError:
+            host = self.hosts[host_name] = len(self.hosts)
+            return host
+
+    def write_manifest(self):
+        manifest = {
+            "started_at": self.started_at,
+            # counts are only known after close(), see SessionReader.chunks()
+            "closed": self.closed,
+            "hosts": list(self.hosts),
+            "streams": {
+                name: dict(writer.describe(), dtype=writer.dtype.descr)
+                for name, writer in self.writers.items()
+            },
+        }
+        with (self.directory / MANIFEST_NAME).open("w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def close(self):
+        # records waiting in the queue are written first
+        self.queue.close()
+        for writer in self.writers.values():
+            writer.close()
+        self.closed = True
+        self.write_manifest()
+        counts = {name: writer.count for name, writer in self.writers.items()}
+        logger.info(f"Session recorded to {self.directory}: {counts}")
+
+
+class SessionReader:
+    """
+    Opens a recorded session. reader["vision"] etc. are read-only memory maps of the
+    valid records, zero-copy unless a stream spans several chunks, in which case
+    they are concatenated; reader.chunks(name) never copies.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        with (self.directory / MANIFEST_NAME).open() as f:
+            self.manifest = json.load(f)
+        self.hosts = self.manifest["hosts"]
+
+    @property
+    def streams(self) -> T.List[str]:
+        return list(self.manifest["streams"])
+
+    def chunks(self, name: str) -> T.List[np.ndarray]:
+        if not self.manifest.get("closed", True):
+            return self._unclosed_chunks(name)
+        info = self.manifest["streams"][name]
+        remaining = info["count"]
+        chunks = []
+        for chunk in range(info["chunks"]):
+            if remaining <= 0:
+                break
+            path = self.directory / f"{name}.{chunk:04d}.npy"
+            records = np.load(path, mmap_mode="r")
+            chunks.append(records[:remaining])
+            remaining -= len(records)
+        return chunks
+
+    def _unclosed_chunks(self, name: str) -> T.List[np.ndarray]:
+        # the recorder did not exit cleanly, unwritten records are all zero
+        chunks = []
+        for path in sorted(self.directory.glob(f"{name}.*.npy")):
+            records = np.load(path, mmap_mode="r")
+            valid = int(np.count_nonzero(records["recorded_at"]))
+            if valid:
+                chunks.append(records[:valid])
+        return chunks
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        chunks = self.chunks(name)
+        if not chunks:
+            return np.empty(0, dtype=STREAM_DTYPES.get(name))
+        if len(chunks) == 1:
+            return chunks[0]
+        return np.concatenate(chunks)
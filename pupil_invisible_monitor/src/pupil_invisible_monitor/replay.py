@@ -0,0 +1,469 @@
+"""
+Offline replay of a recorded scene video and gaze stream through Host_Controller.
+
+Frames and gaze are fed through stand-ins for the ndsi network and sensors, so the
+regular attach -> link -> fetch_recent_data path runs without a device or network.
+Mouse moves go to a no-op sink. Frames are decoded as fast as possible, and per-frame
+timings for decode, marker detection, mapping and mouse.move are reported.
+
+Usage:
+    python -m pupil_invisible_monitor.replay Videos/1.mp4 --gaze gaze.csv
+"""
+
+import argparse
+import csv
+import logging
+import statistics
+import sys
+import time
+import typing as T
+
+import cv2
+import ndsi
+import numpy as np
+
+from .actuator import NullMouse
+from .dwell import DwellClicker, add_dwell_arguments, fixation_detector_from_args
+from .filters import NoFilter, add_filter_arguments, filter_from_args
+from .markers import (
+    DetectorProfile,
+    MarkerDetector,
+    add_detector_profile_arguments,
+    aruco_setup,
+    detector_profile_from_args,
+)
+from .models import Host_Controller
+from .pipeline import HostPipeline
+
+logger = logging.getLogger(__name__)
+
+REPLAY_HOST_UUID = "replay-host"
+VIDEO_SENSOR_UUID = "replay-video"
+GAZE_SENSOR_UUID = "replay-gaze"
+
+TIMED_STAGES = ("decode", "prepare", "detect", "map", "filter", "move")
+
+
+class ReplayClock:
+    """Replay time in seconds, advanced by the video sensor on each decoded frame."""
+
+    def __init__(self):
+        self.now = -np.inf
+
+
+class ReplayFrame:
+    """Mimics the attributes of an ndsi video frame that the monitor uses."""
+
+    yuv_buffer = None
+
+    def __init__(self, bgr, index, timestamp):
+        self.bgr = bgr
+        self.index = index
+        self.timestamp = timestamp
+        self.height, self.width = bgr.shape[:2]
+
+    @property
+    def gray(self):
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+
+
+class ReplaySensor:
+    has_notifications = False
+
+    def __init__(self, sensor_uuid, sensor_type, sensor_name, clock: ReplayClock):
+        self.uuid = sensor_uuid
+        self.type = sensor_type
+        self.name = sensor_name
+        self.clock = clock
+        self.controls = {}
+
+    def handle_notification(self):
+        pass
+
+    def set_control_value(self, control_id, value):
+        self.controls[control_id] = value
+
+    def refresh_controls(self):
+        pass
+
+    def unlink(self):
+        pass
+
+
+class ReplayVideoSensor(ReplaySensor):
+    def __init__(self, sensor_uuid, video_path, clock: ReplayClock, max_frames=None):
+        super().__init__(sensor_uuid, "video", "PI world v1", clock)
+        self.capture = cv2.VideoCapture(str(video_path))
+        if not self.capture.isOpened():
+            raise FileNotFoundError(f"Could not open video {video_path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.max_frames = max_frames
+        self.frame_count = 0
+        self.exhausted = False
+        self.last_decode_time = 0.0
+
+    def get_newest_data_frame(self, timeout=None):
+        if self.max_frames is not None and self.frame_count >= self.max_frames:
+            self.exhausted = True
+        if self.exhausted:
+            raise ndsi.StreamError("End of replay video.")
+
+        t0 = time.perf_counter()
+        ok, bgr = self.capture.read()
+        self.last_decode_time = time.perf_counter() - t0
+        if not ok:
+            self.exhausted = True
+            raise ndsi.StreamError("End of replay video.")
+
+        timestamp = self.frame_count / self.fps
+        frame = ReplayFrame(bgr, self.frame_count, timestamp)
+        self.frame_count += 1
+        self.clock.now = timestamp
+        return frame
+
+    def unlink(self):
+        self.capture.release()
+
+
+class ReplayGazeSensor(ReplaySensor):
+    def __init__(self, sensor_uuid, gaze: np.ndarray, clock: ReplayClock):
+        super().__init__(sensor_uuid, "gaze", "PI gaze", clock)
+        # gaze: (N, 3) float array of ts, x, y sorted by ts
+        self.gaze = gaze
+        self._cursor = 0
+
+    def fetch_data(self):
+        end = int(np.searchsorted(self.gaze[:, 0], self.clock.now, side="right"))
+        samples = self.gaze[self._cursor : end]
+        self._cursor = max(self._cursor, end)
+        for ts, x, y in samples.tolist():
+            yield x, y, ts
+
+
+class ReplayNetwork:
+    """Stand-in for ndsi.Network announcing one host with a video and gaze sensor."""
+
+    def __init__(
+        self, sensors: T.Sequence[ReplaySensor], host_name, formats=(), callbacks=()
+    ):
+        self.formats = formats
+        self.callbacks = callbacks
+        self.host_name = host_name
+        self._sensors = {sensor.uuid: sensor for sensor in sensors}
+        self._events = []
+
+    def start(self):
+        for sensor in self._sensors.values():
+            self._events.append(
+                {
+                    "subject": "attach",
+                    "host_uuid": REPLAY_HOST_UUID,
+                    "host_name": self.host_name,
+                    "sensor_uuid": sensor.uuid,
+                    "sensor_name": sensor.name,
+                    "sensor_type": sensor.type,
+                }
+            )
+
+    def stop(self):
+        self._events.clear()
+
+    @property
+    def has_events(self):
+        return bool(self._events)
+
+    def handle_event(self):
+        event = self._events.pop(0)
+        for callback in self.callbacks:
+            callback(self, event)
+
+    def sensor(self, sensor_uuid, callbacks=()):
+        return self._sensors[sensor_uuid]
+
+
+class ReplayPipeline(HostPipeline):
+    """HostPipeline that times each stage with ReplayHostController._timed()."""
+
+    timed: T.Callable = None
+
+    def prepare_image(self, frame):
+        return self.timed("prepare", super().prepare_image, frame)
+
+    def detect_markers(self, image):
+        return self.timed("detect", super().detect_markers, image)
+
+    def map_gaze(self, points, corners, ids, scale=1.0, timestamp=None):
+        return self.timed(
+            "map", super().map_gaze, points, corners, ids, scale, timestamp
+        )
+
+    def filter_cursor(self, timestamps, screen_points):
+        return self.timed("filter", super().filter_cursor, timestamps, screen_points)
+
+    def move_mouse(self, x, y):
+        return self.timed("move", super().move_mouse, x, y)
+
+
+class ReplayHostController(Host_Controller):
+    """Host_Controller that times each processing stage of fetch_recent_data."""
+
+    pipeline_cls = ReplayPipeline
+
+    def __init__(
+        self, video_sensor: ReplayVideoSensor, network_cls, mouse_sink, **kwargs
+    ):
+        self.video_sensor = video_sensor
+        self.timings: T.List[T.Dict[str, float]] = []
+        self._current = None
+        super().__init__(network_cls=network_cls, mouse_sink=mouse_sink, **kwargs)
+
+    def create_pipeline(self, *args, **kwargs) -> HostPipeline:
+        pipeline = super().create_pipeline(*args, **kwargs)
+        pipeline.timed = self._timed
+        return pipeline
+
+    def fetch_recent_data(self):
+        self._current = dict.fromkeys(TIMED_STAGES, 0.0)
+        frame_count = self.video_sensor.frame_count
+        t0 = time.perf_counter()
+        super().fetch_recent_data()
+        total = time.perf_counter() - t0
+        if self.video_sensor.frame_count > frame_count:
+            self._current["decode"] = self.video_sensor.last_decode_time
+            self._current["total"] = total
+            self.timings.append(self._current)
+
+    def _timed(self, stage, func, *args):
+        t0 = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._current[stage] += time.perf_counter() - t0
+
+
+def load_gaze_csv(path) -> np.ndarray:
+    """
+    Loads gaze samples as an (N, 3) array of (ts, x, y), timestamps in seconds and
+    relative to the first sample.
+
+    Accepts Pupil Cloud exports (`timestamp [ns]`, `gaze x [px]`, `gaze y [px]`) or
+    any CSV whose first three columns are timestamp, x and y.
+    """
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+
+    header = [column.strip().lower() for column in rows[0]]
+    try:
+        float(header[0])
+    except ValueError:
+        rows = rows[1:]
+
+        def find(candidates, default):
+            for candidate in candidates:
+                for i, column in enumerate(header):
+                    if column == candidate or column.startswith(candidate + " "):
+                        return i
+            return default
+
+        columns = [
+            find(("timestamp", "ts"), default=0),
+            find(("gaze x", "x"), default=1),
+            find(("gaze y", "y"), default=2),
+        ]
+    else:
+        columns = [0, 1, 2]
+
+    gaze = np.array([[float(row[i]) for i in columns] for row in rows if row])
+    if len(gaze) == 0:
+        return np.empty((0, 3))
+    gaze = gaze[np.argsort(gaze[:, 0], kind="stable")]
+    if gaze[0, 0] > 1e12:
+        # nanosecond timestamps
+        gaze[:, 0] *= 1e-9
+    gaze[:, 0] -= gaze[0, 0]
+    return gaze
+
+
+def synthetic_gaze(duration, width, height, rate=200.0) -> np.ndarray:
+    """Fixation on the frame center, used when no gaze recording is given."""
+    ts = np.arange(0.0, duration + 1 / rate, 1 / rate)
+    center = np.full_like(ts, width / 2), np.full_like(ts, height / 2)
+    return np.column_stack((ts,) + center)
+
+
+def summarize(timings: T.List[T.Dict[str, float]]) -> T.Dict[str, T.Dict[str, float]]:
+    summary = {}
+    for stage in TIMED_STAGES + ("total",):
+        values = [timing[stage] * 1000 for timing in timings]
+        if not values:
+            continue
+        values.sort()
+        summary[stage] = {
+            "mean_ms": statistics.mean(values),
+            "p50_ms": values[len(values) // 2],
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max_ms": values[-1],
+        }
+    return summary
+
+
+def run_replay(
+    video_path,
+    gaze_path=None,
+    host_name="Replay",
+    max_frames=None,
+    tracking=True,
+    cursor_filter=None,
+    dwell_detector=None,
+    dwell_time=0.8,
+    detection_width=None,
+    detector_profile=DetectorProfile(),
+):
+    clock = ReplayClock()
+    video_sensor = ReplayVideoSensor(VIDEO_SENSOR_UUID, video_path, clock, max_frames)
+    if gaze_path is not None:
+        gaze = load_gaze_csv(gaze_path)
+    else:
+        frame_total = video_sensor.capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        width = video_sensor.capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = video_sensor.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        gaze = synthetic_gaze(frame_total / video_sensor.fps, width, height)
+    gaze_sensor = ReplayGazeSensor(GAZE_SENSOR_UUID, gaze, clock)
+
+    def network_cls(formats, callbacks):
+        return ReplayNetwork(
+            (video_sensor, gaze_sensor), host_name, formats=formats, callbacks=callbacks
+        )
+
+    null_mouse = NullMouse()
+    controller = ReplayHostController(
+        video_sensor,
+        network_cls,
+        null_mouse,
+        aruco_parameters=detector_profile.parameters,
+    )
+    pipeline = controller.pipeline
+    pipeline.cursor_filter = cursor_filter or NoFilter()
+    if dwell_detector is not None:
+        pipeline.dwell_clicker = DwellClicker(dwell_detector, null_mouse, dwell_time)
+    pipeline.image_preprocessor.target_width = detection_width
+    pipeline.image_preprocessor.target_scale = detector_profile.detection_scale
+    if not tracking:
+        detector = MarkerDetector(*aruco_setup(parameters=detector_profile.parameters))
+        pipeline.marker_detector = detector
+    try:
+        controller.poll_events()
+        controller.link(controller[0])
+
+        t0 = time.perf_counter()
+        while not video_sensor.exhausted:
+            controller.fetch_recent_data()
+        wall_time = time.perf_counter() - t0
+    finally:
+        controller.cleanup()
+
+    frames = len(controller.timings)
+    return {
+        "frames": frames,
+        "mouse_moves": null_mouse.moves,
+        "mouse_clicks": null_mouse.clicks,
+        "wall_time_s": wall_time,
+        "video_time_s": frames / video_sensor.fps,
+        "fps": frames / wall_time if wall_time else 0.0,
+        "realtime_factor": frames / video_sensor.fps / wall_time if wall_time else 0.0,
+        "stages": summarize(controller.timings),
+        "detector": pipeline.marker_detector.stats.as_dict(),
+        "pose": pipeline.layout_mapper.pose_stats(),
+        "pipeline": controller.metrics.summary()["timers_ms"],
+    }, controller.timings
+
+
+def write_timings(path, timings):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        columns = TIMED_STAGES + ("total",)
+        writer.writerow(("frame",) + columns)
+        for idx, timing in enumerate(timings):
+            writer.writerow([idx] + [timing[stage] for stage in columns])
+
+
+def print_report(report):
+    print(
+        f"Replayed {report['frames']} frames ({report['video_time_s']:.1f} s of video) "
+        f"in {report['wall_time_s']:.2f} s: {report['fps']:.1f} fps, "
+        f"{report['realtime_factor']:.1f}x real time, "
+        f"{report['mouse_moves']} mouse moves, {report['mouse_clicks']} clicks"
+    )
+    print(f"{'stage':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<10}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}"
+            f"{stats['p95_ms']:>10.3f}{stats['max_ms']:>10.3f}"
+        )
+    detector = report["detector"]
+    print(
+        f"marker detection: {detector['hit_rate']:.0%} ROI hit rate, "
+        f"{detector['full_scans']} full scans ({detector['fallbacks']} fallbacks), "
+        f"{detector['mean_cost_ms']:.3f} ms/frame "
+        f"(ROI {detector['mean_roi_cost_ms']:.3f} ms, "
+        f"full {detector['mean_full_cost_ms']:.3f} ms)"
+    )
+    pose = report["pose"]
+    if pose["frames"]:
+        # before occlusion tolerant mapping, only frames with all markers were mapped
+        print(
+            f"screen pose: {pose['mapped']:.0%} of frames mapped, "
+            f"{pose['full']:.0%} with all markers "
+            f"({pose['partial']:.0%} partial, {pose['edges']:.0%} from edges, "
+            f"{pose['predicted']:.0%} predicted)"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a scene video and gaze recording through Host_Controller."
+    )
+    parser.add_argument("video", help="scene video, e.g. Videos/1.mp4")
+    parser.add_argument(
+        "-g", "--gaze", help="gaze CSV (ts, x, y); defaults to a central fixation"
+    )
+    parser.add_argument("-n", "--max-frames", type=int, help="stop after N frames")
+    parser.add_argument("-o", "--output", help="write per-frame timings to this CSV")
+    parser.add_argument("--host-name", default="Replay", help="name of the fake host")
+    parser.add_argument(
+        "--no-tracking",
+        action="store_true",
+        help="run full-frame marker detection on every frame",
+    )
+    parser.add_argument(
+        "--detection-width",
+        type=int,
+        help="downscale the luma plane to this width before marker detection",
+    )
+    add_filter_arguments(parser)
+    add_dwell_arguments(parser)
+    add_detector_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # per-frame detection logs would dominate the timings
+    logging.basicConfig(level=logging.ERROR)
+
+    report, timings = run_replay(
+        args.video,
+        args.gaze,
+        args.host_name,
+        args.max_frames,
+        tracking=not args.no_tracking,
+        cursor_filter=filter_from_args(args),
+        dwell_detector=fixation_detector_from_args(args) if args.dwell_click else None,
+        dwell_time=args.dwell_time,
+        detection_width=args.detection_width,
+        detector_profile=detector_profile_from_args(args),
+    )
+    if args.output:
+        write_timings(args.output, timings)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Import-time breakdown of the modules the monitor loads at startup.
+
+Modules are imported one after the other, so each time only covers what was not
+already loaded by an earlier entry. Run with `--profile-startup`, or use
+`python -X importtime -m pupil_invisible_monitor` for the full import tree.
+"""
+
+import importlib
+import sys
+import time
+import typing as T
+
+STARTUP_MODULES = (
+    "numpy",
+    "cv2",
+    "ndsi",
+    "mouse",
+    "sounddevice",
+    "vosk",
+    "glfw.GLFW",
+    "OpenGL.GL",
+    "pyglui.ui",
+    "pupil_invisible_monitor.models",
+    "pupil_invisible_monitor.window",
+    "pupil_invisible_monitor.ui",
+)
+
+
+def profile_imports(modules=STARTUP_MODULES) -> T.List[T.Tuple[str, float]]:
+    """Imports `modules` in order and returns (name, seconds) for each."""
+    timings = []
+    for name in modules:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as err:
+            print(f"{name}: {err}", file=sys.stderr)
+        timings.append((name, time.perf_counter() - t0))
+    return timings
+
+
+def print_import_profile(timings: T.List[T.Tuple[str, float]]):
+    total = sum(duration for _, duration in timings)
+    print(f"{'module':<34}{'ms':>9}{'share':>8}")
+    for name, duration in timings:
+        share = duration / total if total else 0.0
+        print(f"{name:<34}{duration * 1000:>9.1f}{share:>8.1%}")
+    print(f"{'total':<34}{total * 1000:>9.1f}")
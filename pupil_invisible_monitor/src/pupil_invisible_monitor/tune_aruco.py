@@ -0,0 +1,371 @@
+"""
+Tunes the ArUco detector parameters for the scene camera on recorded videos.
+
+Every `--stride`-th frame of the videos is decoded once and shared with the worker
+processes as memory-mapped arrays. Each worker runs marker detection with candidate
+configurations over all sampled frames: adaptive threshold windows, marker perimeter
+rates, polygonal approximation accuracy, corner refinement and detection scale.
+Recall is relative to the markers found with the OpenCV defaults at full size.
+Timings in the pool are skewed by the workers competing for the CPU, so the
+`--shortlist` fastest configurations that keep `--min-recall` and the defaults are
+timed again one at a time. The fastest of them is saved as profile, which the
+monitor loads on startup, see markers.detector_profile_from_args().
+
+Usage:
+    python -m pupil_invisible_monitor.tune_aruco Videos/*.mp4 [--min-recall 0.98]
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+import typing as T
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .markers import (
+    ARUCO_DICTS,
+    DEFAULT_ARUCO_DICT,
+    DETECTOR_PROFILE_PATH,
+    SCREEN_MARKER_IDS,
+    DetectorProfile,
+    aruco_setup,
+    detector_parameters,
+    save_detector_profile,
+)
+
+logger = logging.getLogger(__name__)
+
+# adaptiveThreshWinSize min, max, step: one thresholding pass per window size
+THRESHOLD_WINDOWS = ((3, 23, 10), (3, 13, 10), (5, 15, 10), (3, 23, 20), (7, 7, 10))
+PARAMETER_GRID = {
+    "minMarkerPerimeterRate": (0.02, 0.03, 0.05),
+    # relative to the searched image: in the ROI crops of the TrackingMarkerDetector
+    # a marker's perimeter is up to 1.6 times the crop size, lower limits would
+    # reject it there although full frames, which are scored here, are unaffected
+    "maxMarkerPerimeterRate": (4.0,),
+    "polygonalApproxAccuracyRate": (0.03, 0.05),
+    "cornerRefinementMethod": (
+        cv2.aruco.CORNER_REFINE_NONE,
+        cv2.aruco.CORNER_REFINE_SUBPIX,
+    ),
+}
+DETECTION_SCALES = (1.0, 0.75, 0.5)
+
+# set in each worker process by _init_worker()
+_frames: T.List[np.ndarray] = []
+_dictionary = None
+_marker_ids: T.Optional[T.FrozenSet[int]] = None
+
+
+class Evaluation(T.NamedTuple):
+    profile: DetectorProfile
+    # (frame, marker id) of the detected markers
+    detections: T.FrozenSet[T.Tuple[int, int]]
+    mean_ms: float
+    # timed alone, not while competing with the other workers
+    serial: bool = False
+
+
+def candidate_profiles() -> T.Iterator[DetectorProfile]:
+    names = list(PARAMETER_GRID)
+    grid = list(itertools.product(*PARAMETER_GRID.values()))
+    for window, values, scale in itertools.product(
+        THRESHOLD_WINDOWS, grid, DETECTION_SCALES
+    ):
+        parameters = dict(zip(names, values))
+        (
+            parameters["adaptiveThreshWinSizeMin"],
+            parameters["adaptiveThreshWinSizeMax"],
+            parameters["adaptiveThreshWinSizeStep"],
+        ) = window
+        yield DetectorProfile.create(parameters, scale)
+
+
+def sample_frames(video_paths, directory: Path, stride: int) -> T.List[Path]:
+    """Writes the grayscale frames of each video as <directory>/<index>.npy."""
+    paths = []
+    for idx, video_path in enumerate(video_paths):
+        capture = cv2.VideoCapture(str(video_path))
+        frames = []
+        frame_idx = 0
+        while True:
+            ok, bgr = capture.read()
+            if not ok:
+                break
+            if frame_idx % stride == 0:
+                frames.append(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY))
+            frame_idx += 1
+        capture.release()
+        if not frames:
+            logger.warning(f"No frames in {video_path}")
+            continue
+        path = directory / f"{idx}.npy"
+        np.save(path, np.stack(frames))
+        paths.append(path)
+        logger.info(f"{video_path}: {len(frames)} of {frame_idx} frames")
+    return paths
+
+
+def _load_frames(frame_paths, dict_name, marker_ids):
+    global _frames, _dictionary, _marker_ids
+    # read-only memory maps, the page cache is shared by all workers
+    _frames = [np.load(path, mmap_mode="r") for path in frame_paths]
+    _dictionary, _ = aruco_setup(dict_name)
+    _marker_ids = marker_ids
+
+
+def _init_worker(frame_paths, dict_name, marker_ids):
+    _load_frames(frame_paths, dict_name, marker_ids)
+    # one process per core, OpenCV's own threads would compete with the others
+    cv2.setNumThreads(1)
+
+
+def evaluate(profile: DetectorProfile) -> Evaluation:
+    parameters = detector_parameters(profile.parameters)
+    detections = set()
+    frame_idx = 0
+    total = 0.0
+    for video_frames in _frames:
+        for frame in video_frames:
+            t0 = time.perf_counter()
+            image = np.asarray(frame)
+            if profile.detection_scale < 1.0:
+                height, width = image.shape
+                size = (
+                    round(width * profile.detection_scale),
+                    round(height * profile.detection_scale),
+                )
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            _, ids, _ = cv2.aruco.detectMarkers(
+                image, _dictionary, parameters=parameters
+            )
+            total += time.perf_counter() - t0
+            if ids is not None:
+                for marker_id in ids.ravel().tolist():
+                    if _marker_ids is None or marker_id in _marker_ids:
+                        detections.add((frame_idx, marker_id))
+            frame_idx += 1
+    mean_ms = total / frame_idx * 1000 if frame_idx else 0.0
+    return Evaluation(profile, frozenset(detections), mean_ms)
+
+
+def recall(evaluation: Evaluation, reference: Evaluation) -> float:
+    if not reference.detections:
+        return 0.0
+    found = len(evaluation.detections & reference.detections)
+    return found / len(reference.detections)
+
+
+def tune(
+    video_paths,
+    dict_name=DEFAULT_ARUCO_DICT,
+    marker_ids: T.Optional[T.Iterable[int]] = SCREEN_MARKER_IDS,
+    stride=10,
+    workers=None,
+    min_recall=0.98,
+    shortlist=10,
+) -> T.Tuple[Evaluation, T.List[Evaluation]]:
+    """
+    Evaluates all candidate profiles on the sampled frames. Returns the evaluation
+    of the OpenCV defaults and those of the candidates, none if the defaults detect
+    no markers. All markers of the dictionary count if `marker_ids` is None. The
+    defaults and the `shortlist` fastest candidates with at least `min_recall` are
+    timed serially, as in the monitor.
+    """
+    if marker_ids is not None:
+        marker_ids = frozenset(marker_ids)
+    candidates = list(candidate_profiles())
+    with tempfile.TemporaryDirectory(prefix="tune_aruco_") as directory:
+        frame_paths = sample_frames(video_paths, Path(directory), stride)
+        if not frame_paths:
+            raise ValueError("No frames to tune on")
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(frame_paths, dict_name, marker_ids),
+        ) as executor:
+            reference = executor.submit(evaluate, DetectorProfile()).result()
+            if not reference.detections:
+                # recall is relative to these detections, nothing to tune for
+                return reference, []
+            chunksize = max(1, len(candidates) // (4 * (workers or os.cpu_count())))
+            evaluations = list(executor.map(evaluate, candidates, chunksize=chunksize))
+
+        eligible = [e for e in evaluations if recall(e, reference) >= min_recall]
+        fastest = sorted(eligible, key=lambda e: e.mean_ms)[:shortlist]
+        logger.info(f"Timing the defaults and {len(fastest)} candidates serially")
+        retimed = _evaluate_serially(
+            [reference.profile] + [e.profile for e in fastest],
+            frame_paths,
+            dict_name,
+            marker_ids,
+        )
+    reference = retimed[0]
+    by_profile = {e.profile: e for e in retimed[1:]}
+    evaluations = [by_profile.get(e.profile, e) for e in evaluations]
+    return reference, evaluations
+
+
+def _evaluate_serially(profiles, frame_paths, dict_name, marker_ids):
+    global _frames
+    # in this process, with OpenCV's own threads like the monitor
+    _load_frames(frame_paths, dict_name, marker_ids)
+    try:
+        return [evaluate(profile)._replace(serial=True) for profile in profiles]
+    finally:
+        # the memory maps have to be closed before the frames are deleted
+        _frames = []
+
+
+def select(
+    reference: Evaluation, evaluations: T.List[Evaluation], min_recall: float
+) -> T.Optional[Evaluation]:
+    """
+    The fastest evaluation with at least `min_recall`, of those timed serially if
+    there are any.
+    """
+    eligible = [e for e in evaluations if recall(e, reference) >= min_recall]
+    serial = [e for e in eligible if e.serial]
+    return min(serial or eligible, key=lambda e: e.mean_ms, default=None)
+
+
+def _describe(profile: DetectorProfile) -> str:
+    parameters = dict(profile.parameters)
+    window = (
+        f"{parameters['adaptiveThreshWinSizeMin']}-"
+        f"{parameters['adaptiveThreshWinSizeMax']}/"
+        f"{parameters['adaptiveThreshWinSizeStep']}"
+    )
+    refinement = "subpix" if parameters["cornerRefinementMethod"] else "none"
+    return (
+        f"{window:<10}{parameters['minMarkerPerimeterRate']:>6.2f}"
+        f"{parameters['maxMarkerPerimeterRate']:>6.1f}"
+        f"{parameters['polygonalApproxAccuracyRate']:>6.2f}"
+        f"{refinement:>8}{profile.detection_scale:>7.2f}"
+    )
+
+
+def print_report(reference, evaluations, best, min_recall, top=10):
+    print(
+        f"{len(reference.detections)} markers detected with the OpenCV defaults, "
+        f"{reference.mean_ms:.3f} ms/frame"
+    )
+    print(
+        f"{'window':<10}{'min':>6}{'max':>6}{'poly':>6}{'refine':>8}{'scale':>7}"
+        f"{'recall':>8}{'ms':>8}"
+    )
+    eligible = [e for e in evaluations if recall(e, reference) >= min_recall]
+    # the serially timed shortlist first, marked with *
+    for evaluation in sorted(eligible, key=lambda e: (not e.serial, e.mean_ms))[:top]:
+        print(
+            f"{_describe(evaluation.profile)}"
+            f"{recall(evaluation, reference):>8.1%}{evaluation.mean_ms:>8.3f}"
+            f"{'*' if evaluation.serial else ''}"
+        )
+    print(f"{len(eligible)} of {len(evaluations)} candidates keep {min_recall:.0%}")
+    if best is not None:
+        print(
+            f"best: {reference.mean_ms / best.mean_ms:.1f}x faster than the defaults"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tune the ArUco detector parameters on recorded scene videos."
+    )
+    parser.add_argument("videos", nargs="+", help="scene videos, e.g. Videos/*.mp4")
+    parser.add_argument(
+        "-t",
+        "--type",
+        choices=ARUCO_DICTS,
+        default=DEFAULT_ARUCO_DICT,
+        help="type of ArUco markers to detect",
+    )
+    parser.add_argument(
+        "--all-markers",
+        action="store_true",
+        help="count all markers of the dictionary, not only the screen markers",
+    )
+    parser.add_argument(
+        "--stride",
+        type=int,
+        default=10,
+        metavar="N",
+        help="use every N-th frame of the videos",
+    )
+    parser.add_argument(
+        "--min-recall",
+        type=float,
+        default=0.98,
+        help="fraction of the markers found with the defaults that has to be kept",
+    )
+    parser.add_argument(
+        "--shortlist",
+        type=int,
+        default=10,
+        metavar="N",
+        help="time the N fastest candidates again one at a time before choosing",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, help="worker processes, defaults to one per CPU"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=str(DETECTOR_PROFILE_PATH),
+        help="where to save the profile, loaded by the monitor on startup",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report only, do not save the profile"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    t0 = time.perf_counter()
+    reference, evaluations = tune(
+        args.videos,
+        args.type,
+        None if args.all_markers else SCREEN_MARKER_IDS,
+        args.stride,
+        args.workers,
+        args.min_recall,
+        args.shortlist,
+    )
+    if not reference.detections:
+        print("No markers detected with the OpenCV defaults, nothing to tune for")
+        return 1
+    logger.info(
+        f"Evaluated {len(evaluations)} candidates in {time.perf_counter() - t0:.1f} s"
+    )
+
+    best = select(reference, evaluations, args.min_recall)
+    print_report(reference, evaluations, best, args.min_recall)
+    if best is None:
+        print("No candidate keeps the minimum recall, the profile is not saved")
+        return 1
+    if not args.dry_run:
+        save_detector_profile(
+            args.output,
+            best.profile,
+            dictionary=args.type,
+            recall=recall(best, reference),
+            mean_ms=best.mean_ms,
+            default_mean_ms=reference.mean_ms,
+            videos=[str(path) for path in args.videos],
+            stride=args.stride,
+            tuned_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        print(f"Saved profile to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
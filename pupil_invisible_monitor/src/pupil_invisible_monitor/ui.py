@@ -1,8 +1,10 @@
 import logging
+import time
 
 from pyglui import ui
 
 import glfw.GLFW as glfw
+from .metrics import PIPELINE_STAGES, MetricsRegistry
 from .models import Host_Controller
 
 logger = logging.getLogger(__name__)
@@ -65,3 +67,53 @@ class HostViewController:
             **THUMB_SETTINGS,
         )
         return host_thumb
+
+
+class MetricsViewController:
+    """Collapsible menu showing the rolling p50/p95/p99 of each timed stage."""
+
+    def __init__(
+        self,
+        gui_parent,
+        metrics: MetricsRegistry,
+        stages=PIPELINE_STAGES,
+        update_interval=0.5,
+    ):
+        self.metrics = metrics
+        self.stages = stages
+        self.update_interval = update_interval
+        self._last_update = 0.0
+
+        self.menu = ui.Scrolling_Menu("Metrics", pos=(-360, 20), size=(340, 240))
+        self.menu.collapsed = True
+        # read-only lines, the text is replaced on update()
+        self._lines = {stage: ui.Info_Text(f"{stage}: -") for stage in stages}
+        for line in self._lines.values():
+            self.menu.append(line)
+        self.menu.append(ui.Button("Dump JSON", self.dump_json))
+        self.gui_parent = gui_parent
+        self.gui_parent.append(self.menu)
+
+    def update(self):
+        now = time.monotonic()
+        if self.menu.collapsed or now - self._last_update < self.update_interval:
+            return
+        self._last_update = now
+        timers = self.metrics.summary()["timers_ms"]
+        for stage in self.stages:
+            stats = timers.get(stage)
+            if stats and "p50" in stats:
+                text = "{p50:.1f} / {p95:.1f} / {p99:.1f} ms".format(**stats)
+            else:
+                text = "-"
+            self._lines[stage].text = f"{stage}: {text}"
+
+    def dump_json(self):
+        path = self.metrics.dump_json()
+        logger.info(f"Metrics dumped to {path}")
+
+    def cleanup(self):
+        self.gui_parent = None
+        self.menu = None
+        self._lines = None
+        self.metrics = None
@@ -0,0 +1,184 @@
+"""
+Voice commands: maps recognized keywords to mouse actions.
+
+In command mode the vosk recognizer is restricted to a grammar of the command words
+plus "[unk]", and commands fire from partial results as soon as a keyword has been
+stable for a few partials, instead of waiting for the end of the utterance. The final
+result only fires the keywords that were not fired from partials yet.
+"""
+
+import collections
+import json
+import logging
+import time
+import typing as T
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceCommand(T.NamedTuple):
+    label: str
+    method: str
+    args: tuple
+
+
+COMMANDS = {
+    "sélection": VoiceCommand("LEFT CLICK", "click", ("left",)),
+    "option": VoiceCommand("RIGHT CLICK", "click", ("right",)),
+    "montée": VoiceCommand("UP", "wheel", (1,)),
+    "descente": VoiceCommand("DOWN", "wheel", (-1,)),
+}
+
+
+class CommandEvent(T.NamedTuple):
+    word: str
+    # seconds of audio processed when the command fired
+    audio_time: float
+    # CommandRecognizer.clock() when the mouse action was submitted
+    fired_at: float
+    # "partial" or "final"
+    source: str
+
+
+def make_recognizer(model, samplerate, commands=COMMANDS, command_mode=True):
+    """KaldiRecognizer with word timings, restricted to `commands` in command mode."""
+    import vosk
+
+    if command_mode:
+        grammar = json.dumps(list(commands) + ["[unk]"], ensure_ascii=False)
+        recognizer = vosk.KaldiRecognizer(model, samplerate, grammar)
+    else:
+        recognizer = vosk.KaldiRecognizer(model, samplerate)
+    recognizer.SetWords(True)
+    return recognizer
+
+
+class CommandRecognizer:
+    """
+    Feeds audio blocks to a vosk recognizer and performs the recognized commands on
+    `mouse_sink` (anything with click/wheel, e.g. MouseActuator).
+
+    The latency of a command is measured from the end of its word, as reported by
+    the word timings of the final result, to the moment its action was submitted.
+    Audio time is related to wall time through the capture time of each block.
+    """
+
+    def __init__(
+        self,
+        recognizer,
+        mouse_sink,
+        samplerate: int,
+        commands: T.Dict[str, VoiceCommand] = COMMANDS,
+        fire_on_partial=True,
+        stable_partials=2,
+        metrics=None,
+        clock: T.Callable[[], float] = time.monotonic,
+    ):
+        self.recognizer = recognizer
+        self.mouse = mouse_sink
+        self.samplerate = samplerate
+        self.commands = commands
+        self.fire_on_partial = fire_on_partial
+        self.stable_partials = stable_partials
+        # optional MetricsRegistry, receives the "voice" latency timer
+        self.metrics = metrics
+        # time base of the capture times passed to accept()
+        self.clock = clock
+        self.events: T.List[CommandEvent] = []
+        self.latencies: T.List[float] = []
+        self.audio_time = 0.0
+        # (audio end time, capture time) of recent blocks
+        self._blocks = collections.deque(maxlen=256)
+        self._partials = collections.deque(maxlen=stable_partials)
+        # commands fired during the current utterance
+        self._fired: T.List[CommandEvent] = []
+
+    def accept(self, data: bytes, capture_time: T.Optional[float] = None):
+        """Processes one block of int16 mono audio, captured at `capture_time`."""
+        self.audio_time += len(data) / 2 / self.samplerate
+        if capture_time is None:
+            capture_time = self.clock()
+        self._blocks.append((self.audio_time, capture_time))
+
+        if self.recognizer.AcceptWaveform(data):
+            self._on_final(json.loads(self.recognizer.Result()))
+        elif self.fire_on_partial:
+            self._on_partial(json.loads(self.recognizer.PartialResult()))
+
+    def flush(self):
+        """Finishes the current utterance, e.g. at the end of a recording."""
+        self._on_final(json.loads(self.recognizer.FinalResult()))
+
+    def keywords(self, text: str) -> T.List[str]:
+        return [word for word in text.split() if word in self.commands]
+
+    def _on_partial(self, result):
+        self._partials.append(self.keywords(result.get("partial", "")))
+        if len(self._partials) < self.stable_partials:
+            return
+        # keywords in the same place in the last `stable_partials` partials
+        stable = []
+        for words in zip(*self._partials):
+            if any(word != words[0] for word in words):
+                break
+            stable.append(words[0])
+        for word in stable[len(self._fired) :]:
+            self._fire(word, "partial")
+
+    def _on_final(self, result):
+        keywords = self.keywords(result.get("text", ""))
+        for word in keywords[len(self._fired) :]:
+            self._fire(word, "final")
+
+        words = result.get("result", ())
+        ends = [entry["end"] for entry in words if entry["word"] in self.commands]
+        for event, end in zip(self._fired, ends):
+            latency = event.fired_at - self._wall_time(end)
+            self.latencies.append(latency)
+            if self.metrics is not None:
+                self.metrics.record("voice", latency)
+            logger.debug(f"'{event.word}' ({event.source}): {latency * 1000:.0f} ms")
+
+        if len(self._fired) > len(keywords):
+            logger.debug(f"Final result {keywords} dropped partial {self._fired}")
+        self._fired = []
+        self._partials.clear()
+
+    def _fire(self, word: str, source: str):
+        command = self.commands[word]
+        logger.info(f"[{command.label}]")
+        getattr(self.mouse, command.method)(*command.args)
+        event = CommandEvent(word, self.audio_time, self.clock(), source)
+        self._fired.append(event)
+        self.events.append(event)
+
+    def stats(self) -> T.Dict[str, T.Any]:
+        return {
+            "commands": len(self.events),
+            "from_partials": sum(event.source == "partial" for event in self.events),
+            "audio_time": self.audio_time,
+        }
+
+    def _wall_time(self, audio_time: float) -> float:
+        for block_end, capture_time in self._blocks:
+            if audio_time <= block_end:
+                return capture_time - (block_end - audio_time)
+        block_end, capture_time = self._blocks[-1]
+        return capture_time - (block_end - audio_time)
+
+
+def recognize(blocks, commands: CommandRecognizer, vad, dump_fn=None):
+    """
+    Runs (capture time, int16 block) pairs through voice activity detection and the
+    command recognizer until `blocks` is exhausted. `vad` is an audio.EnergyVAD or
+    audio.PassThroughVAD, every block is written to `dump_fn` if given.
+    """
+    for capture_time, data in blocks:
+        if dump_fn is not None:
+            dump_fn.write(data)
+        voiced, utterance_ended = vad.process(capture_time, data)
+        for block_time, block in voiced:
+            commands.accept(block, block_time)
+        if utterance_ended:
+            commands.flush()
+    commands.flush()
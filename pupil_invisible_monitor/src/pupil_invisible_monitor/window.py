@@ -45,15 +45,27 @@ def denormalize(pos, size, flip_y=False):
 class Window(Observable):
     scroll_factor = 10.0
 
-    def __init__(self, texture, frame_rate: float, callables: T.List[T.Callable] = ...):
+    def __init__(
+        self,
+        texture,
+        frame_rate: float,
+        callables: T.List[T.Callable] = ...,
+        draw_callables: T.List[T.Callable] = ...,
+        min_frame_rate: float = 2.0,
+        metrics=None,
+    ):
         if callables is ...:
             callables = []
+        if draw_callables is ...:
+            draw_callables = []
 
         self.texture = texture
 
-        callables.insert(0, self.draw_texture)
+        draw_callables.insert(0, self.draw_texture)
         self._window = None
-        self.event_loop = WindowEventLoop(self, frame_rate, callables)
+        self.event_loop = WindowEventLoop(
+            self, frame_rate, callables, draw_callables, min_frame_rate, metrics
+        )
 
     @contextmanager
     def use_content_area(self):
@@ -84,9 +96,14 @@ class Window(Observable):
             user_input = self.gui.update()
             self.process_unconsumed_user_input(user_input)
 
-    def update(self, timeout=0.0):
-        glfw.glfwWaitEventsTimeout(timeout)
+    def wait_events(self, timeout=0.0):
+        """Processes UI events, waiting up to `timeout` seconds for the first one."""
+        if timeout > 0:
+            glfw.glfwWaitEventsTimeout(timeout)
+        else:
+            glfw.glfwPollEvents()
 
+    def update(self):
         self.update_gui()
         gl_utils.glFlush()
         glfw.glfwSwapBuffers(self._window)
@@ -172,6 +189,7 @@ class Window(Observable):
     def on_framebuffer_resize(self, window, w, h):
         """Updates windows/UI sizes and redraws the UI with correct HDPI scaling."""
         self.framebuffer_size = w, h
+        self.event_loop.mark_dirty()
         if self.is_minimized():
             return
 
@@ -213,19 +231,24 @@ class Window(Observable):
 
     def on_window_key(self, window, key, scancode, action, mods):
         self.gui.update_key(key, scancode, action, mods)
+        self.event_loop.mark_dirty()
 
     def on_window_char(self, window, char):
         self.gui.update_char(char)
+        self.event_loop.mark_dirty()
 
     def on_window_mouse_button(self, window, button, action, mods):
         self.gui.update_button(button, action, mods)
+        self.event_loop.mark_dirty()
 
     def on_pos(self, window, x, y):
         # x, y are in screen coordinates. pyglui expects pixel coordinates.
         self.gui.update_mouse(*self.screen_to_pixel(x, y))
+        self.event_loop.mark_dirty()
 
     def on_scroll(self, window, x, y):
         self.gui.update_scroll(x, y * self.scroll_factor)
+        self.event_loop.mark_dirty()
 
     def process_unconsumed_user_input(self, user_input):
         if self.is_minimized():
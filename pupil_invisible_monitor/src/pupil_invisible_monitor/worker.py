@@ -0,0 +1,138 @@
+import collections
+import logging
+import threading
+import typing as T
+
+logger = logging.getLogger(__name__)
+
+
+class MailboxClosed(Exception):
+    pass
+
+
+class LatestMailbox:
+    """
+    One-slot mailbox. put() never blocks and replaces an item that was not taken yet,
+    so the consumer always gets the newest item and stale ones are dropped. If set,
+    `merge(pending, item)` returns what replaces the pending item, to carry over the
+    parts of it that must not be lost.
+    """
+
+    def __init__(self, merge: T.Optional[T.Callable] = None):
+        self._merge = merge
+        self._condition = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if self._has_item:
+                self.dropped += 1
+                if self._merge is not None:
+                    item = self._merge(self._item, item)
+            self._item = item
+            self._has_item = True
+            self.put_count += 1
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Waits for and takes the newest item. Returns None on timeout and raises
+        MailboxClosed once the mailbox was closed.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._has_item or self._closed, timeout)
+            if self._closed:
+                raise MailboxClosed
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class VisionWorker:
+    """
+    Runs `process(*job)` on a background thread for the newest submitted job.
+
+    Results are buffered until the owning thread collects them with poll_results(),
+    so consumers of the results never run on the worker thread. `merge(pending, job)`
+    combines a job that was not processed yet with the one replacing it.
+    """
+
+    def __init__(
+        self,
+        process: T.Callable,
+        name="vision-worker",
+        max_results=64,
+        merge: T.Optional[T.Callable] = None,
+    ):
+        self._process = process
+        self._mailbox = LatestMailbox(merge)
+        self._results = collections.deque(maxlen=max_results)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def submitted(self) -> int:
+        return self._mailbox.put_count
+
+    @property
+    def dropped(self) -> int:
+        return self._mailbox.dropped
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._mailbox.close()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def submit(self, *job):
+        self._mailbox.put(job)
+
+    def poll_results(self) -> T.List:
+        results = []
+        while self._results:
+            results.append(self._results.popleft())
+        return results
+
+    def stats(self) -> T.Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                job = self._mailbox.get()
+            except MailboxClosed:
+                return
+            if job is None:
+                continue
+            try:
+                result = self._process(*job)
+            except Exception:
+                self.failed += 1
+                logger.exception(f"{self._thread.name} failed to process a job")
+                continue
+            self.processed += 1
+            self._results.append(result)
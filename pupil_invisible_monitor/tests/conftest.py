@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.markers import DEFAULT_ARUCO_DICT, aruco_setup
+
+# top-left corner of the screen markers 42, 24, 70, 66 in a 640x480 scene frame
+MARKER_POSITIONS = {42: (60, 50), 24: (500, 50), 70: (500, 350), 66: (60, 350)}
+MARKER_SIZE = 80
+
+
+def draw_markers(positions, shape=(480, 640), size=MARKER_SIZE):
+    """Gray scene frame with DEFAULT_ARUCO_DICT markers on a white background."""
+    dictionary, _ = aruco_setup(DEFAULT_ARUCO_DICT)
+    frame = np.full(shape, 255, np.uint8)
+    for marker_id, (x, y) in positions.items():
+        marker = cv2.aruco.drawMarker(dictionary, marker_id, size)
+        frame[y : y + size, x : x + size] = marker
+    return frame
+
+
+def write_video(path, frames, fps=30):
+    height, width = frames[0].shape[:2]
+    fourcc = cv2.VideoWriter_fourcc(*"MJPG")
+    writer = cv2.VideoWriter(str(path), fourcc, fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+@pytest.fixture
+def marker_frame():
+    return draw_markers(MARKER_POSITIONS)
@@ -0,0 +1,69 @@
+import time
+
+from pupil_invisible_monitor.actuator import MouseActuator
+
+
+class RecordingMouse:
+    def __init__(self):
+        self.calls = []
+
+    def move(self, x, y, absolute=True, duration=0):
+        self.calls.append(("move", x, y))
+
+    def click(self, button="left"):
+        self.calls.append(("click", button))
+
+    def wheel(self, delta=1):
+        self.calls.append(("wheel", delta))
+
+
+def test_moves_are_coalesced_and_never_follow_a_later_click():
+    mouse = RecordingMouse()
+    actuator = MouseActuator(mouse, min_distance=0, max_rate=1.0)
+    for x in range(10):
+        actuator.move(x * 10, 0)
+    actuator.click()
+    actuator.move(500, 500)
+    actuator.wheel(-1)
+    actuator.start()
+    actuator.stop()
+
+    assert mouse.calls == [
+        ("move", 0, 0),
+        ("move", 90, 0),
+        ("click", "left"),
+        ("move", 500, 500),
+        ("wheel", -1),
+    ]
+    assert actuator.moves_coalesced == 8
+    assert actuator.moves_sent == 3
+
+
+def test_small_moves_are_skipped():
+    mouse = RecordingMouse()
+    actuator = MouseActuator(mouse, min_distance=5, max_rate=None)
+    actuator.start()
+    for x in (100, 102, 104, 110):
+        actuator.move(x, 100)
+        time.sleep(0.01)
+    actuator.stop()
+
+    assert mouse.calls == [("move", 100, 100), ("move", 110, 100)]
+    assert actuator.moves_skipped == 2
+
+
+def test_moves_are_rate_limited():
+    mouse = RecordingMouse()
+    actuator = MouseActuator(mouse, min_distance=0, max_rate=20.0)
+    actuator.start()
+    t0 = time.monotonic()
+    x = 0
+    while time.monotonic() - t0 < 0.5:
+        x += 1
+        actuator.move(x, 0)
+        time.sleep(0.002)
+    actuator.stop()
+
+    assert 5 <= actuator.moves_sent <= 13
+    # the newest target is not lost
+    assert mouse.calls[-1] == ("move", x, 0)
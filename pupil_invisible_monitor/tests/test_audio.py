@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+
+from pupil_invisible_monitor.audio import AudioRingBuffer, EnergyVAD
+from pupil_invisible_monitor.voice import recognize
+
+SAMPLERATE = 16000
+BLOCK_SIZE = SAMPLERATE // 10
+
+
+def block(amplitude, seed=0):
+    rng = np.random.default_rng(seed)
+    if amplitude > 1000:
+        t = np.arange(BLOCK_SIZE) / SAMPLERATE
+        samples = amplitude * np.sin(2 * np.pi * 220 * t)
+    else:
+        samples = rng.normal(0.0, amplitude, BLOCK_SIZE)
+    return samples.astype(np.int16).tobytes()
+
+
+def test_ring_buffer_drops_the_oldest_blocks():
+    buffer = AudioRingBuffer(capacity=3, block_size=4)
+    for idx in range(5):
+        buffer.put(np.full(4, idx, dtype=np.int16).tobytes(), capture_time=idx)
+    # short blocks keep their length
+    buffer.get()
+    buffer.put(np.array([7, 7], dtype=np.int16).tobytes(), capture_time=5)
+
+    blocks = [buffer.get(timeout=0) for _ in range(3)]
+
+    assert [capture_time for capture_time, _ in blocks] == [3.0, 4.0, 5.0]
+    assert np.frombuffer(blocks[-1][1], dtype=np.int16).tolist() == [7, 7]
+    assert buffer.get(timeout=0) is None
+    assert buffer.stats() == {"received": 6, "dropped": 2, "queued": 0}
+
+
+def test_ring_buffer_close_wakes_the_reader():
+    buffer = AudioRingBuffer(capacity=2, block_size=4)
+    result = []
+    reader = threading.Thread(target=lambda: result.append(buffer.get()))
+    reader.start()
+
+    buffer.close()
+    reader.join(1.0)
+
+    assert result == [None]
+
+
+def test_vad_passes_utterances_with_preroll_and_hangover():
+    # 1 s of noise, 0.5 s of voice, 1 s of noise
+    amplitudes = [30] * 10 + [8000] * 5 + [30] * 10
+    vad = EnergyVAD(preroll=2, hangover=3)
+
+    passed, ended = [], []
+    for idx, amplitude in enumerate(amplitudes):
+        blocks, utterance_ended = vad.process(idx, block(amplitude, idx))
+        passed.extend(capture_time for capture_time, _ in blocks)
+        if utterance_ended:
+            ended.append(idx)
+
+    assert passed == list(range(8, 18))
+    assert ended == [18]
+    assert vad.stats()["voiced_blocks"] == 5
+
+
+class CountingRecognizer:
+    def __init__(self):
+        self.blocks = []
+        self.flushes = 0
+
+    def accept(self, data, capture_time=None):
+        self.blocks.append(capture_time)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_recognizer_is_idle_during_silence():
+    amplitudes = [30] * 10 + [8000] * 3 + [30] * 10 + [8000] * 3 + [30] * 10
+    blocks = [(idx, block(amplitude, idx)) for idx, amplitude in enumerate(amplitudes)]
+    recognizer = CountingRecognizer()
+
+    recognize(iter(blocks), recognizer, EnergyVAD(preroll=1, hangover=2))
+
+    assert recognizer.blocks == [9, 10, 11, 12, 13, 14, 22, 23, 24, 25, 26, 27]
+    # once per utterance and at the end of the stream
+    assert recognizer.flushes == 3
@@ -0,0 +1,47 @@
+import wave
+
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.audio_replay import (
+    ReplayAudioClock,
+    audio_blocks,
+    load_audio,
+)
+
+
+def test_load_audio_keeps_the_first_channel_of_wav_files(tmp_path):
+    stereo = np.array([[1, -1], [2, -2], [3, -3]], dtype="<i2")
+    path = tmp_path / "speech.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(stereo.tobytes())
+
+    samples, samplerate = load_audio(path)
+
+    assert samples.tolist() == [1, 2, 3]
+    assert samplerate == 8000
+
+
+def test_raw_recordings_need_a_sample_rate(tmp_path):
+    path = tmp_path / "dump.raw"
+    np.arange(5, dtype="<i2").tofile(path)
+
+    with pytest.raises(ValueError):
+        load_audio(path)
+    samples, samplerate = load_audio(path, 16000)
+    assert samples.tolist() == [0, 1, 2, 3, 4]
+    assert samplerate == 16000
+
+
+def test_blocks_are_stamped_with_the_audio_time_at_their_end():
+    samples = np.arange(250, dtype=np.int16)
+    clock = ReplayAudioClock(realtime=False)
+
+    blocks = list(audio_blocks(samples, 1000, 100, clock))
+
+    assert [capture_time for capture_time, _ in blocks] == [0.1, 0.2, 0.25]
+    assert [len(data) // 2 for _, data in blocks] == [100, 100, 50]
+    assert clock() == 0.25
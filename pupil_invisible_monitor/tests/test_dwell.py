@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.dwell import (
+    DispersionFixationDetector,
+    DwellClicker,
+    VelocityFixationDetector,
+)
+
+RATE = 200.0
+
+
+def dispersion(points):
+    return np.ptp(points[:, 0]) + np.ptp(points[:, 1])
+
+
+def test_dispersion_window_matches_a_full_rescan():
+    rng = np.random.default_rng(1)
+    points = np.cumsum(rng.normal(0.0, 4.0, (500, 2)), axis=0)
+    detector = DispersionFixationDetector(max_dispersion=40.0)
+
+    start = 0
+    for i, (x, y) in enumerate(points):
+        detector.add(i / RATE, x, y)
+        while dispersion(points[start : i + 1]) > 40.0:
+            start += 1
+        window = points[start : i + 1]
+        assert detector.dispersion == pytest.approx(dispersion(window))
+        assert detector.centroid() == pytest.approx(tuple(window.mean(axis=0)))
+        assert detector.duration == pytest.approx((i - start) / RATE)
+
+
+def gaze_path(*fixations):
+    """Samples resting (duration, x, y) at each fixation, jumping in between."""
+    rng = np.random.default_rng(0)
+    points = [
+        np.array((x, y)) + rng.normal(0.0, 1.5, (round(duration * RATE), 2))
+        for duration, x, y in fixations
+    ]
+    points = np.concatenate(points)
+    return np.arange(len(points)) / RATE, points
+
+
+@pytest.mark.parametrize(
+    "detector", [DispersionFixationDetector(), VelocityFixationDetector()]
+)
+def test_one_click_per_dwell_at_the_fixation(detector):
+    timestamps, points = gaze_path((1.0, 200, 200), (0.3, 900, 500), (1.5, 1500, 800))
+    mouse = NullMouse()
+    clicker = DwellClicker(detector, mouse, dwell_time=0.8)
+
+    # in batches as delivered by the pipeline
+    for start in range(0, len(points), 7):
+        clicker.update(timestamps[start : start + 7], points[start : start + 7])
+
+    assert clicker.clicks == mouse.clicks == 2
+    assert mouse.position == pytest.approx((1500, 800), abs=2.0)
+
+
+def test_gaps_end_a_fixation():
+    detector = VelocityFixationDetector(max_gap=0.1)
+    for ts in np.arange(0.0, 0.5, 0.005):
+        detector.add(ts, 100.0, 100.0)
+    assert detector.is_fixation
+
+    detector.add(0.7, 100.0, 100.0)
+
+    assert detector.duration == 0.0
+    assert not detector.is_fixation
@@ -0,0 +1,111 @@
+import contextlib
+import time
+import types
+
+import zmq
+
+from pupil_invisible_monitor.event_loop import WindowEventLoop
+from pupil_invisible_monitor.polling import SensorPoller
+
+
+class FakeWindow:
+    """Window that closes after `duration` seconds, without UI events."""
+
+    def __init__(self, duration):
+        self.closes_at = time.monotonic() + duration
+        self.waits = []
+
+    @property
+    def should_draw(self):
+        return time.monotonic() < self.closes_at
+
+    def wait_events(self, timeout):
+        self.waits.append(timeout)
+        time.sleep(timeout)
+
+    @contextlib.contextmanager
+    def use_content_area(self):
+        yield
+
+    def update(self):
+        pass
+
+
+def run_loop(duration, callables=(), wait_for_data=None):
+    window = FakeWindow(duration)
+    loop = WindowEventLoop(window, 50.0, list(callables), min_frame_rate=5.0)
+    loop.wait_for_data = wait_for_data
+    loop.run()
+    return loop
+
+
+def test_unchanged_window_is_redrawn_at_the_minimum_rate():
+    loop = run_loop(0.5)
+
+    # the first draw and one every 0.2 s
+    assert 2 <= loop.draws <= 4
+    assert loop.wakeups == loop.draws
+
+
+def data_every_5_ms(timeout):
+    time.sleep(0.005)
+    return True
+
+
+def test_sensor_data_wakes_the_loop_without_a_redraw():
+    updates = []
+
+    loop = run_loop(0.3, [lambda: updates.append(1)], data_every_5_ms)
+
+    assert len(updates) == loop.wakeups > 20
+    assert loop.draws <= 3
+
+
+def test_changes_are_drawn_at_most_at_the_frame_rate():
+    loop = None
+
+    def new_frame():
+        loop.mark_dirty()
+
+    window = FakeWindow(0.5)
+    loop = WindowEventLoop(window, 50.0, [new_frame], min_frame_rate=5.0)
+    loop.wait_for_data = data_every_5_ms
+    loop.run()
+
+    assert 15 <= loop.draws <= 26
+    assert loop.wakeups > 2 * loop.draws
+
+
+def sub_socket(context, endpoint):
+    sub = context.socket(zmq.SUB)
+    sub.setsockopt(zmq.SUBSCRIBE, b"")
+    sub.connect(endpoint)
+    return sub
+
+
+def test_poller_waits_on_the_sockets_of_linked_sensors():
+    context = zmq.Context.instance()
+    pub = context.socket(zmq.PUB)
+    pub.bind("inproc://gaze")
+    sensor = types.SimpleNamespace(
+        data_sub=sub_socket(context, "inproc://gaze"),
+        notify_sub=sub_socket(context, "inproc://gaze"),
+    )
+    linked = types.SimpleNamespace(is_linked=True, sensors={"gaze": sensor})
+    unlinked = types.SimpleNamespace(is_linked=False, sensors={"gaze": None})
+    controller = types.SimpleNamespace(hosts=lambda: iter((unlinked, linked)))
+    poller = SensorPoller(controller)
+    try:
+        assert poller.sensor_sockets() == ((sensor.data_sub, sensor.notify_sub), True)
+        assert not poller.wait(0.02)
+
+        # slow joiners
+        for _ in range(100):
+            pub.send(b"gaze")
+            if poller.wait(0.01):
+                break
+        assert poller.wait(1.0)
+        assert poller.stats()["timeouts"] >= 1
+    finally:
+        for sock in (pub, sensor.data_sub, sensor.notify_sub):
+            sock.close(linger=0)
@@ -0,0 +1,75 @@
+import argparse
+
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.filters import (
+    KalmanFilter,
+    NoFilter,
+    OneEuroFilter,
+    add_filter_arguments,
+    filter_from_args,
+)
+
+RATE = 200.0
+
+
+def fixation(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(n) / RATE
+    points = np.array([800.0, 450.0]) + rng.normal(0.0, 10.0, (n, 2))
+    return timestamps, points
+
+
+@pytest.mark.parametrize("cls", [OneEuroFilter, KalmanFilter])
+def test_batches_are_filtered_like_one_stream(cls):
+    timestamps, points = fixation()
+    whole = cls().filter(timestamps, points)
+
+    split = cls()
+    parts = [
+        split.filter(timestamps[start:stop], points[start:stop])
+        for start, stop in ((0, 1), (1, 150), (150, 150), (150, 400))
+    ]
+
+    np.testing.assert_allclose(np.concatenate(parts), whole)
+
+
+@pytest.mark.parametrize("cls", [OneEuroFilter, KalmanFilter])
+def test_fixation_jitter_is_smoothed(cls):
+    timestamps, points = fixation()
+    filtered = cls().filter(timestamps, points)[100:]
+
+    assert filtered.std(axis=0).max() < 0.75 * points[100:].std(axis=0).min()
+    np.testing.assert_allclose(filtered.mean(axis=0), (800.0, 450.0), atol=3.0)
+
+
+def test_kalman_follows_constant_motion_without_lag():
+    timestamps = np.arange(200) / RATE
+    points = np.column_stack((100.0 + 500.0 * timestamps, np.full(200, 300.0)))
+
+    filtered = KalmanFilter().filter(timestamps, points)
+
+    np.testing.assert_allclose(filtered[-50:], points[-50:], atol=0.5)
+
+
+def test_kalman_restarts_after_a_gap():
+    kalman = KalmanFilter(reset_gap=0.5)
+    kalman.filter(*fixation(100))
+
+    out = kalman.filter([10.0], [[0.0, 0.0]])
+
+    np.testing.assert_array_equal(out, [[0.0, 0.0]])
+
+
+def test_filter_from_args():
+    parser = argparse.ArgumentParser()
+    add_filter_arguments(parser)
+
+    one_euro = filter_from_args(parser.parse_args(["--beta", "0.5"]))
+    assert isinstance(one_euro, OneEuroFilter) and one_euro.beta == 0.5
+    assert isinstance(
+        filter_from_args(parser.parse_args(["--filter", "kalman"])), KalmanFilter
+    )
+    no_filter = filter_from_args(parser.parse_args(["--filter", "none"]))
+    assert isinstance(no_filter, NoFilter)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from pupil_invisible_monitor.gaze_buffer import GazeRingBuffer
+
+
+def samples(start, stop):
+    ts = np.arange(start, stop, dtype=np.float64)
+    return np.column_stack((ts, ts * 10, ts * 100))
+
+
+def test_view_is_chronological_after_wraparound():
+    buffer = GazeRingBuffer(capacity=4)
+    buffer.extend(samples(0, 3))
+    buffer.extend(samples(3, 6))
+
+    assert len(buffer) == 4
+    assert buffer.total_samples == 6
+    np.testing.assert_array_equal(buffer.view(), samples(2, 6))
+    np.testing.assert_array_equal(buffer.latest(), samples(5, 6)[0])
+
+
+def test_single_appends_wrap_around():
+    buffer = GazeRingBuffer(capacity=3)
+    for ts, x, y in samples(0, 7):
+        buffer.append(ts, x, y)
+
+    np.testing.assert_array_equal(buffer.view(), samples(4, 7))
+
+
+def test_extend_with_more_samples_than_capacity_keeps_the_newest():
+    buffer = GazeRingBuffer(capacity=4)
+    buffer.extend(samples(0, 2))
+    buffer.extend(samples(2, 12))
+
+    np.testing.assert_array_equal(buffer.view(), samples(8, 12))
+    buffer.extend(samples(12, 13))
+    np.testing.assert_array_equal(buffer.view(), samples(9, 13))
+
+
+def test_queries_across_the_wraparound():
+    buffer = GazeRingBuffer(capacity=5)
+    buffer.extend(samples(0, 8))
+
+    np.testing.assert_array_equal(buffer.since(5.0), samples(6, 8))
+    assert len(buffer.since(7.0)) == 0
+    np.testing.assert_array_equal(buffer.between(4.0, 6.0), samples(4, 7))
+    np.testing.assert_array_equal(buffer.nearest(5.4), samples(5, 6)[0])
+    np.testing.assert_array_equal(
+        buffer.nearest(np.array([0.0, 6.6])), samples(3, 8)[[0, 4]]
+    )
+    np.testing.assert_allclose(buffer.window_mean(4.0, 6.0), (50.0, 500.0))
+    assert buffer.window_mean(10.0, 11.0) is None
@@ -0,0 +1,69 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = (
+    Path(__file__).parents[2]
+    / "marker_detection"
+    / "Determining ArUco marker"
+    / "guess_aruco_type.py"
+)
+
+
+@pytest.fixture(scope="module")
+def guess():
+    pytest.importorskip("imutils")
+    spec = importlib.util.spec_from_file_location("guess_aruco_type", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def summary_of(guess, detections):
+    """Batch summary from {dictionary: {marker id: images}}."""
+    summary = {
+        name: {"tested": 10, "images": 0, "markers": 0, "ids": {}}
+        for name in guess.ARUCO_DICT
+    }
+    for name, ids in detections.items():
+        summary[name]["ids"] = dict(ids)
+        summary[name]["markers"] = sum(ids.values())
+        summary[name]["images"] = max(ids.values())
+    return summary
+
+
+def test_single_false_positive_does_not_pick_a_larger_dictionary(guess):
+    screen = {70: 33, 42: 27, 66: 12}
+    summary = summary_of(
+        guess,
+        {
+            "DICT_5X5_50": {42: 27},
+            "DICT_5X5_100": screen,
+            "DICT_5X5_250": screen,
+            "DICT_5X5_1000": {**screen, 788: 1},
+        },
+    )
+
+    assert guess.best_dictionary(summary, "DICT_5X5") == "DICT_5X5_100"
+    # without an early exit, the family with the most markers is used
+    assert guess.best_dictionary(summary, None) == "DICT_5X5_100"
+
+
+def test_repeated_high_ids_need_a_larger_dictionary(guess):
+    ids = {42: 10, 300: 4}
+    summary = summary_of(
+        guess,
+        {"DICT_4X4_50": {42: 10}, "DICT_4X4_250": {42: 10}, "DICT_4X4_1000": ids},
+    )
+
+    assert guess.best_dictionary(summary, "DICT_4X4") == "DICT_4X4_1000"
+    assert guess.best_dictionary(summary_of(guess, {}), None) is None
+
+
+def test_dominant_family_needs_enough_images(guess):
+    summary = summary_of(guess, {"DICT_5X5_100": {42: 9, 24: 9}, "DICT_6X6_50": {1: 1}})
+
+    assert guess.dominant_family(summary, 0.75, 10) is None
+    assert guess.dominant_family(summary, 0.75, 5) == "DICT_5X5"
+    assert guess.dominant_family(summary, 0.99, 5) is None
@@ -0,0 +1,65 @@
+import types
+
+from pupil_invisible_monitor.headless import HeadlessScheduler
+
+
+class FakeController:
+    def __init__(self, hosts):
+        self._hosts = hosts
+        self.fetches = 0
+
+    def hosts(self):
+        yield from self._hosts
+
+    def poll_events(self):
+        pass
+
+    def fetch_recent_data(self):
+        self.fetches += 1
+
+    def link(self, host):
+        host.is_linked = True
+
+
+def host(name, available=True):
+    return types.SimpleNamespace(
+        name=name, is_available=available, is_linked=False, sensors={}
+    )
+
+
+def test_links_the_named_host_once_it_is_available():
+    hosts = [host("PI left"), host("PI right", available=False)]
+    scheduler = HeadlessScheduler(FakeController(hosts), "PI right")
+
+    scheduler.auto_link()
+    assert not any(h.is_linked for h in hosts)
+
+    hosts[1].is_available = True
+    scheduler.auto_link()
+    assert [h.is_linked for h in hosts] == [False, True]
+
+
+def test_links_the_first_available_host_by_default():
+    hosts = [host("PI a", available=False), host("PI b"), host("PI c")]
+    scheduler = HeadlessScheduler(FakeController(hosts))
+
+    scheduler.auto_link()
+    scheduler.auto_link()
+
+    assert [h.is_linked for h in hosts] == [False, True, False]
+
+
+def test_run_fetches_data_until_stopped():
+    controller = FakeController([host("PI a")])
+    scheduler = HeadlessScheduler(controller, discovery_interval=0.01)
+
+    def stop_after_three():
+        if controller.fetches == 3:
+            scheduler.stop()
+
+    scheduler.callables.append(stop_after_three)
+    scheduler.run()
+
+    assert controller.fetches == 3
+    assert scheduler.stats()["wakeups"] == 3
+    assert scheduler.stats()["timeouts"] == 3
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.layout import (
+    LayoutMapper,
+    Screen,
+    ScreenLayout,
+    load_screen_layout,
+)
+
+LEFT = Screen("left", ((42, 0), (24, 1), (70, 2), (66, 3)), (1920, 1080), (0, 0))
+RIGHT = Screen("right", ((1, 0), (2, 1), (3, 2), (4, 3)), (1280, 1024), (1920, 0))
+
+
+def marker(idx):
+    return np.full((1, 4, 2), float(idx))
+
+
+def test_detected_markers_are_assigned_to_screen_corners():
+    layout = ScreenLayout([LEFT, RIGHT])
+    ids = np.array([[70], [5], [3], [-1], [1000], [42]])
+    corners = [marker(idx) for idx in range(len(ids))]
+
+    markers = layout.marker_corners(corners, ids)
+
+    assert markers.shape == (2, 4, 4, 2)
+    # found: left top-left and bottom-right, right bottom-right
+    found = ~np.isnan(markers).any(axis=(2, 3))
+    assert found.tolist() == [[True, False, True, False], [False, False, True, False]]
+    assert markers[0, 0, 0, 0] == 5.0
+    assert markers[0, 2, 0, 0] == 0.0
+    assert markers[1, 2, 0, 0] == 2.0
+    assert np.isnan(layout.marker_corners([], None)).all()
+
+
+def test_markers_may_only_be_used_once():
+    with pytest.raises(ValueError):
+        ScreenLayout([LEFT, LEFT._replace(name="copy")])
+
+
+def test_gaze_goes_to_the_screen_that_contains_it():
+    layout = ScreenLayout([LEFT, RIGHT])
+    mapper = LayoutMapper(layout)
+    quads = np.array(
+        [
+            [(0, 0), (100, 0), (100, 50), (0, 50)],
+            [(100, 0), (200, 0), (200, 80), (100, 80)],
+        ],
+        dtype=float,
+    )
+    mapper.update(quads, np.array([True, True]))
+
+    desktop, inside = mapper.map_inside([(50, 25), (150, 40), (250, 40)])
+
+    np.testing.assert_allclose(desktop[:2], [(960, 540), (1920 + 640, 512)])
+    assert inside.tolist() == [True, True, False]
+    assert mapper.screen == 1
+
+    # hidden screens are not mapped onto
+    mapper.update(quads, np.array([True, False]))
+    _, inside = mapper.map_inside([(150, 40)])
+    assert not inside.any()
+
+
+def test_screens_without_size_take_those_of_the_monitors(tmp_path):
+    path = tmp_path / "layout.json"
+    screens = [
+        {"name": "left", "markers": [42, 24, 70, 66]},
+        {"markers": [1, 2, 3, 4]},
+        {"markers": [5, 6, 7, 8], "size": [800, 600]},
+    ]
+    path.write_text(json.dumps({"screens": screens}))
+
+    monitors = [(0, 0, 2560, 1440), (2560, 0, 1920, 1080)]
+
+    layout = load_screen_layout(path, monitors)
+
+    assert [screen.size for screen in layout.screens] == [
+        (2560, 1440),
+        (1920, 1080),
+        (800, 600),
+    ]
+    offsets = [screen.offset for screen in layout.screens]
+    assert offsets == [(0, 0), (2560, 0), (4480, 0)]
+    assert layout.screens[1].name == "screen 1"
+    assert layout.screens[2].corner_markers == ((5, 0), (6, 1), (7, 2), (8, 3))
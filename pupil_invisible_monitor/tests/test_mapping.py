@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.mapping import (
+    ScreenMapper,
+    homography_from_quads,
+    transform_points,
+)
+
+# screen seen in perspective, the right edge is further away
+QUAD = np.array([(100.0, 80.0), (520.0, 120.0), (510.0, 330.0), (110.0, 400.0)])
+SCREEN = np.array([(0.0, 0.0), (1920.0, 0.0), (1920.0, 1080.0), (0.0, 1080.0)])
+
+
+def test_homography_matches_opencv():
+    expected = cv2.getPerspectiveTransform(
+        QUAD.astype(np.float32), SCREEN.astype(np.float32)
+    )
+
+    np.testing.assert_allclose(homography_from_quads(QUAD, SCREEN), expected, 1e-5)
+
+
+def test_gaze_is_mapped_onto_the_screen():
+    mapper = ScreenMapper((1920, 1080))
+    mapper.update(QUAD)
+    center = transform_points(homography_from_quads(SCREEN, QUAD), [(960, 540)])
+
+    points, inside = mapper.map_inside(np.vstack((QUAD, center, [(50, 50)])))
+
+    expected = np.vstack((SCREEN, [(960, 540)]))
+    np.testing.assert_allclose(points[:5], expected, atol=1e-6)
+    assert inside[4:].tolist() == [True, False]
+    point, on_screen = mapper.map_inside(center[0])
+    assert point.shape == (2,) and on_screen
+
+
+def test_points_behind_the_horizon_are_outside():
+    # strongly converging edges, the horizon line is at x = 500
+    quad = np.array([(100.0, 0.0), (400.0, 150.0), (400.0, 250.0), (100.0, 400.0)])
+    mapper = ScreenMapper((1920, 1080))
+    mapper.update(quad)
+
+    _, inside = mapper.map_inside(np.array([(250.0, 200.0), (1500.0, 200.0)]))
+
+    assert inside.tolist() == [True, False]
+
+
+def test_homography_is_cached_within_the_tolerance():
+    mapper = ScreenMapper((1920, 1080), tolerance=2.0)
+
+    assert mapper.update(QUAD)
+    homography = mapper.homography
+    assert not mapper.update(QUAD + 1.5)
+    assert mapper.homography is homography
+    assert mapper.update(QUAD + 3.0)
+    # degenerate quads keep the last homography
+    assert not mapper.update(np.zeros((4, 2)))
+    assert mapper.updates == 2
+    np.testing.assert_array_equal(mapper.quad, QUAD + 3.0)
+
+
+def test_update_is_required_before_mapping():
+    with pytest.raises(RuntimeError):
+        ScreenMapper().map_inside((0.0, 0.0))
@@ -0,0 +1,108 @@
+import types
+
+import numpy as np
+
+from conftest import MARKER_POSITIONS, draw_markers
+from pupil_invisible_monitor.markers import (
+    DEFAULT_ARUCO_DICT,
+    LumaPreprocessor,
+    MarkerDetector,
+    TrackingMarkerDetector,
+    aruco_setup,
+    luma_view,
+)
+
+
+def detectors(**kwargs):
+    setup = aruco_setup(DEFAULT_ARUCO_DICT)
+    return MarkerDetector(*setup), TrackingMarkerDetector(*setup, **kwargs)
+
+
+def by_id(corners, ids):
+    return {
+        marker_id: marker_corners.reshape(4, 2)
+        for marker_corners, marker_id in zip(corners, ids.ravel().tolist())
+    }
+
+
+def moved(dx, dy, positions=MARKER_POSITIONS):
+    return {marker_id: (x + dx, y + dy) for marker_id, (x, y) in positions.items()}
+
+
+def test_roi_search_follows_moving_markers():
+    full, tracking = detectors(full_scan_interval=100)
+    for step in range(5):
+        frame = draw_markers(moved(4 * step, 3 * step))
+        found = by_id(*tracking.detect(frame))
+        expected = by_id(*full.detect(frame))
+
+        assert found.keys() == expected.keys() == MARKER_POSITIONS.keys()
+        for marker_id, marker_corners in expected.items():
+            np.testing.assert_allclose(found[marker_id], marker_corners, atol=0.5)
+
+    assert tracking.stats.full_scans == 1
+    assert tracking.stats.roi_frames == 4
+
+
+def test_full_scan_when_all_tracked_markers_are_lost():
+    _, tracking = detectors()
+    tracking.detect(draw_markers(MARKER_POSITIONS))
+
+    # every marker jumps out of its search region
+    jumped = {42: (220, 50), 24: (340, 50), 70: (340, 350), 66: (220, 350)}
+    found = by_id(*tracking.detect(draw_markers(jumped)))
+
+    assert sorted(found) == [24, 42, 66, 70]
+    np.testing.assert_allclose(found[42][0], jumped[42], atol=1.0)
+    assert tracking.stats.fallbacks == 1
+    assert tracking.stats.roi_frames == 0
+
+
+def test_markers_coming_into_view_are_picked_up():
+    _, tracking = detectors(missing_scan_interval=3)
+    visible = {42: MARKER_POSITIONS[42], 24: MARKER_POSITIONS[24]}
+    tracking.detect(draw_markers(visible))
+
+    frame = draw_markers(MARKER_POSITIONS)
+    found = [sorted(tracking.detect(frame)[1].ravel()) for _ in range(4)]
+
+    # the regions of the tracked markers only, until the next full scan
+    assert found == [[24, 42]] * 3 + [[24, 42, 66, 70]]
+    assert tracking.stats.full_scans == 2
+
+
+def yuv_frame(gray):
+    """Scene frame with an I420 buffer, as received from the scene camera."""
+    height, width = gray.shape
+    chroma = np.full(height * width // 2, 128, np.uint8)
+    yuv_buffer = np.concatenate((gray.ravel(), chroma))
+    return types.SimpleNamespace(
+        yuv_buffer=yuv_buffer, width=width, height=height, gray=None
+    )
+
+
+def test_luma_is_a_view_on_the_y_plane(marker_frame):
+    frame = yuv_frame(marker_frame)
+
+    luma = luma_view(frame)
+
+    np.testing.assert_array_equal(luma, marker_frame)
+    assert np.shares_memory(luma, frame.yuv_buffer)
+    gray_frame = types.SimpleNamespace(yuv_buffer=None, gray=marker_frame)
+    assert luma_view(gray_frame) is marker_frame
+
+
+def test_downscaled_luma_reuses_its_buffer(marker_frame):
+    frame = yuv_frame(marker_frame)
+    full, _ = detectors()
+
+    assert np.shares_memory(LumaPreprocessor().prepare(frame), frame.yuv_buffer)
+    preprocessor = LumaPreprocessor(target_width=320)
+    image = preprocessor.prepare(frame)
+    assert image.shape == (240, 320)
+    assert preprocessor.prepare(frame) is image
+    assert LumaPreprocessor(target_scale=0.5).prepare(frame).shape == (240, 320)
+
+    found = by_id(*full.detect(image))
+    assert sorted(found) == [24, 42, 66, 70]
+    np.testing.assert_allclose(found[42][0] * 2, MARKER_POSITIONS[42], atol=2.0)
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from pupil_invisible_monitor.metrics import MetricsRegistry, RollingHistogram
+
+
+def test_histogram_keeps_the_last_values():
+    histogram = RollingHistogram(size=100)
+    for value in range(250):
+        histogram.add(value)
+
+    summary = histogram.summary()
+
+    assert summary["count"] == 250
+    assert sorted(histogram.values()) == list(range(150, 250))
+    assert summary["p50"] == pytest.approx(199.5)
+    assert summary["max"] == 249
+    assert RollingHistogram().summary() == {"count": 0}
+
+
+def test_summary_lists_pipeline_stages_first(tmp_path):
+    metrics = MetricsRegistry()
+    for name in ("voice", "map", "detect", "acquire"):
+        metrics.record(name, 0.002)
+    with metrics.timer("filter"):
+        pass
+    calls = []
+    metrics.add_gauge("worker", lambda: calls.append(1) or {"dropped": len(calls)})
+
+    path = metrics.dump_json(tmp_path / "metrics.json")
+
+    summary = json.loads(path.read_text())
+    assert list(summary["timers_ms"]) == ["acquire", "detect", "map", "filter", "voice"]
+    assert summary["timers_ms"]["map"]["mean"] == pytest.approx(2.0)
+    # gauges are sampled when the summary is requested
+    assert summary["gauges"] == {"worker": {"dropped": 1}}
+    assert metrics.summary()["gauges"] == {"worker": {"dropped": 2}}
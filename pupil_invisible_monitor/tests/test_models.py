@@ -0,0 +1,116 @@
+import os
+import random
+import subprocess
+import sys
+import types
+
+import pytest
+
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.markers import aruco_setup
+from pupil_invisible_monitor.models import Host, Host_Controller, HostRegistry
+
+
+class SilentNetwork:
+    """Network stand-in that never announces a host."""
+
+    has_events = False
+
+    def __init__(self, formats=(), callbacks=()):
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+def test_multi_host_mode_has_only_per_host_pipelines():
+    controller = Host_Controller(SilentNetwork, NullMouse(), multi_host=True)
+    controller.pipeline_factory = lambda host: controller.create_pipeline(
+        NullMouse(), name=host.name
+    )
+    try:
+        controller.start_vision_worker()
+        assert controller.pipeline is None
+        assert controller.pipelines() == []
+
+        host = types.SimpleNamespace(name="Host A")
+        pipeline = controller.pipeline_for(host)
+        assert controller.pipeline_for(host) is pipeline
+        assert controller.pipelines() == [pipeline]
+        assert pipeline.vision_worker.is_running
+    finally:
+        controller.cleanup()
+    assert pipeline.vision_worker is None
+    assert not controller.network.running
+
+
+def test_single_host_mode_uses_one_pipeline():
+    controller = Host_Controller(SilentNetwork, NullMouse())
+    try:
+        host = types.SimpleNamespace(name="Host A")
+        assert controller.pipeline_for(host) is controller.pipeline
+        assert controller.pipelines() == [controller.pipeline]
+    finally:
+        controller.cleanup()
+
+
+def test_host_registry_stays_sorted_and_indexed():
+    rng = random.Random(0)
+    registry = HostRegistry()
+    expected = {}
+    for _ in range(300):
+        name = f"PI {rng.randrange(40):02d}"
+        if name in expected and rng.random() < 0.5:
+            del registry[name]
+            del expected[name]
+        else:
+            registry[name] = expected[name] = Host(name, name)
+
+        names = sorted(expected)
+        assert [host.name for host in registry.hosts()] == names
+        assert len(registry) == len(names)
+        for idx, name in enumerate(names):
+            assert registry.index(name) == idx
+            assert registry.at(idx) is registry[name] is expected[name]
+
+
+def test_host_registry_snapshot_is_reused_until_changed():
+    registry = HostRegistry()
+    registry["b"] = Host("b", "b")
+    snapshot = registry.hosts()
+
+    assert registry.hosts() is snapshot
+    registry["a"] = Host("a", "a")
+    assert [host.name for host in registry.hosts()] == ["a", "b"]
+    # hosts removed while iterating over a snapshot
+    for host in registry.hosts():
+        del registry[host.name]
+    assert "a" not in registry and registry.hosts() == ()
+
+
+def test_import_has_no_side_effects():
+    # arguments of another program, the mouse module needs a display or root
+    code = (
+        "import sys\n"
+        "import pupil_invisible_monitor.models\n"
+        "print(sorted({'mouse', 'matplotlib', 'PIL'} & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, "--type", "unknown", "-x"],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[]\n"
+
+
+def test_aruco_setup_is_shared_and_validated():
+    assert aruco_setup("DICT_5X5_100") is aruco_setup("DICT_5X5_100")
+    with pytest.raises(ValueError):
+        aruco_setup("DICT_UNKNOWN")
@@ -0,0 +1,67 @@
+import gc
+
+import pytest
+
+from pupil_invisible_monitor.observable import Observable, ObserverError
+
+
+class Producer(Observable):
+    def on_recent_gaze(self, gaze):
+        return gaze
+
+
+class Consumer:
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    def on_gaze(self, gaze):
+        self.calls.append((self.name, gaze))
+
+
+def test_observers_are_called_in_order_until_removed():
+    producer = Producer()
+    calls = []
+    consumer = Consumer(calls, "method")
+
+    def function(gaze):
+        calls.append(("function", gaze))
+
+    producer.add_observer("on_recent_gaze", consumer.on_gaze)
+    producer.add_observer("on_recent_gaze", function)
+    assert producer.on_recent_gaze(1) == 1
+    producer.remove_observer("on_recent_gaze", consumer.on_gaze)
+    producer.on_recent_gaze(2)
+    producer.remove_all_observers("on_recent_gaze")
+    producer.on_recent_gaze(3)
+
+    assert calls == [("method", 1), ("function", 1), ("function", 2)]
+
+
+def test_deleted_objects_are_dropped_from_the_observers():
+    producer = Producer()
+    calls = []
+    kept, deleted = Consumer(calls, "kept"), Consumer(calls, "deleted")
+    producer.add_observer("on_recent_gaze", deleted.on_gaze)
+    producer.add_observer("on_recent_gaze", kept.on_gaze)
+
+    del deleted
+    gc.collect()
+    producer.on_recent_gaze(1)
+    producer.on_recent_gaze(2)
+
+    assert calls == [("kept", 1), ("kept", 2)]
+    assert len(producer.on_recent_gaze._observers) == 1
+
+
+def test_observer_exceptions_are_wrapped():
+    producer = Producer()
+
+    def failing(gaze):
+        raise KeyError(gaze)
+
+    producer.add_observer("on_recent_gaze", failing)
+
+    with pytest.raises(ObserverError) as error:
+        producer.on_recent_gaze(1)
+    assert isinstance(error.value.__cause__, KeyError)
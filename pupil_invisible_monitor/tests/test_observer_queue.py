@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from pupil_invisible_monitor.observable import Observable, ObserverQueue
+
+
+def blocked_queue(drop):
+    """ObserverQueue of two calls whose thread waits in a first call."""
+    queue = ObserverQueue(maxsize=2, drop=drop)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(1.0)
+
+    queue.submit(block)
+    assert started.wait(1.0)
+    return queue, release
+
+
+@pytest.mark.parametrize("drop, expected", [("oldest", [3, 4]), ("newest", [1, 2])])
+def test_full_queue_drops_calls(drop, expected):
+    queue, release = blocked_queue(drop)
+    calls = []
+    for idx in range(1, 5):
+        queue.submit(calls.append, idx)
+
+    release.set()
+    queue.close(1.0)
+
+    assert calls == expected
+    assert queue.stats()["dropped"] == 2
+    assert queue.stats()["called"] == 3
+
+
+def test_blocking_queue_waits_for_space():
+    queue, release = blocked_queue("block")
+    calls = []
+    queue.submit(calls.append, 1)
+    queue.submit(calls.append, 2)
+    submitter = threading.Thread(target=queue.submit, args=(calls.append, 3))
+    submitter.start()
+    submitter.join(0.05)
+    assert submitter.is_alive()
+
+    release.set()
+    submitter.join(1.0)
+    queue.close(1.0)
+
+    assert calls == [1, 2, 3]
+    assert queue.stats()["dropped"] == 0
+
+
+class Producer(Observable):
+    def on_recent_frame(self, frame):
+        pass
+
+
+def test_slow_observers_do_not_stall_the_producer():
+    producer = Producer()
+    queue = ObserverQueue(maxsize=2, name="slow")
+    errors = ObserverQueue(name="failing")
+    release = threading.Event()
+    frames = []
+
+    def slow(frame):
+        release.wait(1.0)
+        frames.append(frame)
+
+    def failing(frame):
+        raise ValueError(frame)
+
+    producer.add_observer("on_recent_frame", slow, executor=queue)
+    producer.add_observer("on_recent_frame", failing, executor=errors)
+    for frame in range(10):
+        producer.on_recent_frame(frame)
+    assert frames == []
+
+    release.set()
+    queue.close(1.0)
+    errors.close(1.0)
+
+    # the newest calls are kept, exceptions are logged and counted
+    assert frames[-2:] == [8, 9]
+    assert queue.stats()["called"] + queue.stats()["dropped"] == 10
+    assert errors.stats()["errors"] == 10
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from pupil_invisible_monitor.mapping import (
+    UNIT_SQUARE,
+    homography_from_quads,
+    transform_points,
+)
+from pupil_invisible_monitor.pose import ScreenPoseTracker
+
+# unit screen coordinates of the markers in the top-left, top-right, bottom-right
+# and bottom-left corner, each in ArUco corner order with its outer corner at the
+# index of its screen corner
+UNIT_MARKERS = np.array(
+    [
+        [(0.0, 0.0), (0.1, 0.0), (0.1, 0.1), (0.0, 0.1)],
+        [(0.9, 0.0), (1.0, 0.0), (1.0, 0.1), (0.9, 0.1)],
+        [(0.9, 0.9), (1.0, 0.9), (1.0, 1.0), (0.9, 1.0)],
+        [(0.0, 0.9), (0.1, 0.9), (0.1, 1.0), (0.0, 1.0)],
+    ]
+)
+SCREEN = np.array([(100.0, 80.0), (520.0, 110.0), (500.0, 400.0), (90.0, 360.0)])
+
+
+def scene_markers(quad, visible=(True, True, True, True)):
+    """(4, 4, 2) marker corners of a screen seen as `quad`, NaN if not visible."""
+    to_scene = homography_from_quads(UNIT_SQUARE, quad)
+    markers = transform_points(to_scene, UNIT_MARKERS.reshape(-1, 2)).reshape(4, 4, 2)
+    markers[~np.asarray(visible)] = np.nan
+    return markers
+
+
+@pytest.mark.parametrize(
+    "visible", [(True, False, True, False), (False, True, False, True)]
+)
+def test_unknown_screen_from_two_opposite_corners(visible):
+    tracker = ScreenPoseTracker()
+
+    quad = tracker.update(0.0, scene_markers(SCREEN, visible))
+
+    assert tracker.source == "edges"
+    np.testing.assert_allclose(quad, SCREEN, atol=1e-6)
+    # the geometry of the seen markers was learned, the others are unknown
+    known = ~np.isnan(tracker.geometry).any(axis=(1, 2))
+    np.testing.assert_array_equal(known, visible)
+
+
+def test_pose_recovers_from_two_opposite_corners_after_movement():
+    tracker = ScreenPoseTracker()
+    tracker.update(0.0, scene_markers(SCREEN))
+    assert tracker.source == "full"
+
+    moved = SCREEN + (30.0, -12.0)
+    quad = tracker.update(0.1, scene_markers(moved, (False, True, False, True)))
+
+    assert tracker.source == "partial"
+    np.testing.assert_allclose(quad, moved, atol=0.5)
+
+
+def test_pose_is_predicted_without_markers_then_lost():
+    tracker = ScreenPoseTracker(max_prediction_time=0.3)
+    tracker.update(0.0, scene_markers(SCREEN))
+    tracker.update(0.1, scene_markers(SCREEN + (10.0, 0.0)))
+    none_visible = scene_markers(SCREEN, (False, False, False, False))
+
+    quad = tracker.update(0.2, none_visible)
+    assert tracker.source == "predicted"
+    assert quad[:, 0].mean() > (SCREEN[:, 0] + 10.0).mean()
+
+    assert tracker.update(0.5, none_visible) is None
+    assert tracker.source == "lost"
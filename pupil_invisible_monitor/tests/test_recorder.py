@@ -0,0 +1,124 @@
+import threading
+import time
+import types
+
+import numpy as np
+
+from pupil_invisible_monitor.actuator import NullMouse
+from pupil_invisible_monitor.metrics import MetricsRegistry
+from pupil_invisible_monitor.observable import Observable
+from pupil_invisible_monitor.pipeline import VisionResult
+from pupil_invisible_monitor.recorder import (
+    ACTION_CLICK,
+    ACTION_MOVE,
+    SessionReader,
+    SessionRecorder,
+)
+
+
+class Controller(Observable):
+    """Observed methods of Host_Controller that the recorder attaches to."""
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+
+    def on_gaze_samples(self, host_name, samples):
+        pass
+
+    def on_recent_frame(self, frame):
+        pass
+
+    def on_vision_result(self, result):
+        pass
+
+
+def gaze_samples(start, count):
+    ts = start + np.arange(count) / 200
+    return np.column_stack((ts, np.full(count, 540.0), np.arange(count, dtype=float)))
+
+
+def test_recorded_session_reads_back(tmp_path):
+    # small chunks, such that the streams span several chunk files
+    recorder = SessionRecorder(tmp_path, chunk_size=4)
+    controller = Controller()
+    recorder.attach(controller)
+    mouse = recorder.recording_mouse(NullMouse())
+
+    controller.on_gaze_samples("phone", gaze_samples(1.0, 3))
+    controller.on_gaze_samples("phone", gaze_samples(1.015, 7))
+    frame = types.SimpleNamespace(timestamp=1.02, index=7, width=1088, height=1080)
+    controller.on_recent_frame(frame)
+    quad = np.array([(100.0, 100.0), (900.0, 100.0), (900.0, 700.0), (100.0, 700.0)])
+    mapped = VisionResult(
+        1.02, (540.0, 3.0), [42, 24], (960.0, 540.0), "phone", quad, np.eye(3)
+    )
+    controller.on_vision_result(mapped)
+    controller.on_vision_result(VisionResult(1.05, (540.0, 4.0), None, None, "phone"))
+    mouse.move(960.0, 540.0)
+    mouse.click("right")
+    recorder.close()
+
+    reader = SessionReader(tmp_path)
+    assert reader.hosts == ["phone"]
+
+    gaze = reader["gaze"]
+    expected = np.concatenate((gaze_samples(1.0, 3), gaze_samples(1.015, 7)))
+    assert len(gaze) == 10
+    np.testing.assert_array_equal(gaze["timestamp"], expected[:, 0])
+    np.testing.assert_array_equal(gaze["x"], expected[:, 1])
+    np.testing.assert_array_equal(gaze["y"], expected[:, 2])
+    assert (gaze["host"] == 0).all()
+    assert len(reader.chunks("gaze")) == 3
+
+    frames = reader["frames"]
+    assert frames[["timestamp", "index", "width", "height"]].tolist() == [
+        (1.02, 7, 1088, 1080)
+    ]
+
+    vision = reader["vision"]
+    np.testing.assert_array_equal(vision["frame_timestamp"], (1.02, 1.05))
+    np.testing.assert_array_equal(vision["marker_count"], (2, 0))
+    np.testing.assert_array_equal(vision["screen_quad"][0], quad)
+    np.testing.assert_array_equal(vision["homography"][0], np.eye(3))
+    np.testing.assert_array_equal(vision["screen_pos"][0], (960.0, 540.0))
+    assert np.isnan(vision["screen_pos"][1]).all()
+    assert np.isnan(vision["screen_quad"][1]).all()
+
+    actions = reader["actions"]
+    np.testing.assert_array_equal(actions["action"], (ACTION_MOVE, ACTION_CLICK))
+    np.testing.assert_array_equal(actions["value"], (0, 1))
+    assert (np.diff(actions["recorded_at"]) >= 0).all()
+
+
+def test_unclosed_session_reads_the_written_records(tmp_path):
+    recorder = SessionRecorder(tmp_path, chunk_size=8)
+    # as if the recorder crashed, without close()
+    recorder.on_gaze_samples(None, gaze_samples(2.0, 5))
+
+    gaze = SessionReader(tmp_path)["gaze"]
+
+    np.testing.assert_array_equal(gaze["timestamp"], gaze_samples(2.0, 5)[:, 0])
+    assert len(SessionReader(tmp_path)["vision"]) == 0
+    recorder.close()
+
+
+def test_records_are_stamped_when_called_not_when_written(tmp_path):
+    recorder = SessionRecorder(tmp_path)
+    controller = Controller()
+    recorder.attach(controller)
+    # keeps the recorder's queue busy
+    release = threading.Event()
+    recorder.queue.submit(release.wait, 1.0)
+
+    called_at = time.monotonic()
+    controller.on_gaze_samples("phone", gaze_samples(1.0, 2))
+    controller.on_recent_frame(types.SimpleNamespace(timestamp=1.0, width=8, height=8))
+    time.sleep(0.1)
+    release.set()
+    recorder.close()
+
+    reader = SessionReader(tmp_path)
+    for name in ("gaze", "frames"):
+        recorded_at = reader[name]["recorded_at"]
+        assert len(recorded_at) > 0
+        assert ((recorded_at >= called_at) & (recorded_at < called_at + 0.05)).all()
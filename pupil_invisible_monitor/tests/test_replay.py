@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+import pytest
+
+from conftest import MARKER_POSITIONS, draw_markers, write_video
+from pupil_invisible_monitor.replay import TIMED_STAGES, load_gaze_csv, run_replay
+
+
+def test_pupil_cloud_gaze_is_sorted_and_in_seconds(tmp_path):
+    path = tmp_path / "gaze.csv"
+    path.write_text(
+        "section id,recording id,timestamp [ns],gaze x [px],gaze y [px]\n"
+        "a,b,1600000000010000000,10.5,20\n"
+        "a,b,1600000000000000000,11,21\n"
+        "a,b,1600000000005000000,12,22\n"
+    )
+
+    gaze = load_gaze_csv(path)
+
+    np.testing.assert_allclose(
+        gaze, [(0.0, 11, 21), (0.005, 12, 22), (0.01, 10.5, 20)], atol=1e-6
+    )
+
+
+def test_gaze_csv_without_header(tmp_path):
+    path = tmp_path / "gaze.csv"
+    path.write_text("0.5,100,200\n0.25,110,210\n")
+
+    np.testing.assert_allclose(load_gaze_csv(path), [(0, 110, 210), (0.25, 100, 200)])
+
+
+def test_replay_maps_gaze_on_the_marker_screen(tmp_path):
+    # the screen drifts by a pixel per frame
+    frames = []
+    for idx in range(20):
+        positions = {
+            marker_id: (x + idx, y) for marker_id, (x, y) in MARKER_POSITIONS.items()
+        }
+        frames.append(cv2.cvtColor(draw_markers(positions), cv2.COLOR_GRAY2BGR))
+    video = tmp_path / "scene.avi"
+    write_video(video, frames)
+
+    report, timings = run_replay(video)
+
+    assert report["frames"] == len(timings) == 20
+    assert report["pose"]["mapped"] == 1.0
+    assert report["detector"]["roi_frames"] == 19
+    # the synthetic gaze at the frame center is inside the screen
+    assert report["mouse_moves"] > 0
+    assert set(report["stages"]) == set(TIMED_STAGES) | {"total"}
+    assert report["stages"]["total"]["max_ms"] == pytest.approx(
+        max(timing["total"] for timing in timings) * 1000
+    )
@@ -0,0 +1,64 @@
+import numpy as np
+
+from conftest import write_video
+from pupil_invisible_monitor import tune_aruco
+from pupil_invisible_monitor.markers import (
+    DEFAULT_ARUCO_DICT,
+    DetectorProfile,
+    TrackingMarkerDetector,
+    aruco_setup,
+)
+from pupil_invisible_monitor.tune_aruco import Evaluation, recall, select
+
+
+def evaluation(detections, mean_ms, serial=False, scale=1.0):
+    profile = DetectorProfile((), scale)
+    return Evaluation(profile, frozenset(detections), mean_ms, serial)
+
+
+def test_video_without_markers_is_not_tuned(tmp_path, capsys):
+    video = tmp_path / "blank.avi"
+    write_video(video, [np.full((120, 160, 3), 128, np.uint8)] * 3)
+    output = tmp_path / "profile.json"
+
+    args = [str(video), "--stride", "1", "-j", "1", "-o", str(output)]
+    status = tune_aruco.main(args)
+
+    assert status == 1
+    assert "No markers detected" in capsys.readouterr().out
+    assert not output.exists()
+
+
+def test_select_prefers_serial_timings_that_keep_the_recall():
+    reference = evaluation({(0, 42), (0, 24), (1, 42), (1, 24)}, 5.0)
+    lossy = evaluation({(0, 42)}, 1.0, serial=True, scale=0.5)
+    pooled = evaluation(reference.detections, 2.0, scale=0.75)
+    timed = evaluation(reference.detections, 3.0, serial=True)
+
+    assert recall(lossy, reference) == 0.25
+    assert recall(timed, evaluation((), 1.0)) == 0.0
+    assert select(reference, [lossy, pooled, timed], 0.98) is timed
+    assert select(reference, [lossy, pooled], 0.98) is pooled
+    assert select(reference, [lossy], 0.98) is None
+
+
+def test_candidates_keep_markers_detectable_in_roi_crops(marker_frame):
+    rates = {
+        (
+            dict(profile.parameters)["minMarkerPerimeterRate"],
+            dict(profile.parameters)["maxMarkerPerimeterRate"],
+        )
+        for profile in tune_aruco.candidate_profiles()
+    }
+    for min_rate, max_rate in sorted(rates):
+        overrides = (
+            ("maxMarkerPerimeterRate", max_rate),
+            ("minMarkerPerimeterRate", min_rate),
+        )
+        dictionary, parameters = aruco_setup(DEFAULT_ARUCO_DICT, overrides)
+        detector = TrackingMarkerDetector(dictionary, parameters)
+        detector.detect(marker_frame)
+        _, ids = detector.detect(marker_frame)
+
+        assert detector.stats.roi_frames == 1, (min_rate, max_rate)
+        assert sorted(ids.ravel()) == [24, 42, 66, 70]
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from pupil_invisible_monitor.voice import CommandRecognizer
+
+SAMPLERATE = 16000
+# 100 ms of int16 audio
+BLOCK = bytes(2 * SAMPLERATE // 10)
+
+
+class ScriptedRecognizer:
+    """vosk recognizer stand-in that returns one scripted result per block."""
+
+    def __init__(self, results):
+        self._results = iter(results)
+        self._current = None
+
+    def AcceptWaveform(self, data):
+        self._current = next(self._results)
+        return "text" in self._current
+
+    def Result(self):
+        return json.dumps(self._current)
+
+    def PartialResult(self):
+        return json.dumps(self._current)
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+
+class RecordingMouse:
+    def __init__(self):
+        self.calls = []
+
+    def click(self, button="left"):
+        self.calls.append(("click", button))
+
+    def wheel(self, delta=1):
+        self.calls.append(("wheel", delta))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(results, **kwargs):
+    mouse, clock = RecordingMouse(), FakeClock()
+    commands = CommandRecognizer(
+        ScriptedRecognizer(results), mouse, SAMPLERATE, clock=clock, **kwargs
+    )
+    for idx in range(len(results)):
+        # blocks are captured when they end, and processed 10 ms later
+        clock.now = (idx + 1) * 0.1 + 0.01
+        commands.accept(BLOCK, capture_time=(idx + 1) * 0.1)
+    return commands, mouse
+
+
+FINAL = {
+    "text": "sélection descente",
+    "result": [
+        {"word": "sélection", "start": 0.05, "end": 0.15},
+        {"word": "descente", "start": 0.3, "end": 0.45},
+    ],
+}
+RESULTS = [
+    {"partial": "sélection"},
+    {"partial": "sélection"},
+    {"partial": "sélection [unk]"},
+    {"partial": "sélection descente"},
+    FINAL,
+]
+
+
+def test_stable_partials_fire_before_the_final_result():
+    commands, mouse = run(RESULTS)
+
+    assert mouse.calls == [("click", "left"), ("wheel", -1)]
+    assert [event.source for event in commands.events] == ["partial", "final"]
+    # end of word to action: 0.15 s -> fired at 0.21 s, 0.45 s -> fired at 0.51 s
+    assert commands.latencies == pytest.approx([0.06, 0.06])
+
+
+def test_final_results_only_without_partial_firing():
+    commands, mouse = run(RESULTS, fire_on_partial=False)
+
+    assert mouse.calls == [("click", "left"), ("wheel", -1)]
+    assert [event.source for event in commands.events] == ["final", "final"]
+    assert commands.latencies == pytest.approx([0.36, 0.06])
+
+
+def test_unstable_partials_do_not_fire():
+    results = [{"partial": "option"}, {"partial": "montée"}, {"text": "montée"}]
+
+    commands, mouse = run(results)
+
+    assert mouse.calls == [("wheel", 1)]
+    assert commands.stats()["from_partials"] == 0
@@ -0,0 +1,45 @@
+import threading
+
+import numpy as np
+
+from pupil_invisible_monitor.pipeline import HostPipeline
+from pupil_invisible_monitor.worker import LatestMailbox, VisionWorker
+
+
+def test_mailbox_keeps_only_the_newest_item():
+    mailbox = LatestMailbox()
+    mailbox.put(1)
+    mailbox.put(2)
+
+    assert mailbox.get(timeout=0) == 2
+    assert mailbox.get(timeout=0) is None
+    assert mailbox.dropped == 1
+
+
+def test_gaze_samples_of_dropped_frames_are_processed():
+    started = threading.Event()
+    release = threading.Event()
+    done = threading.Event()
+    processed = []
+
+    def process(frame, gaze, samples):
+        started.set()
+        release.wait(1.0)
+        processed.append((frame, samples[:, 0].tolist()))
+        if frame == "frame 2":
+            done.set()
+
+    worker = VisionWorker(process, merge=HostPipeline._merge_jobs)
+    worker.start()
+    worker.submit("frame 0", (0, 0), np.array([(0.0, 1, 1)]))
+    assert started.wait(1.0)
+    # frames 1 and 2 wait while frame 0 is processed, frame 2 replaces frame 1
+    worker.submit("frame 1", (0, 0), np.array([(1.0, 1, 1), (1.5, 1, 1)]))
+    worker.submit("frame 2", (0, 0), np.array([(2.0, 1, 1)]))
+    release.set()
+    # stop() drops pending jobs
+    assert done.wait(1.0)
+    worker.stop()
+
+    assert processed == [("frame 0", [0.0]), ("frame 2", [1.0, 1.5, 2.0])]
+    assert worker.dropped == 1